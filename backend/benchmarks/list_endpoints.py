@@ -0,0 +1,89 @@
+"""Compare the old and new list endpoint paths on a throwaway SQLite database.
+
+    python -m backend.benchmarks.list_endpoints [rows] [page_size]
+
+Old: ORM objects -> Pydantic from_attributes -> jsonable_encoder -> json.
+New: column projection -> dict rows -> orjson (keyset page).
+Also reports gzip/br sizes of the new payload, and fails if a page of the
+new path takes more than one query.
+"""
+import gzip
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.core.compression import brotli
+from backend.core.pagination import keyset_page
+from backend.core.profiling import assert_max_queries
+from backend.database.connection import Base
+from backend.models.order import Order  # noqa: F401 (rdp_instances.order_id foreign key)
+from backend.models.rdp_instance import RDPInstance
+from backend.models.ticket import Ticket  # noqa: F401 (User.tickets relationship)
+from backend.models.user import User
+from backend.routers.instances import LIST_COLUMNS, RDPInstanceSchema
+
+def _seed(db, rows: int) -> int:
+    user = User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    start = datetime.utcnow() - timedelta(days=30)
+    db.bulk_insert_mappings(RDPInstance, [
+        {
+            "user_id": user.id, "provider": "vultr", "provider_id": f"v-{i:08d}",
+            "ip_address": f"10.0.{i // 256 % 256}.{i % 256}", "username": "Administrator",
+            "password": "Xy7!" + "a" * 12, "os_type": "windows", "plan": "basic",
+            "status": "active", "created_at": start + timedelta(seconds=i),
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+    return user.id
+
+def old_path(db, user_id: int, limit: int) -> bytes:
+    instances = db.query(RDPInstance).filter(RDPInstance.user_id == user_id).limit(limit).all()
+    validated = TypeAdapter(List[RDPInstanceSchema]).validate_python(instances, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+def new_path(db, user_id: int, limit: int) -> bytes:
+    with assert_max_queries(1, "instances keyset page"):
+        rows, _ = keyset_page(db, LIST_COLUMNS, (RDPInstance.id,), RDPInstance.user_id == user_id, limit=limit)
+    return orjson.dumps(rows)
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main(rows: int = 5000, page_size: int = 50):
+    with tempfile.NamedTemporaryFile(suffix=".db") as f:
+        engine = create_engine(f"sqlite:///{f.name}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            user_id = _seed(db, rows)
+
+        for limit in (page_size, rows):
+            with Session() as db:
+                old_ms = _time(lambda: (old_path(db, user_id, limit), db.expunge_all()), 5)
+                new_ms = _time(lambda: new_path(db, user_id, limit), 5)
+                payload = new_path(db, user_id, limit)
+            print(f"{limit:>7} rows  old {old_ms:8.2f}ms  new {new_ms:8.2f}ms  ({old_ms / new_ms:.1f}x)")
+            sizes = f"json {len(payload)}B, gzip {len(gzip.compress(payload, 6))}B"
+            if brotli is not None:
+                sizes += f", br {len(brotli.compress(payload, quality=4))}B"
+            print(f"{'':>13}{sizes}")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
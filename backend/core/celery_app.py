@@ -1,4 +1,6 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
+from kombu import Queue
 import os
 
 # Use Redis as broker and result backend
@@ -9,6 +11,9 @@ celery_app = Celery(
     broker=REDIS_URL,
     backend=REDIS_URL
 )
+# current_app is thread-local; make this the default so shared_task proxies
+# resolve to it from threadpool endpoints and threads-pool workers too
+celery_app.set_default()
 
 celery_app.conf.update(
     task_serializer='json',
@@ -18,8 +23,83 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
-# Auto-discover tasks
-celery_app.autodiscover_tasks(['backend.tasks'])
+# Queues: I/O-bound provisioning, outbound email and periodic maintenance are
+# consumed by separate workers so a provisioning backlog never delays email
+# or the expiry sweep.
+celery_app.conf.task_queues = (
+    Queue('provisioning'),
+    Queue('email'),
+    Queue('maintenance'),
+)
+celery_app.conf.task_default_queue = 'maintenance'
+celery_app.conf.task_routes = {
+    'backend.tasks.provisioning.*': {'queue': 'provisioning'},
+    'backend.tasks.email.*': {'queue': 'email'},
+    'backend.tasks.expiry.*': {'queue': 'maintenance'},
+    'backend.tasks.orders.*': {'queue': 'maintenance'},
+    'backend.tasks.scheduler.*': {'queue': 'maintenance'},
+    'backend.tasks.catalog.*': {'queue': 'maintenance'},
+    'backend.tasks.images.*': {'queue': 'maintenance'},
+    'backend.tasks.readiness.*': {'queue': 'maintenance'},
+    'backend.tasks.outbox.*': {'queue': 'maintenance'},
+    'backend.tasks.metering.*': {'queue': 'maintenance'},
+    'backend.tasks.reconciler.*': {'queue': 'maintenance'},
+    'backend.tasks.telemetry.*': {'queue': 'maintenance'},
+    'backend.tasks.archive.*': {'queue': 'maintenance'},
+    'backend.tasks.payments.*': {'queue': 'maintenance'},
+    'backend.tasks.renewals.*': {'queue': 'maintenance'},
+}
+
+# Provisioning tasks spend minutes waiting on provider APIs. Ack only after
+# the task finishes so a killed worker hands the job to another one, and
+# reserve one message at a time so a busy worker doesn't hoard the queue.
+celery_app.conf.update(
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    # Must exceed the longest task plus retry countdown, or Redis redelivers
+    # unacked messages to a second worker while the first is still running.
+    broker_transport_options={'visibility_timeout': int(os.getenv("CELERY_VISIBILITY_TIMEOUT", "7200"))},
+    # Only enforced by the prefork pool. The workers run --pool=threads, where
+    # run_async's ASYNC_CALL_TIMEOUT_SECONDS is what stops a stuck provider call.
+    task_soft_time_limit=int(os.getenv("CELERY_TASK_SOFT_TIME_LIMIT", "900")),
+    task_time_limit=int(os.getenv("CELERY_TASK_TIME_LIMIT", "1200")),
+)
+
+@worker_init.connect
+def _check_chain_config(**kwargs):
+    # Same check as the API; SystemExit because celery logs and ignores handler exceptions
+    from backend.services.chains import ChainError, check_config
+    try:
+        check_config()
+    except ChainError as e:
+        print(f"Worker not started: {e}")
+        raise SystemExit(1)
+
+@worker_process_init.connect
+def _reset_event_loop(**kwargs):
+    # Forked children inherit the parent's loop object but not its thread
+    from backend.core.event_loop import reset_loop
+    reset_loop()
+
+# Register task modules (related_name=None imports each module directly)
+celery_app.autodiscover_tasks([
+    'backend.tasks.provisioning',
+    'backend.tasks.email',
+    'backend.tasks.expiry',
+    'backend.tasks.orders',
+    'backend.tasks.scheduler',
+    'backend.tasks.catalog',
+    'backend.tasks.images',
+    'backend.tasks.readiness',
+    'backend.tasks.outbox',
+    'backend.tasks.metering',
+    'backend.tasks.reconciler',
+    'backend.tasks.telemetry',
+    'backend.tasks.archive',
+    'backend.tasks.payments',
+    'backend.tasks.renewals',
+], related_name=None)
 
 # Beat Schedule
 from celery.schedules import crontab
@@ -29,4 +109,60 @@ celery_app.conf.beat_schedule = {
         'task': 'backend.tasks.expiry.check_expired_instances',
         'schedule': crontab(minute=0), # Run every hour
     },
+    'send-renewal-reminders': {
+        'task': 'backend.tasks.renewals.send_renewal_reminders',
+        'schedule': float(os.getenv("RENEWAL_REMINDER_SECONDS", "300")),  # well inside the 1h window
+    },
+    'dispatch-provisioning-jobs': {
+        'task': 'backend.tasks.scheduler.dispatch_provisioning_jobs',
+        'schedule': 5.0,
+    },
+    'release-waitlisted-orders-every-minute': {
+        'task': 'backend.tasks.orders.release_waitlisted_orders',
+        'schedule': 60.0,
+    },
+    'reconcile-fleet': {
+        'task': 'backend.tasks.reconciler.reconcile_fleet',
+        'schedule': float(os.getenv("RECONCILE_SECONDS", "1800")),
+    },
+    'collect-instance-telemetry': {
+        'task': 'backend.tasks.telemetry.collect_instance_telemetry',
+        'schedule': float(os.getenv("TELEMETRY_SWEEP_SECONDS", "60")),
+    },
+    'downsample-instance-telemetry': {
+        'task': 'backend.tasks.telemetry.downsample_instance_telemetry',
+        'schedule': 300.0,
+    },
+    'archive-cold-rows': {
+        'task': 'backend.tasks.archive.archive_cold_rows',
+        'schedule': crontab(minute=30, hour=3),  # quiet hours; batches keep each transaction short
+    },
+    'refill-deposit-addresses': {
+        'task': 'backend.tasks.payments.refill_deposit_addresses',
+        'schedule': 60.0,
+    },
+    'watch-crypto-deposits': {
+        'task': 'backend.tasks.payments.watch_crypto_deposits',
+        'schedule': float(os.getenv("CRYPTO_WATCH_SECONDS", "15")),  # a no-op until a chain has a new block
+    },
+    'rollup-usage': {
+        'task': 'backend.tasks.metering.rollup_usage',
+        'schedule': float(os.getenv("USAGE_ROLLUP_SECONDS", "600")),
+    },
+    'relay-outbox': {
+        'task': 'backend.tasks.outbox.relay_outbox',
+        'schedule': float(os.getenv("OUTBOX_RELAY_SECONDS", "5")),
+    },
+    'probe-booting-instances': {
+        'task': 'backend.tasks.readiness.probe_pending_instances',
+        'schedule': float(os.getenv("RDP_PROBE_SWEEP_SECONDS", "10")),
+    },
+    'refresh-golden-images': {
+        'task': 'backend.tasks.images.refresh_golden_images',
+        'schedule': 300.0,
+    },
+    'sync-provider-catalog': {
+        'task': 'backend.tasks.catalog.sync_catalog',
+        'schedule': float(os.getenv("CATALOG_SYNC_SECONDS", "900")),
+    },
 }
@@ -0,0 +1,116 @@
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Response compression negotiated from Accept-Encoding: br when the brotli
+# package is installed and the client accepts it, else gzip. Small bodies
+# and already-encoded or binary content types pass through untouched.
+# Streaming responses are compressed chunk by chunk with a sync flush, so
+# clients still receive each chunk as it is produced.
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/x-ndjson", b"application/xml")
+
+def _accepted(scope) -> dict:
+    """Accept-Encoding as {coding: q}"""
+    for name, value in scope.get("headers", []):
+        if name == b"accept-encoding":
+            codings = {}
+            for part in value.decode("latin-1").split(","):
+                coding, _, params = part.strip().partition(";")
+                q = 1.0
+                params = params.strip()
+                if params.startswith("q="):
+                    try:
+                        q = float(params[2:])
+                    except ValueError:
+                        q = 0.0
+                if coding:
+                    codings[coding.strip().lower()] = q
+            return codings
+    return {}
+
+def choose_encoding(scope) -> Optional[str]:
+    accepted = _accepted(scope)
+    wildcard = accepted.get("*", 0.0)
+    options = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in options:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+class _Encoder:
+    def __init__(self, coding: str, level: int):
+        self.coding = coding
+        if coding == "br":
+            self._br = brotli.Compressor(quality=level)
+        else:
+            self._gz = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self.coding == "br":
+            out = self._br.process(data)
+            return out + (self._br.finish() if last else self._br.flush())
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope, receive, send):
+        coding = choose_encoding(scope) if scope["type"] == "http" else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                headers = dict(start.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                if (
+                    b"content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(coding, self.levels[coding])
+                headers = [(k, v) for k, v in start.get("headers", []) if k not in (b"content-length", b"vary")]
+                vary = dict(start.get("headers", [])).get(b"vary")
+                headers.append((b"content-encoding", coding.encode()))
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                data = encoder.chunk(body, last=not more)
+                if not more:
+                    headers.append((b"content-length", str(len(data)).encode()))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": data, "more_body": more})
+                return
+            await send({"type": "http.response.body", "body": encoder.chunk(body, last=not more), "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+        if start is not None and encoder is None and not passthrough:
+            await send(start)  # response with no body message
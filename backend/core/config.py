@@ -13,6 +13,155 @@ class Settings:
     
     SECRET_KEY: str = os.getenv("SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+    REVOCATION_SYNC_SECONDS: float = float(os.getenv("REVOCATION_SYNC_SECONDS", "1"))
+    REVOCATION_BLOOM_CAPACITY: int = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Async task execution (one event loop per worker process)
+    ASYNC_TASK_CONCURRENCY: int = int(os.getenv("ASYNC_TASK_CONCURRENCY", "100"))
+    # run_async cancels a call after this long; the threads pool ignores celery's time limits
+    ASYNC_CALL_TIMEOUT_SECONDS: float = float(os.getenv("ASYNC_CALL_TIMEOUT_SECONDS", "900"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+
+    # Admission control for new orders
+    PROVISIONING_CAPACITY: int = int(os.getenv("PROVISIONING_CAPACITY", "50"))  # concurrent provisioning slots across workers
+    ADMISSION_DEFAULT_PROVISION_SECONDS: float = float(os.getenv("ADMISSION_DEFAULT_PROVISION_SECONDS", "300"))
+    ADMISSION_WAITLIST_ETA_SECONDS: int = int(os.getenv("ADMISSION_WAITLIST_ETA_SECONDS", "1800"))
+    ADMISSION_REJECT_ETA_SECONDS: int = int(os.getenv("ADMISSION_REJECT_ETA_SECONDS", "7200"))
+    ADMISSION_MAX_WAITLIST: int = int(os.getenv("ADMISSION_MAX_WAITLIST", "200"))
+    ADMISSION_CACHE_SECONDS: float = float(os.getenv("ADMISSION_CACHE_SECONDS", "2"))
+
+    # Bulk orders: seats per payment, and how many of one order provision at once
+    BULK_ORDER_MAX_QUANTITY: int = int(os.getenv("BULK_ORDER_MAX_QUANTITY", "100"))
+    BULK_ORDER_CONCURRENCY: int = int(os.getenv("BULK_ORDER_CONCURRENCY", "10"))
+
+    # Provider catalog (synced by the sync_catalog beat task)
+    CATALOG_CACHE_SECONDS: float = float(os.getenv("CATALOG_CACHE_SECONDS", "60"))  # in-process snapshot lifetime
+
+    # Golden desktop images (see services/images.py)
+    GOLDEN_IMAGE_URL_LINUX: str = os.getenv("GOLDEN_IMAGE_URL_LINUX", "")  # qcow2 built from the recipe by CI
+    GOLDEN_IMAGE_KEEP: int = int(os.getenv("GOLDEN_IMAGE_KEEP", "2"))  # versions kept registered (current + rollback)
+
+    # RDP readiness prober (services/readiness.py)
+    RDP_PROBE_TIMEOUT_SECONDS: float = float(os.getenv("RDP_PROBE_TIMEOUT_SECONDS", "5"))
+    RDP_PROBE_CONCURRENCY: int = int(os.getenv("RDP_PROBE_CONCURRENCY", "500"))  # open sockets per sweep
+    RDP_PROBE_BATCH_SIZE: int = int(os.getenv("RDP_PROBE_BATCH_SIZE", "5000"))  # instances per sweep
+    RDP_PROBE_BACKOFF_BASE_SECONDS: float = float(os.getenv("RDP_PROBE_BACKOFF_BASE_SECONDS", "10"))
+    RDP_PROBE_BACKOFF_MAX_SECONDS: float = float(os.getenv("RDP_PROBE_BACKOFF_MAX_SECONDS", "120"))
+    RDP_PROBE_DEADLINE_MINUTES: int = int(os.getenv("RDP_PROBE_DEADLINE_MINUTES", "60"))  # then the instance is marked failed
+
+    # Transactional outbox (services/outbox.py)
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "12"))  # then the message is marked dead
+    OUTBOX_RETENTION_HOURS: int = int(os.getenv("OUTBOX_RETENTION_HOURS", "72"))  # delivered rows kept this long
+    OUTBOX_WEBHOOK_URL: str = os.getenv("OUTBOX_WEBHOOK_URL", "")  # lifecycle events are POSTed here if set
+    OUTBOX_WEBHOOK_SECRET: str = os.getenv("OUTBOX_WEBHOOK_SECRET", "")  # HMAC-SHA512 key for X-NemoRDP-Signature
+
+    # Crypto payments (services/crypto_payments.py). Account-level extended public
+    # keys (m/84'/0'/0' and m/44'/60'/0'); without one, that chain is disabled
+    CRYPTO_BTC_XPUB: str = os.getenv("CRYPTO_BTC_XPUB", "")
+    CRYPTO_ETH_XPUB: str = os.getenv("CRYPTO_ETH_XPUB", "")  # ETH on branch 0, USDT on branch 1
+    CRYPTO_BTC_RPC_URL: str = os.getenv("CRYPTO_BTC_RPC_URL", "")  # Bitcoin Core wallet; required with CRYPTO_BTC_XPUB
+    CRYPTO_ETH_RPC_URL: str = os.getenv("CRYPTO_ETH_RPC_URL", "")  # required with CRYPTO_ETH_XPUB
+    # Development only: watch the in-Redis stand-in chain (services/chains.py) instead of
+    # a node, with a built-in test xpub for chains that have none
+    CRYPTO_LOCAL_CHAIN: bool = os.getenv("CRYPTO_LOCAL_CHAIN", "false").lower() == "true"
+    CRYPTO_KOBO_PER_USD: float = float(os.getenv("CRYPTO_KOBO_PER_USD", "160000"))  # order amount (kobo) -> USD for quotes
+    CRYPTO_USDT_CONTRACT: str = os.getenv("CRYPTO_USDT_CONTRACT", "0xdAC17F958D2ee523a2206206994597C13D831ec7")
+    CRYPTO_USD_PRICES: str = os.getenv("CRYPTO_USD_PRICES", "BTC:60000,ETH:3000,USDT:1")  # quote prices, no live feed
+    CRYPTO_CONFIRMATIONS: str = os.getenv("CRYPTO_CONFIRMATIONS", "BTC:2,ETH:12,USDT:12")
+    CRYPTO_PAYMENT_WINDOW_MINUTES: int = int(os.getenv("CRYPTO_PAYMENT_WINDOW_MINUTES", "60"))  # quote validity
+    CRYPTO_LATE_PAYMENT_HOURS: int = int(os.getenv("CRYPTO_LATE_PAYMENT_HOURS", "24"))  # still watched after expiry
+    CRYPTO_POOL_LOW_WATER: int = int(os.getenv("CRYPTO_POOL_LOW_WATER", "50"))  # free addresses per currency
+    CRYPTO_POOL_TARGET: int = int(os.getenv("CRYPTO_POOL_TARGET", "200"))
+
+    # Usage metering (services/metering.py)
+    BILLING_PERIOD_HOURS: int = int(os.getenv("BILLING_PERIOD_HOURS", "720"))  # a plan's price buys this many hours
+    USAGE_KOBO_PER_USD: float = float(os.getenv("USAGE_KOBO_PER_USD", "160000"))  # converts provider USD list prices
+    USAGE_ROLLUP_MAX_DIRTY: int = int(os.getenv("USAGE_ROLLUP_MAX_DIRTY", "500"))  # corrected hours recomputed per run
+
+    # Expiry reminders and renewals (services/renewals.py)
+    RENEWAL_REMINDER_HOURS: str = os.getenv("RENEWAL_REMINDER_HOURS", "72,24,1")  # before expires_at
+    RENEWAL_MAX_AHEAD_HOURS: int = int(os.getenv("RENEWAL_MAX_AHEAD_HOURS", "1440"))  # renewals can't push expiry further out
+    RENEWAL_URL_TEMPLATE: str = os.getenv("RENEWAL_URL_TEMPLATE", "http://localhost:3000/dashboard?renew={instance_id}")
+    RENEWAL_EMAIL_BATCH_SIZE: int = int(os.getenv("RENEWAL_EMAIL_BATCH_SIZE", "50"))  # digests per SMTP connection
+    RENEWAL_MAX_BATCHES: int = int(os.getenv("RENEWAL_MAX_BATCHES", "20"))  # per run
+    RENEWAL_MAX_ATTEMPTS: int = int(os.getenv("RENEWAL_MAX_ATTEMPTS", "3"))
+
+    # Fleet reconciler (services/reconciler.py)
+    RECONCILE_GRACE_MINUTES: int = int(os.getenv("RECONCILE_GRACE_MINUTES", "60"))  # younger VMs/rows may be mid-provisioning
+    RECONCILE_DELETE_ORPHANS: bool = os.getenv("RECONCILE_DELETE_ORPHANS", "false").lower() == "true"  # else report only
+    RECONCILE_MAX_MISSING_FRACTION: float = float(os.getenv("RECONCILE_MAX_MISSING_FRACTION", "0.2"))
+    RECONCILE_MIN_HELD: int = int(os.getenv("RECONCILE_MIN_HELD", "3"))  # up to this many missing are always repaired
+    RECONCILE_DELETE_CONCURRENCY: int = int(os.getenv("RECONCILE_DELETE_CONCURRENCY", "10"))
+
+    # Hot/cold archival (services/archive.py)
+    ARCHIVE_INSTANCES_AFTER_DAYS: int = int(os.getenv("ARCHIVE_INSTANCES_AFTER_DAYS", "30"))  # since the last lifecycle event
+    ARCHIVE_TICKETS_AFTER_DAYS: int = int(os.getenv("ARCHIVE_TICKETS_AFTER_DAYS", "90"))  # closed tickets, by created_at
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+    ARCHIVE_MAX_BATCHES: int = int(os.getenv("ARCHIVE_MAX_BATCHES", "50"))  # per table per run
+
+    # Startup and health checks (core/health.py)
+    DB_INIT_ON_STARTUP: bool = os.getenv("DB_INIT_ON_STARTUP", "true").lower() == "true"  # else run database/init_db.py per deploy
+    HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "10"))
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "3"))
+
+    # Read replicas (database/replicas.py); replica URLs are DATABASE_REPLICA_URLS
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))  # further behind -> primary
+    DB_REPLICA_LAG_CHECK_SECONDS: float = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", "5"))
+    DB_READ_PIN_SECONDS: int = int(os.getenv("DB_READ_PIN_SECONDS", "10"))  # reads stay on the primary after a user's write
+
+    # Instance telemetry (services/telemetry.py)
+    TELEMETRY_BATCH_SIZE: int = int(os.getenv("TELEMETRY_BATCH_SIZE", "500"))  # instances sampled per sweep, round-robin
+    TELEMETRY_CONCURRENCY: int = int(os.getenv("TELEMETRY_CONCURRENCY", "10"))
+    TELEMETRY_PROVIDER_RPS: float = float(os.getenv("TELEMETRY_PROVIDER_RPS", "10"))  # stays under Vultr's 30 req/s API limit
+    TELEMETRY_RAW_RETENTION_HOURS: int = int(os.getenv("TELEMETRY_RAW_RETENTION_HOURS", "24"))
+    TELEMETRY_5M_RETENTION_DAYS: int = int(os.getenv("TELEMETRY_5M_RETENTION_DAYS", "7"))
+    TELEMETRY_1H_RETENTION_DAYS: int = int(os.getenv("TELEMETRY_1H_RETENTION_DAYS", "90"))
+
+    # Region placement: MaxMind GeoLite2/GeoIP2 City or Country (+ optional ASN) database files
+    GEOIP_DB_PATH: str = os.getenv("GEOIP_DB_PATH", "")
+    GEOIP_ASN_DB_PATH: str = os.getenv("GEOIP_ASN_DB_PATH", "")
+    PLACEMENT_LATENCY_PATH: str = os.getenv(
+        "PLACEMENT_LATENCY_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "region_latency.json")
+    )
+
+    # Provisioning scheduler: priority classes (by plan) and anti-starvation aging
+    SCHEDULER_CLASS_WEIGHTS: str = os.getenv("SCHEDULER_CLASS_WEIGHTS", "performance:4,basic:1")
+    SCHEDULER_DEFAULT_CLASS: str = os.getenv("SCHEDULER_DEFAULT_CLASS", "basic")
+    SCHEDULER_AGING_SECONDS: float = float(os.getenv("SCHEDULER_AGING_SECONDS", "300"))  # weight grows by its base value per interval waited (linear)
+    SCHEDULER_MAX_DISPATCH: int = int(os.getenv("SCHEDULER_MAX_DISPATCH", "100"))  # per dispatcher run
+
+    # Rate limits: "METHOD /path=scope:limit/window_seconds[+burst],...;..."
+    # with scope "ip" or "user" (authenticated user id)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMITS: str = os.getenv(
+        "RATE_LIMITS",
+        "POST /auth/login=ip:10/60+10;"
+        "POST /auth/register=ip:5/3600+5;"
+        "POST /auth/refresh=ip:30/60+30;"
+        "POST /billing/initiate=ip:20/60,user:5/60+5;"
+        "POST /support/tickets=ip:30/3600,user:10/3600+5",
+    )
+    TRUSTED_PROXY_HOPS: int = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))  # reverse proxies setting X-Forwarded-For
+
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+
+    # Opt-in request profiler
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests profiled automatically
+    PROFILE_HEADER: str = os.getenv("PROFILE_HEADER", "X-Profile")
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")  # the header value must match it; unset -> header ignored
+    PROFILE_SLOW_MS: float = float(os.getenv("PROFILE_SLOW_MS", "500"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+    # Provider circuit breaker
+    BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_WINDOW_SECONDS: int = int(os.getenv("BREAKER_WINDOW_SECONDS", "300"))
+    BREAKER_COOLDOWN_SECONDS: int = int(os.getenv("BREAKER_COOLDOWN_SECONDS", "120"))
 
 settings = Settings()
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Optional
+from backend.core.config import settings
+
+# One event loop per worker process, running on a daemon thread.
+# Celery tasks (threads pool) submit coroutines here instead of spinning up a
+# private loop per call, so a single process can keep many provisioning
+# coroutines waiting on HTTP at the same time and share pooled clients.
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_lock = threading.Lock()
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting it on first use"""
+    global _loop, _semaphore
+    if _loop is not None and _loop.is_running():
+        return _loop
+
+    with _lock:
+        if _loop is None or not _loop.is_running():
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run, name="nemordp-event-loop", daemon=True)
+            thread.start()
+            started.wait()
+
+            _semaphore = asyncio.Semaphore(settings.ASYNC_TASK_CONCURRENCY)
+            _loop = loop
+    return _loop
+
+async def _limited(coro: Awaitable, timeout: float) -> Any:
+    async with _semaphore:
+        return await asyncio.wait_for(coro, timeout)
+
+def run_async(func: Callable[..., Awaitable], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """Run a coroutine function on the shared loop and block the calling thread for its result.
+
+    At most ASYNC_TASK_CONCURRENCY coroutines run at once per process; the rest
+    wait on the semaphore without holding a connection.
+
+    Celery's task time limits are not enforced under the threads pool, so the
+    limit lives here: a call running longer than `timeout` (default
+    ASYNC_CALL_TIMEOUT_SECONDS, not counting the semaphore wait) is cancelled
+    and raises TimeoutError in the calling task.
+    """
+    loop = get_loop()
+    timeout = settings.ASYNC_CALL_TIMEOUT_SECONDS if timeout is None else timeout
+    future = asyncio.run_coroutine_threadsafe(_limited(func(*args, **kwargs), timeout), loop)
+    return future.result()
+
+def reset_loop():
+    """Drop the shared loop (used after fork, where the parent's loop thread is gone)"""
+    global _loop, _semaphore
+    _loop = None
+    _semaphore = None
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+import httpx
+from sqlalchemy import text
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.redis_client import get_redis
+
+# Liveness vs readiness. /health/live only says the process is serving.
+# /health/ready says whether it can do useful work, and answers from a
+# cache: a daemon thread per API process runs every check every
+# HEALTH_CHECK_INTERVAL_SECONDS, so load balancer probes never touch
+# Postgres, Redis or the providers themselves.
+#
+# Critical checks (database, redis, broker) decide readiness. Replicas and
+# providers only degrade it: reads fall back to the primary, and provisioning
+# retries behind the circuit breaker. Results older than three intervals
+# count as failed, in case the checker thread itself is stuck.
+
+PROVIDER_URLS = {
+    # Any HTTP answer (401 included) proves the API is reachable
+    "vultr": ("https://api.vultr.com/v2/regions", "VULTR_API_KEY"),
+    "contabo": ("https://api.contabo.com/v1/compute/instances", "CONTABO_CLIENT_ID"),
+}
+
+def _check_database():
+    from backend.database.connection import engine
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+def _check_replicas():
+    from backend.database.replicas import replicas
+
+    down = [r.name for r in replicas if r.current_lag() is None]
+    lagging = [r.name for r in replicas if r.lag is not None and r.lag > settings.DB_REPLICA_MAX_LAG_SECONDS]
+    if down or lagging:
+        raise RuntimeError(", ".join([f"{n} unreachable" for n in down] + [f"{n} lagging" for n in lagging]))
+
+def _check_redis():
+    get_redis().ping()
+
+def _check_broker():
+    from backend.core.celery_app import celery_app
+
+    with celery_app.connection_for_write() as conn:
+        conn.ensure_connection(max_retries=1, timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+
+def _provider_check(url: str) -> Callable[[], None]:
+    def _check():
+        response = httpx.get(url, timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS)
+        if response.status_code >= 500:
+            raise RuntimeError(f"HTTP {response.status_code}")
+    return _check
+
+def default_checks() -> List[Tuple[str, Callable[[], None], bool]]:
+    """(name, check, critical); providers only if configured"""
+    from backend.database.connection import replica_engines
+
+    checks = [
+        ("database", _check_database, True),
+        ("redis", _check_redis, True),
+        ("broker", _check_broker, True),
+    ]
+    if replica_engines:
+        checks.append(("replicas", _check_replicas, False))
+    for name, (url, credential) in PROVIDER_URLS.items():
+        if os.getenv(credential):
+            checks.append((f"provider:{name}", _provider_check(url), False))
+    return checks
+
+class HealthMonitor:
+    def __init__(self, checks: List[Tuple[str, Callable[[], None], bool]] = None):
+        self.checks = checks
+        self.results: Dict[str, Dict] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_checks(self):
+        results = {}
+        for name, check, critical in self.checks:
+            started = time.perf_counter()
+            try:
+                check()
+                ok, error = True, None
+            except Exception as e:
+                ok, error = False, str(e)[:200] or type(e).__name__
+            results[name] = {
+                "ok": ok,
+                "critical": critical,
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                "checked_at": time.time(),
+                "error": error,
+            }
+            metrics.set_gauge("nemordp_dependency_up", 1 if ok else 0, dependency=name)
+        self.results = results  # swapped whole: readers never see a half-updated set
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_checks()
+            except Exception as e:
+                print(f"Health checks failed to run: {e}")
+            self._stop.wait(settings.HEALTH_CHECK_INTERVAL_SECONDS)
+
+    def start(self):
+        # Not ready until the first round completes; startup doesn't wait on it
+        if self.checks is None:
+            self.checks = default_checks()
+        self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def readiness(self) -> Tuple[bool, Dict]:
+        if not self.results:
+            return False, {"status": "starting", "checks": {}}
+        now = time.time()
+        stale_after = settings.HEALTH_CHECK_INTERVAL_SECONDS * 3
+        checks, ready, degraded = {}, True, False
+        for name, result in self.results.items():
+            ok = result["ok"] and now - result["checked_at"] <= stale_after
+            checks[name] = {
+                "status": "ok" if ok else ("stale" if result["ok"] else "down"),
+                "critical": result["critical"],
+                "latency_ms": result["latency_ms"],
+                "checked_at": datetime.utcfromtimestamp(result["checked_at"]).isoformat(),
+                **({"error": result["error"]} if result["error"] else {}),
+            }
+            if not ok and result["critical"]:
+                ready = False
+            elif not ok:
+                degraded = True
+        status = "ready" if ready and not degraded else "degraded" if ready else "unavailable"
+        return ready, {"status": status, "checks": checks}
+
+monitor = HealthMonitor()
@@ -0,0 +1,30 @@
+import asyncio
+import weakref
+import httpx
+from backend.core.config import settings
+
+# httpx.AsyncClient is bound to the loop it first runs on, so keep one pooled
+# client per event loop: the API's uvicorn loop and the worker's shared loop
+# each get their own keep-alive pool.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the pooled AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=settings.HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+async def close_http_client():
+    """Close the pooled client for the running loop (app shutdown)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,113 @@
+from typing import Callable, Dict, Iterable, List, Tuple
+import redis
+from backend.core.redis_client import get_redis
+
+# Metrics are kept in Redis so the API and every worker process report into
+# one place; GET /metrics renders them in Prometheus text format.
+# Writes are pipelined and never raise: losing a sample beats failing a request.
+
+PREFIX = "metrics"
+INDEX_KEY = f"{PREFIX}:index"
+BUCKETS_KEY = f"{PREFIX}:buckets"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# In-process gauges computed at scrape time: fn() -> [(name, labels, value)]
+_collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+_registered_buckets = set()
+
+def _labels(labels: Dict[str, object]) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+def _write(fn):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        fn(pipe)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increment a counter"""
+    def _fn(pipe):
+        pipe.sadd(INDEX_KEY, f"counter:{name}")
+        pipe.hincrbyfloat(f"{PREFIX}:counter:{name}", _labels(labels), amount)
+    _write(_fn)
+
+def set_gauge(name: str, value: float, **labels):
+    """Set a gauge to its latest value"""
+    def _fn(pipe):
+        pipe.sadd(INDEX_KEY, f"gauge:{name}")
+        pipe.hset(f"{PREFIX}:gauge:{name}", _labels(labels), value)
+    _write(_fn)
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels):
+    """Record one observation in a histogram"""
+    le = next((str(b) for b in buckets if value <= b), "+Inf")
+    key = f"{PREFIX}:histogram:{name}"
+    label_str = _labels(labels)
+
+    def _fn(pipe):
+        if name not in _registered_buckets:
+            pipe.sadd(INDEX_KEY, f"histogram:{name}")
+            pipe.hset(BUCKETS_KEY, name, ",".join(str(b) for b in buckets))
+            _registered_buckets.add(name)
+        pipe.hincrby(key, f"{label_str}|{le}", 1)
+        pipe.hincrby(key, f"{label_str}|count", 1)
+        pipe.hincrbyfloat(key, f"{label_str}|sum", value)
+    _write(_fn)
+
+def register_collector(fn: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]):
+    """Register a callback that reports in-process gauges at scrape time"""
+    _collectors.append(fn)
+
+def _join(label_str: str, extra: str) -> str:
+    inner = ",".join(part for part in (label_str, extra) if part)
+    return f"{{{inner}}}" if inner else ""
+
+def render() -> str:
+    """Render every metric in Prometheus text exposition format"""
+    lines = []
+    try:
+        client = get_redis()
+        entries = sorted(client.smembers(INDEX_KEY))
+        buckets = client.hgetall(BUCKETS_KEY)
+        for entry in entries:
+            kind, name = entry.split(":", 1)
+            values = client.hgetall(f"{PREFIX}:{kind}:{name}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                for label_str, value in sorted(values.items()):
+                    lines.append(f"{name}{_join(label_str, '')} {value}")
+                continue
+
+            bounds = buckets.get(name, "").split(",") if buckets.get(name) else []
+            series = {}
+            for field, value in values.items():
+                label_str, _, suffix = field.rpartition("|")
+                series.setdefault(label_str, {})[suffix] = value
+            for label_str, fields in sorted(series.items()):
+                cumulative = 0
+                for bound in bounds + ["+Inf"]:
+                    cumulative += int(fields.get(bound, 0))
+                    le_label = 'le="%s"' % bound
+                    lines.append(f"{name}_bucket{_join(label_str, le_label)} {cumulative}")
+                lines.append(f"{name}_sum{_join(label_str, '')} {fields.get('sum', 0)}")
+                lines.append(f"{name}_count{_join(label_str, '')} {fields.get('count', 0)}")
+    except redis.RedisError as e:
+        lines.append(f"# metrics store unavailable: {e}")
+
+    for collector in _collectors:
+        try:
+            samples = list(collector())
+        except Exception as e:
+            lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {e}")
+            continue
+        seen = set()
+        for name, labels, value in samples:
+            if name not in seen:
+                lines.append(f"# TYPE {name} gauge")
+                seen.add(name)
+            lines.append(f"{name}{_join(_labels(labels), '')} {value}")
+
+    return "\n".join(lines) + "\n"
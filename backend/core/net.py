@@ -0,0 +1,18 @@
+from backend.core.config import settings
+
+def client_ip(scope) -> str:
+    """Client address of an ASGI request.
+
+    Behind TRUSTED_PROXY_HOPS reverse proxies the peer is the last proxy, so
+    the client is taken from X-Forwarded-For, counting hops from the right
+    (entries further left are client-supplied and can be forged).
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                chain = [part.strip() for part in value.decode("latin-1").split(",") if part.strip()]
+                if chain:
+                    return chain[-hops] if len(chain) >= hops else chain[0]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
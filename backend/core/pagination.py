@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+# Keyset pagination for list endpoints. Rows are fetched as plain column
+# tuples (no ORM identity map, no Pydantic validation) ordered by a unique
+# sort key; the client passes back the key of the last row it saw instead
+# of an offset, so every page costs the same index range scan.
+#
+# Pages stay plain JSON arrays; the cursor for the next page travels in the
+# X-Next-Cursor header (absent on the last page).
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def _encode_value(value: Any) -> Any:
+    return {"dt": value.isoformat()} if isinstance(value, datetime) else value
+
+def _decode_value(value: Any) -> Any:
+    return datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = [_decode_value(v) for v in json.loads(raw)]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def _after(sort_columns: Sequence, values: Sequence[Any], descending: bool):
+    """WHERE clause for rows strictly past `values` in (col1, col2, ...) order.
+
+    A row-value comparison, so Postgres can start an index range scan at the
+    cursor (SQLite supports row values since 3.15).
+    """
+    if len(sort_columns) == 1:
+        column, value = sort_columns[0], values[0]
+        return column < value if descending else column > value
+    keys, bound = tuple_(*sort_columns), tuple_(*values)
+    return keys < bound if descending else keys > bound
+
+def paginate(
+    query,
+    sort_columns: Sequence,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    descending: bool = True,
+):
+    """Return (rows as dicts, next cursor or None) for a column query.
+
+    `sort_columns` must end with a unique column (the primary key) and each
+    of them must also be selected by `query`.
+    """
+    if cursor:
+        query = query.filter(_after(sort_columns, decode_cursor(cursor, len(sort_columns)), descending))
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in sort_columns])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor([last[c.key] for c in sort_columns])
+    return [dict(row._mapping) for row in rows], next_cursor
+
+def keyset_page(
+    db: Session,
+    columns: Sequence,
+    sort_columns: Sequence,
+    *filters,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    descending: bool = True,
+):
+    """paginate() over `columns` of the rows matching `filters`"""
+    query = db.query(*columns).filter(*filters)
+    return paginate(query, sort_columns, cursor=cursor, limit=limit, descending=descending)
+
+def page_response(rows: List[dict], next_cursor: Optional[str]) -> ORJSONResponse:
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return ORJSONResponse(rows, headers=headers)
@@ -0,0 +1,225 @@
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from backend.core.config import settings
+
+# Opt-in request profiler. A request is profiled when it carries the
+# PROFILE_HEADER with the value of PROFILE_TOKEN (without a token the header
+# is ignored) or is picked by PROFILE_SAMPLE_RATE. For profiled requests we record wall time, every SQL
+# statement with its duration (SQLAlchemy engine events), and a sampling CPU
+# profile of the threads serving the request. Slow requests are logged with
+# their top frames and queries; every profiled response gets Server-Timing
+# and X-Query-Count headers.
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("nemordp_request_profile", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalize(statement: str, limit: int = 200) -> str:
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+class RequestProfile:
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.wall_ms = 0.0
+        self.queries: List[tuple] = []  # (normalized statement, duration ms)
+        self.threads = {threading.get_ident()}
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+
+    @property
+    def sql_ms(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def top_frames(self, limit: int = 10) -> List[tuple]:
+        return self.samples.most_common(limit)
+
+    def top_queries(self, limit: int = 10) -> List[tuple]:
+        grouped: Dict[str, list] = {}
+        for statement, duration in self.queries:
+            entry = grouped.setdefault(statement, [0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+        return sorted(((s, n, ms) for s, (n, ms) in grouped.items()), key=lambda q: q[2], reverse=True)[:limit]
+
+    def report(self) -> str:
+        lines = [f"Slow request {self.label}: {self.wall_ms:.1f}ms wall, "
+                 f"{len(self.queries)} queries / {self.sql_ms:.1f}ms SQL, {self.sample_count} samples"]
+        for frame, hits in self.top_frames():
+            lines.append(f"  {hits * 100.0 / max(1, self.sample_count):5.1f}%  {frame}")
+        for statement, count, ms in self.top_queries():
+            lines.append(f"  {count:3d}x {ms:8.2f}ms  {statement}")
+        return "\n".join(lines)
+
+class QueryCounter:
+    """Counts every SQL statement in the process while registered (see assert_max_queries)"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+_counters: List[QueryCounter] = []
+_counters_lock = threading.Lock()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None or _counters:
+        conn.info.setdefault("nemordp_query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("nemordp_query_start")
+    started = starts.pop() if starts else None
+    profile = _current.get()
+    if profile is None and not _counters:
+        return
+    duration_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+    normalized = _normalize(statement)
+    if profile is not None:
+        profile.queries.append((normalized, duration_ms))
+        # Sync endpoints run in the threadpool with our context copied in;
+        # sample that thread too
+        profile.threads.add(threading.get_ident())
+    if _counters:
+        with _counters_lock:
+            for counter in _counters:
+                counter.statements.append(normalized)
+
+class _Sampler:
+    """One background thread sampling the stacks of threads serving profiled requests"""
+
+    def __init__(self):
+        self.active: List[RequestProfile] = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, profile: RequestProfile):
+        with self.lock:
+            self.active.append(profile)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="nemordp-profiler", daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+    def stop(self, profile: RequestProfile):
+        with self.lock:
+            if profile in self.active:
+                self.active.remove(profile)
+
+    def _run(self):
+        interval = settings.PROFILE_INTERVAL_MS / 1000.0
+        me = threading.get_ident()
+        while True:
+            with self.lock:
+                profiles = list(self.active)
+            if not profiles:
+                self.wake.clear()
+                self.wake.wait()
+                continue
+            frames = sys._current_frames()
+            for profile in profiles:
+                for thread_id in list(profile.threads):
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == me:
+                        continue
+                    profile.sample_count += 1
+                    profile.samples[self._signature(frame)] += 1
+            time.sleep(interval)
+
+    @staticmethod
+    def _signature(frame, depth: int = 3) -> str:
+        """Innermost frames, preferring our own code over library internals"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        ours = [f for f in stack if "/backend/" in f[0] and "/site-packages/" not in f[0]]
+        chosen = (ours or stack)[:depth]
+        return " <- ".join(f"{name} ({filename.rsplit('/', 1)[-1]}:{line})" for filename, line, name in chosen)
+
+_sampler = _Sampler()
+
+class RequestProfilerMiddleware:
+    """ASGI middleware; profiles opted-in requests and logs the slow ones"""
+
+    def __init__(self, app):
+        self.app = app
+        self.header = settings.PROFILE_HEADER.lower().encode("latin-1")
+
+    def _enabled(self, scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == self.header and settings.PROFILE_TOKEN:
+                # Timing headers and stack samples are not for anonymous clients
+                return secrets.compare_digest(value, settings.PROFILE_TOKEN.encode("latin-1"))
+        return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._enabled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(f"{scope['method']} {scope['path']}")
+        token = _current.set(profile)
+        _sampler.start(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = (time.perf_counter() - profile.started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f"app;dur={elapsed:.1f}, db;dur={profile.sql_ms:.1f}".encode()))
+                headers.append((b"x-query-count", str(len(profile.queries)).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _sampler.stop(profile)
+            _current.reset(token)
+            profile.wall_ms = (time.perf_counter() - profile.started) * 1000
+            if profile.wall_ms >= settings.PROFILE_SLOW_MS:
+                print(profile.report())
+
+@contextmanager
+def assert_max_queries(budget: int, label: str = ""):
+    """Fail if the block issues more than `budget` SQL statements.
+
+    Counts process-wide (TestClient runs the app on another thread), so use
+    it around a single request:
+
+        with assert_max_queries(2, "GET /instances/"):
+            client.get("/instances/", headers=auth)
+    """
+    counter = QueryCounter()
+    with _counters_lock:
+        _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        with _counters_lock:
+            _counters.remove(counter)
+    if counter.count > budget:
+        listing = "\n".join(f"  {i + 1}. {s}" for i, s in enumerate(counter.statements))
+        raise AssertionError(f"{label or 'block'} issued {counter.count} queries (budget {budget}):\n{listing}")
+
+def assert_query_budget(client, method: str, path: str, budget: int, **kwargs):
+    """Issue one request through a test client and enforce its query budget"""
+    with assert_max_queries(budget, f"{method.upper()} {path}"):
+        response = client.request(method, path, **kwargs)
+    return response
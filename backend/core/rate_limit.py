@@ -0,0 +1,203 @@
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import redis
+from jose import JWTError
+from starlette.concurrency import run_in_threadpool
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.net import client_ip
+from backend.core.redis_client import get_redis
+
+# Per-route rate limits, per client IP and/or per authenticated user.
+#
+# Each limit is a sliding window counter over fixed buckets of `window`
+# seconds: the previous bucket is weighted by how much of it still overlaps
+# the window. A limit "10/60+5" allows 10 requests per minute on average and
+# bursts of up to 15 within a minute, as long as the last two minutes stay
+# under 20. All limits for a request are checked and counted by one Lua
+# script (one round trip, atomic); the request only counts if it is allowed.
+#
+# If Redis is unavailable we fail open onto per-process buckets, which
+# enforce the same limits per API process until Redis is back.
+
+_CHECK = """
+local function wait_for(base, decaying, cap, frac, window)
+    if base + decaying * (1 - frac) + 1 <= cap then return 0 end
+    if base + 1 <= cap and decaying > 0 then
+        return ((1 - (cap - base - 1) / decaying) - frac) * window
+    end
+    return (1 - frac) * window
+end
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local retry = 0
+local buckets = {}
+for i, key in ipairs(KEYS) do
+    local arg = (i - 1) * 3
+    local limit, burst, window = tonumber(ARGV[arg + 1]), tonumber(ARGV[arg + 2]), tonumber(ARGV[arg + 3])
+    local idx = math.floor(now / window)
+    local frac = (now - idx * window) / window
+    local counts = redis.call('HMGET', key, idx, idx - 1, idx - 2)
+    local cur, prev, prev2 = tonumber(counts[1]) or 0, tonumber(counts[2]) or 0, tonumber(counts[3]) or 0
+    retry = math.max(retry,
+        wait_for(cur, prev, limit + burst, frac, window),
+        wait_for(cur + prev, prev2, 2 * limit, frac, window))
+    buckets[i] = {idx, window}
+end
+if retry > 0 then
+    return tostring(retry)
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HINCRBY', key, buckets[i][1], 1)
+    redis.call('HDEL', key, buckets[i][1] - 3)
+    redis.call('EXPIRE', key, buckets[i][2] * 3)
+end
+return '0'
+"""
+
+# How long to stay on local buckets after a Redis error before trying again
+REDIS_RETRY_SECONDS = 5
+LOCAL_MAX_KEYS = 50_000
+
+class Limit:
+    def __init__(self, scope: str, limit: int, window: int, burst: int = 0):
+        if scope not in ("ip", "user"):
+            raise ValueError(f"Unknown rate limit scope: {scope}")
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.burst = burst
+
+def parse_limits(spec: str) -> Dict[Tuple[str, str], List[Limit]]:
+    """Parse "POST /auth/login=ip:10/60+5;POST /billing/initiate=ip:20/60,user:5/60+3" """
+    rules: Dict[Tuple[str, str], List[Limit]] = {}
+    for entry in filter(None, (e.strip() for e in spec.split(";"))):
+        route, _, limits = entry.partition("=")
+        method, _, path = route.strip().partition(" ")
+        for item in filter(None, (i.strip() for i in limits.split(","))):
+            scope, _, rate = item.partition(":")
+            rate, _, burst = rate.partition("+")
+            limit, _, window = rate.partition("/")
+            rules.setdefault((method.upper(), path.strip().rstrip("/")), []).append(
+                Limit(scope.strip(), int(limit), int(window), int(burst or 0))
+            )
+    return rules
+
+def _wait_for(base: float, decaying: float, cap: float, frac: float, window: int) -> float:
+    if base + decaying * (1 - frac) + 1 <= cap:
+        return 0.0
+    if base + 1 <= cap and decaying > 0:
+        return ((1 - (cap - base - 1) / decaying) - frac) * window
+    return (1 - frac) * window
+
+class _LocalWindows:
+    """Same algorithm as _CHECK, in process memory (Redis fallback)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, Dict[int, int]] = {}
+
+    def check(self, checks: List[Tuple[str, Limit]]) -> float:
+        now = time.time()
+        with self.lock:
+            retry, buckets = 0.0, []
+            for key, limit in checks:
+                idx = int(now // limit.window)
+                frac = (now - idx * limit.window) / limit.window
+                counts = self.counts.get(key, {})
+                cur, prev, prev2 = counts.get(idx, 0), counts.get(idx - 1, 0), counts.get(idx - 2, 0)
+                retry = max(retry,
+                            _wait_for(cur, prev, limit.limit + limit.burst, frac, limit.window),
+                            _wait_for(cur + prev, prev2, 2 * limit.limit, frac, limit.window))
+                buckets.append((key, idx))
+            if retry > 0:
+                return retry
+            if len(self.counts) > LOCAL_MAX_KEYS:
+                self.counts.clear()
+            for key, idx in buckets:
+                counts = self.counts.setdefault(key, {})
+                counts[idx] = counts.get(idx, 0) + 1
+                for old in [i for i in counts if i < idx - 2]:
+                    del counts[old]
+            return 0.0
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing RATE_LIMITS; answers 429 with Retry-After"""
+
+    def __init__(self, app, spec: Optional[str] = None):
+        self.app = app
+        self.rules = parse_limits(settings.RATE_LIMITS if spec is None else spec)
+        self.local = _LocalWindows()
+        self._redis_down_until = 0.0
+
+    def _user_id(self, scope) -> Optional[str]:
+        from backend.core.security import decode_token
+
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                kind, _, token = value.decode("latin-1").partition(" ")
+                if kind.lower() != "bearer" or not token:
+                    return None
+                try:
+                    return decode_token(token, "access").get("sub")
+                except JWTError:
+                    return None
+        return None
+
+    def _check(self, route: str, checks: List[Tuple[str, Limit]]) -> float:
+        retry = self._retry_after(checks)
+        if retry > 0:
+            metrics.inc("nemordp_rate_limited_total", route=route)
+        return retry
+
+    def _retry_after(self, checks: List[Tuple[str, Limit]]) -> float:
+        if time.monotonic() >= self._redis_down_until:
+            args = []
+            for _, limit in checks:
+                args += [limit.limit, limit.burst, limit.window]
+            try:
+                return float(get_redis().eval(_CHECK, len(checks), *[key for key, _ in checks], *args))
+            except redis.RedisError as e:
+                print(f"Rate limiter falling back to local buckets: {e}")
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+        return self.local.check(checks)
+
+    async def __call__(self, scope, receive, send):
+        limits = None
+        if scope["type"] == "http" and settings.RATE_LIMIT_ENABLED:
+            path = scope["path"].rstrip("/")
+            limits = self.rules.get((scope["method"], path))
+        if not limits:
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {path}"
+        checks = []
+        identities = {"ip": client_ip(scope)}
+        for limit in limits:
+            if limit.scope == "user" and "user" not in identities:
+                identities["user"] = self._user_id(scope)
+            identity = identities[limit.scope]
+            if identity is not None:
+                checks.append((f"ratelimit:{route}:{limit.scope}:{limit.window}:{identity}", limit))
+
+        retry = await run_in_threadpool(self._check, route, checks) if checks else 0.0
+        if retry <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Too many requests, please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
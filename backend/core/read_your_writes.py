@@ -0,0 +1,71 @@
+from typing import Optional
+import redis
+from jose import JWTError
+from starlette.concurrency import run_in_threadpool
+from backend.core.config import settings
+from backend.core.redis_client import get_redis
+from backend.database.replicas import read_pinned, replicas
+
+# A user who just changed something must see it on the next page load, even
+# though reads go to replicas that may be a moment behind. Any successful
+# write request pins the user's reads to the primary for DB_READ_PIN_SECONDS
+# (a Redis key, so every API process agrees). Requests that write are served
+# from the primary throughout. If Redis is unavailable, reads stay on the
+# primary.
+
+PIN_PREFIX = "db:pin:"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def _user_id(scope) -> Optional[str]:
+    from backend.core.security import decode_token
+
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            kind, _, token = value.decode("latin-1").partition(" ")
+            if kind.lower() != "bearer" or not token:
+                return None
+            try:
+                return decode_token(token, "access").get("sub")
+            except JWTError:
+                return None
+    return None
+
+def _is_pinned(user_id: str) -> bool:
+    try:
+        return bool(get_redis().exists(f"{PIN_PREFIX}{user_id}"))
+    except redis.RedisError:
+        return True
+
+def _pin(user_id: str):
+    try:
+        get_redis().set(f"{PIN_PREFIX}{user_id}", 1, ex=settings.DB_READ_PIN_SECONDS)
+    except redis.RedisError:
+        pass
+
+class ReadYourWritesMiddleware:
+    """Route a user's reads to the primary right after their own writes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replicas:
+            await self.app(scope, receive, send)
+            return
+        user_id = _user_id(scope)
+        writes = scope["method"] not in SAFE_METHODS
+        pinned = writes or (user_id is not None and await run_in_threadpool(_is_pinned, user_id))
+        token = read_pinned.set(pinned)
+        try:
+            if not writes or user_id is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def _send(message):
+                if message["type"] == "http.response.start" and message["status"] < 400:
+                    await run_in_threadpool(_pin, user_id)
+                await send(message)
+
+            await self.app(scope, receive, _send)
+        finally:
+            read_pinned.reset(token)
@@ -0,0 +1,17 @@
+import redis
+from backend.core.config import settings
+
+_client = None
+
+def get_redis() -> redis.Redis:
+    """Shared Redis client (connection-pooled, safe to use from any thread)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=1.0,
+            socket_connect_timeout=1.0,
+            health_check_interval=30,
+        )
+    return _client
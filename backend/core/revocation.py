@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Optional
+import redis
+from backend.core.bloom import BloomFilter
+from backend.core.config import settings
+from backend.core.redis_client import get_redis
+
+# Revoked token ids live in Redis sets bucketed by the token's expiry hour;
+# each set expires shortly after the last token in it would have, so the
+# store never grows past the tokens that are still valid.
+#
+# Every API process keeps a Bloom filter of revoked ids in front of Redis.
+# Almost all tokens are not revoked, so almost every check is answered
+# in-process; only Bloom hits (real or ~0.1% false positives) go to Redis.
+# A daemon thread keeps the filter current: it tails a Redis stream of
+# revocations every REVOCATION_SYNC_SECONDS, and hourly builds a fresh filter
+# from the sets (shedding expired ids) and swaps it in. Requests only ever
+# read the current filter; until the first build finishes they ask Redis,
+# and let the token through if Redis can't answer.
+
+BUCKET_SECONDS = 3600
+STREAM_KEY = "revoked:stream"
+STREAM_MAXLEN = 100_000
+REBUILD_SECONDS = 3600
+
+def _bucket_key(exp: int) -> str:
+    return f"revoked:{int(exp) // BUCKET_SECONDS}"
+
+class RevocationStore:
+    def __init__(self):
+        self._lock = threading.Lock()  # guards filter reads/adds and the swap, never Redis I/O
+        self._bloom = BloomFilter(settings.REVOCATION_BLOOM_CAPACITY)
+        self._last_id = "0-0"
+        self._ready = threading.Event()  # first full build done
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background sync thread (idempotent, non-blocking)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def revoke(self, jti: str, exp: int):
+        key = _bucket_key(exp)
+        pipe = get_redis().pipeline()
+        pipe.sadd(key, jti)
+        pipe.expireat(key, (int(exp) // BUCKET_SECONDS + 1) * BUCKET_SECONDS + 60)
+        pipe.xadd(STREAM_KEY, {"jti": jti}, maxlen=STREAM_MAXLEN, approximate=True)
+        pipe.execute()
+        with self._lock:
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: str, exp: int) -> bool:
+        if self._thread is None:
+            self.start()
+        ready = self._ready.is_set()
+        if ready:
+            with self._lock:
+                if jti not in self._bloom:
+                    return False
+        try:
+            return bool(get_redis().sismember(_bucket_key(exp), jti))
+        except redis.RedisError:
+            # Can't confirm a Bloom hit: fail closed, the client can refresh.
+            # Before the first build there is no hit to confirm, and failing
+            # closed would reject every request while Redis is away.
+            return ready
+
+    def _loop(self):
+        next_rebuild = 0.0
+        while not self._stop.is_set():
+            try:
+                client = get_redis()
+                if time.monotonic() >= next_rebuild:
+                    self._rebuild(client)
+                    next_rebuild = time.monotonic() + REBUILD_SECONDS
+                else:
+                    self._tail(client)
+            except redis.RedisError as e:
+                print(f"Revocation sync failed: {e}")
+            self._stop.wait(settings.REVOCATION_SYNC_SECONDS)
+
+    def _tail(self, client: redis.Redis):
+        for _, entries in client.xread({STREAM_KEY: self._last_id}, count=10_000) or []:
+            with self._lock:
+                for entry_id, fields in entries:
+                    self._bloom.add(fields["jti"])
+                    self._last_id = entry_id
+
+    def _rebuild(self, client: redis.Redis):
+        """Build a filter from live buckets, dropping ids whose tokens have expired, then swap it in"""
+        # Stream position first, so revocations racing the scan are replayed by _tail
+        last = client.xrevrange(STREAM_KEY, count=1)
+        bloom = BloomFilter(settings.REVOCATION_BLOOM_CAPACITY)
+        for key in client.scan_iter(match="revoked:[0-9]*", count=1000):
+            for jti in client.sscan_iter(key, count=1000):
+                bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            if last:
+                self._last_id = last[0][0]
+        self._ready.set()
+
+# Refresh token families: one key per login session holding the jti of the
+# only refresh token currently valid for it. Rotation is a compare-and-set;
+# presenting an older (already rotated) token means it was stolen or
+# replayed, so the whole family is revoked.
+_ROTATE = """
+local current = redis.call('GET', KEYS[1])
+if current == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+redis.call('DEL', KEYS[1])
+return 0
+"""
+
+def _family_key(family: str) -> str:
+    return f"refresh_family:{family}"
+
+def start_family(family: str, jti: str, ttl_seconds: int):
+    get_redis().set(_family_key(family), jti, ex=ttl_seconds)
+
+def rotate_family(family: str, presented_jti: str, new_jti: str, ttl_seconds: int) -> bool:
+    """True if `presented_jti` was current and is now replaced by `new_jti`"""
+    client = get_redis()
+    return bool(client.eval(_ROTATE, 1, _family_key(family), presented_jti, new_jti, ttl_seconds))
+
+def end_family(family: Optional[str]):
+    if family:
+        get_redis().delete(_family_key(family))
+
+revocations = RevocationStore()
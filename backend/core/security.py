@@ -1,12 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Optional, Union, Any
+import uuid
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from backend.core.config import settings
-from backend.database.connection import get_db
+from backend.core.revocation import revocations
+from backend.database.connection import SessionLocal
+from backend.database.replicas import get_read_db
 from backend.models.user import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -17,32 +20,58 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode = {"exp": expire, "sub": str(subject)}
+
+    to_encode = {"exp": expire, "sub": str(subject), "type": "access", "jti": uuid.uuid4().hex}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(subject: Union[str, Any], family: str, jti: str) -> str:
+    """Long-lived token that can only be exchanged at /auth/refresh (single use)"""
+    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh", "jti": jti, "fam": family}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def decode_token(token: str, token_type: str) -> dict:
+    """Verify signature and expiry, and check the token is of the expected type"""
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    # Access tokens issued before refresh support carry no type
+    if payload.get("type", "access") != token_type:
+        raise JWTError(f"Expected a {token_type} token")
+    return payload
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(token, "access")
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
+
+    # Answered in-process by the Bloom filter unless the token may be revoked
+    jti = payload.get("jti")
+    if jti and revocations.is_revoked(jti, payload["exp"]):
+        raise credentials_exception
+
     user = db.query(User).filter(User.id == user_id).first()
+    if user is None and db.bind is not SessionLocal.kw["bind"]:
+        # Signed up moments ago and the replica hasn't caught up
+        primary = SessionLocal()
+        try:
+            user = primary.query(User).filter(User.id == user_id).first()
+        finally:
+            primary.close()
     if user is None:
         raise credentials_exception
     return user
@@ -3,12 +3,27 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./nemordp.db")
+# Streaming replicas of DATABASE_URL, comma-separated; read-only endpoints
+# are routed to them (database/replicas.py)
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+def _make_engine(url: str):
+    # Pool sizing matters for async workers: many tasks share one process
+    pool_kwargs = {} if "sqlite" in url else {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_pre_ping": True,
+    }
+    return create_engine(
+        url, connect_args={"check_same_thread": False} if "sqlite" in url else {},
+        **pool_kwargs
+    )
+
+engine = _make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+replica_engines = [_make_engine(url) for url in DATABASE_REPLICA_URLS]
+
 Base = declarative_base()
 
 def get_db():
@@ -0,0 +1,97 @@
+"""Create the schema: tables, added columns, ticket search objects and missing indexes.
+
+    python -m backend.database.init_db
+
+Runs once per deploy (the compose init-db service) instead of on import in
+every API process. Every step is idempotent, and on Postgres an advisory lock
+serialises concurrent runs. The API also runs it at startup unless
+DB_INIT_ON_STARTUP=false.
+
+Upgrading an existing database: deploy as usual. create_all() only creates
+missing tables, so columns later added to a table that already exists are
+listed in ADDED_COLUMNS and added with ALTER TABLE ... ADD COLUMN IF NOT
+EXISTS, followed by any index the models declare that is missing. A model
+change that adds a column to an existing table must append it there. Type
+changes, renames and drops are not handled; run those by hand.
+"""
+import sys
+import time
+from typing import List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from backend.database.connection import Base, engine as default_engine
+
+SCHEMA_LOCK_ID = 4_207_001  # arbitrary, shared by every init_db caller
+
+def _import_models():
+    # Tables exist in Base.metadata only once their model module is imported
+    from backend.models import (  # noqa: F401
+        archive, catalog, golden_image, order, outbox, payment, placement, rdp_instance, reconcile, renewal, telemetry,
+        ticket, usage, user,
+    )
+
+# Columns added to tables that predate them: (table, column, DDL after the type).
+# The type comes from the model. Append only.
+ADDED_COLUMNS = (
+    ("rdp_instances", "order_reference", ""),
+    ("rdp_instances", "order_id", "REFERENCES orders (id)"),
+    ("rdp_instances", "ready_at", ""),
+    ("rdp_instances", "probe_attempts", "DEFAULT 0"),
+    ("rdp_instances", "next_probe_at", ""),
+    ("orders", "region", ""),
+    ("orders", "quantity", "NOT NULL DEFAULT 1"),
+    ("orders", "completed_at", ""),
+    ("placement_decisions", "worker_rtt_ms", ""),
+    ("orders", "kind", "NOT NULL DEFAULT 'provision'"),
+    ("orders", "renews_instance_id", ""),
+    ("rdp_instances", "attempt_started_at", ""),
+)
+
+def upgrade_columns(conn) -> List[str]:
+    """Add the ADDED_COLUMNS an existing table lacks, then any missing index; returns what was added"""
+    inspector = inspect(conn)
+    if_missing = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+    present, added = {}, []
+    for table, column, extra in ADDED_COLUMNS:
+        if table not in present:
+            present[table] = {c["name"] for c in inspector.get_columns(table)}
+        if column in present[table]:
+            continue
+        ddl_type = Base.metadata.tables[table].c[column].type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {if_missing}{column} {ddl_type} {extra}".rstrip()))
+        added.append(f"{table}.{column}")
+    # create_all() skips the indexes of tables that already existed
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+    for name in added:
+        print(f"Added column {name}")
+    return added
+
+def init_db(engine: Engine = default_engine) -> float:
+    """Create everything that's missing; returns seconds taken"""
+    from backend.services.ticket_search import setup_ticket_search
+
+    started = time.perf_counter()
+    _import_models()
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+            try:
+                Base.metadata.create_all(bind=conn)
+                upgrade_columns(conn)
+                conn.commit()
+                setup_ticket_search(engine)
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID})
+                conn.commit()
+    else:
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            upgrade_columns(conn)
+        setup_ticket_search(engine)
+    return time.perf_counter() - started
+
+if __name__ == "__main__":
+    print(f"Schema ready in {init_db():.2f}s")
+    sys.exit(0)
@@ -0,0 +1,104 @@
+import itertools
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event, text
+from sqlalchemy.orm import sessionmaker
+from backend.core import metrics
+from backend.core.config import settings
+from backend.database.connection import SessionLocal, engine, replica_engines
+
+# Read routing. Endpoints that only read take get_read_db instead of get_db
+# and get a session on a replica when one is healthy:
+#
+#   pinned (the user wrote in the last DB_READ_PIN_SECONDS)  -> primary
+#   no replica with lag <= DB_REPLICA_MAX_LAG_SECONDS        -> primary
+#   otherwise                                                -> next replica
+#
+# Lag is measured on each replica at most every DB_REPLICA_LAG_CHECK_SECONDS
+# per process, by one thread while the others use the cached value. A
+# replica that can't be queried counts as unhealthy until the next check.
+# Pinning is set per request by ReadYourWritesMiddleware
+# (core/read_your_writes.py).
+
+LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"  # caught up, primary idle
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 1e9) END"
+)
+
+read_pinned: ContextVar[bool] = ContextVar("read_pinned", default=False)
+
+def _refuse_writes(session, flush_context, instances):
+    raise RuntimeError("Replica sessions are read-only; use get_db for endpoints that write")
+
+class Replica:
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        event.listen(self.sessions, "before_flush", _refuse_writes)
+        self.lag: Optional[float] = None  # None = unreachable or not checked yet
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def current_lag(self) -> Optional[float]:
+        if time.monotonic() - self._checked < settings.DB_REPLICA_LAG_CHECK_SECONDS:
+            return self.lag
+        if not self._lock.acquire(blocking=False):
+            return self.lag  # another thread is measuring
+        try:
+            if self.engine.dialect.name != "postgresql":
+                self.lag = 0.0
+            else:
+                with self.engine.connect() as conn:
+                    self.lag = float(conn.execute(LAG_SQL).scalar())
+        except Exception as e:
+            if self.lag is not None:
+                print(f"Replica {self.name} unavailable: {e}")
+            self.lag = None
+        finally:
+            self._checked = time.monotonic()
+            self._lock.release()
+        return self.lag
+
+replicas = [Replica(f"replica{i}", e) for i, e in enumerate(replica_engines)]
+_next = itertools.count()
+_routed = Counter()  # (target, reason) -> reads, reported at scrape time
+
+def read_sessionmaker():
+    """Session factory for a read: a healthy replica, else the primary"""
+    if not replicas:
+        return SessionLocal
+    if read_pinned.get():
+        _routed[("primary", "pinned")] += 1
+        return SessionLocal
+    healthy = [r for r in replicas if (lag := r.current_lag()) is not None and lag <= settings.DB_REPLICA_MAX_LAG_SECONDS]
+    if not healthy:
+        _routed[("primary", "lagging")] += 1
+        return SessionLocal
+    replica = healthy[next(_next) % len(healthy)]
+    _routed[(replica.name, "ok")] += 1
+    return replica.sessions
+
+def get_read_db():
+    db = read_sessionmaker()()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _pool_samples():
+    for name, eng in [("primary", engine)] + [(r.name, r.engine) for r in replicas]:
+        pool = eng.pool
+        for state, fn in (("size", "size"), ("checked_out", "checkedout"), ("idle", "checkedin"), ("overflow", "overflow")):
+            if hasattr(pool, fn):
+                yield "nemordp_db_pool_connections", {"engine": name, "state": state}, getattr(pool, fn)()
+    for replica in replicas:
+        yield "nemordp_db_replica_lag_seconds", {"engine": replica.name}, -1 if replica.lag is None else replica.lag
+    for (target, reason), count in _routed.items():
+        yield "nemordp_db_reads_routed", {"target": target, "reason": reason}, count
+
+metrics.register_collector(_pool_samples)
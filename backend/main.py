@@ -1,12 +1,50 @@
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from backend.routers import auth, billing, instances, webhooks, support, admin
-from backend.database.connection import engine, Base
+from backend.database.init_db import init_db
+from backend.core import metrics
+from backend.core.health import monitor
+from backend.core.revocation import revocations
+from backend.core.compression import CompressionMiddleware
+from backend.core.config import settings
+from backend.core.pagination import NEXT_CURSOR_HEADER
+from backend.core.profiling import RequestProfilerMiddleware
+from backend.core.rate_limit import RateLimitMiddleware
+from backend.core.read_your_writes import ReadYourWritesMiddleware
+from backend.services.chains import check_config as check_chain_config
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema creation used to run on import in every process; in production
+    # it's the init-db step of the deploy and this is switched off
+    timings = {"import": time.perf_counter() - _import_started}
+    check_chain_config()  # refuse to take crypto payments nobody watches
+    if settings.DB_INIT_ON_STARTUP:
+        timings["init_db"] = await run_in_threadpool(init_db)
+    monitor.start()
+    revocations.start()  # loads the revoked-token filter off the request path
+    timings["total"] = time.perf_counter() - _import_started
+    for phase, seconds in timings.items():
+        metrics.observe("nemordp_api_startup_seconds", seconds, phase=phase)
+    app.state.startup_seconds = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+    print(f"API started in {timings['total']:.2f}s {app.state.startup_seconds}")
+    yield
+    monitor.stop()
+    revocations.stop()
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+app = FastAPI(title="NemoRDP API", version="1.0.0", lifespan=lifespan)
 
-app = FastAPI(title="NemoRDP API", version="1.0.0")
+# Per-route limits from RATE_LIMITS; added before CORS so 429s carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
+# Reads go to replicas (DATABASE_REPLICA_URLS) except right after the user's own writes
+app.add_middleware(ReadYourWritesMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -15,8 +53,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Opt-in per request (X-Profile header) or by PROFILE_SAMPLE_RATE
+app.add_middleware(RequestProfilerMiddleware)
+
+# gzip/br for large JSON and text responses
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+
 app.include_router(auth.router)
 app.include_router(billing.router)
 app.include_router(instances.router)
@@ -29,5 +74,19 @@ async def root():
     return {"message": "Welcome to NemoRDP API", "status": "operational"}
 
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
+    """Liveness: the process is up and serving; says nothing about dependencies"""
     return {"status": "healthy"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness from the last background check round; 503 if a critical dependency is down"""
+    ready, body = monitor.readiness()
+    body["startup_seconds"] = getattr(app.state, "startup_seconds", None)
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus scrape endpoint (sync: reads Redis in the threadpool)"""
+    return metrics.render()
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, PrimaryKeyConstraint
+from backend.database.connection import Base
+from datetime import datetime
+
+# Cold copies of rows moved out of the hot tables by the archival job
+# (services/archive.py). No foreign keys, so users and orders can still be
+# deleted, and on Postgres both tables are range-partitioned by month of
+# created_at. The partition key has to be part of the primary key.
+
+class RDPInstanceArchive(Base):
+    """A terminated, expired or failed instance; credentials are not kept"""
+    __tablename__ = "rdp_instances_archive"
+
+    id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    provider = Column(String, nullable=False)
+    provider_id = Column(String, nullable=False)
+    ip_address = Column(String, nullable=True)
+    username = Column(String, nullable=True)
+    os_type = Column(String, nullable=False)
+    plan = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    order_reference = Column(String, nullable=True)
+    order_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    ready_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "created_at", name="pk_rdp_instances_archive"),
+        Index("ix_rdp_instances_archive_user", "user_id", "created_at", "id"),
+        Index("ix_rdp_instances_archive_order", "order_reference"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+class TicketArchive(Base):
+    __tablename__ = "tickets_archive"
+
+    id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    subject = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "created_at", name="pk_tickets_archive"),
+        Index("ix_tickets_archive_user", "user_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
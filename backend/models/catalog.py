@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON, UniqueConstraint
+from backend.database.connection import Base
+from datetime import datetime
+
+class CatalogItem(Base):
+    """A provider plan, region or OS image as last seen by the catalog sync"""
+    __tablename__ = "catalog_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String, nullable=False)  # 'vultr' or 'contabo'
+    kind = Column(String, nullable=False)  # 'plan', 'region' or 'image'
+    ref = Column(String, nullable=False)  # provider's id (plan id, region id, os/image id)
+    name = Column(String, nullable=True)
+    # plan: {"vcpu", "ram_mb", "disk_gb", "monthly_cost", "regions": [in-stock region ids]}
+    # image: {"family", "os_type"}; region: {"city", "country", "continent"}
+    data = Column(JSON, nullable=False, default=dict)
+    available = Column(Boolean, default=True)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("provider", "kind", "ref", name="uq_catalog_item"),
+    )
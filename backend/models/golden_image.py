@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from backend.database.connection import Base
+from datetime import datetime
+
+class GoldenImage(Base):
+    """A versioned pre-built desktop image registered with a provider"""
+    __tablename__ = "golden_images"
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String, nullable=False)
+    region = Column(String, nullable=True)  # NULL: usable in every region of the provider
+    os_type = Column(String, nullable=False)
+    plan = Column(String, nullable=True)  # NULL: fits every plan of the OS
+    version = Column(Integer, nullable=False)
+    recipe = Column(String, nullable=False)  # hash of build recipe + artifact, see services/images.py
+    source_url = Column(String, nullable=True)
+    image_ref = Column(String, nullable=True)  # provider image/snapshot id once registered
+    status = Column(String, default="building")  # building, ready, retired, deleted, failed
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    ready_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_golden_images_lookup", "provider", "os_type", "status", "version"),
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from backend.database.connection import Base
+from datetime import datetime
+
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reference = Column(String, unique=True, index=True, nullable=False)  # payment reference / order_id
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    user_email = Column(String, nullable=False)
+    plan = Column(String, nullable=False)
+    os_type = Column(String, nullable=False)  # 'windows' or 'linux'
+    region = Column(String, nullable=True)  # provider region chosen at checkout (placement)
+    payment_method = Column(String, nullable=False)  # 'paystack' or 'crypto'
+    amount = Column(Integer, nullable=False)  # minor units (kobo), for all seats
+    quantity = Column(Integer, nullable=False, default=1)  # seats; bulk orders (> 1) get one instance each
+    status = Column(String, default="pending", index=True)  # pending, waitlisted, queued, completed (bulk, renewal), expired (unpaid crypto), refund_due (renewal of a gone instance)
+    kind = Column(String, nullable=False, default="provision")  # provision: new servers; renewal: one more period
+    # Renewal orders only. No foreign key: the archive job deletes dead instances
+    # (and rdp_instances already references orders)
+    renews_instance_id = Column(Integer, nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    paid_at = Column(DateTime, nullable=True)
+    queued_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)  # bulk: every seat active or failed
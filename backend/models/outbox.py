@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Index
+from backend.database.connection import Base
+from datetime import datetime
+
+class OutboxMessage(Base):
+    """A side effect committed with the state change that caused it; delivered by relay_outbox"""
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event = Column(String, nullable=False)  # e.g. 'instance.ready'
+    destination = Column(String, nullable=False)  # 'email', 'webhook' or 'pubsub'
+    dedup_key = Column(String, unique=True, nullable=False)  # '{destination}:{event}:{subject id}'
+    payload = Column(JSON, nullable=False, default=dict)  # ids only, never credentials
+    status = Column(String, default="pending")  # pending, sent, dead
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, default=datetime.utcnow)  # next delivery attempt
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_outbox_messages_relay", "status", "available_at", "id"),
+    )
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, Numeric, UniqueConstraint
+from backend.database.connection import Base
+from datetime import datetime
+
+class DepositAddress(Base):
+    """One HD-derived crypto deposit address; used for at most one order"""
+    __tablename__ = "deposit_addresses"
+    __table_args__ = (
+        UniqueConstraint("currency", "derivation_index", name="uq_deposit_currency_index"),
+        Index("ix_deposit_addresses_pool", "currency", "status", "derivation_index"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String, nullable=False)  # BTC, ETH, USDT
+    chain = Column(String, nullable=False)  # bitcoin, ethereum
+    derivation_index = Column(Integer, nullable=False)  # <xpub>/<branch>/<index>
+    address = Column(String, unique=True, nullable=False)
+    status = Column(String, default="available", nullable=False)  # available, assigned, paid, expired
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True, index=True)
+    # Base units (satoshi, wei, USDT micro-units); wei amounts overflow BIGINT
+    expected_amount = Column(Numeric(78, 0), nullable=True)
+    received_amount = Column(Numeric(78, 0), nullable=True)  # confirmed, as of the last check
+    created_at = Column(DateTime, default=datetime.utcnow)
+    assigned_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)  # quote validity; late payments are still watched for a while
+    paid_at = Column(DateTime, nullable=True)
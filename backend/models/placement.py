@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float
+from backend.database.connection import Base
+from datetime import datetime
+
+class PlacementDecision(Base):
+    """Where an order was placed and why, for comparing estimated RTT with what the worker measured"""
+    __tablename__ = "placement_decisions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_reference = Column(String, unique=True, index=True, nullable=False)
+    user_id = Column(Integer, index=True)
+    plan = Column(String, nullable=False)
+    provider = Column(String, nullable=False)
+    region = Column(String, nullable=False)
+    reason = Column(String, nullable=False)  # latency, override, default
+    client_country = Column(String, nullable=True)
+    client_continent = Column(String, nullable=True)
+    client_asn = Column(Integer, nullable=True)
+    estimated_rtt_ms = Column(Float, nullable=True)
+    worker_rtt_ms = Column(Float, nullable=True)  # TCP connect time from the probing worker, not the client
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
 from backend.database.connection import Base
 from datetime import datetime
 
@@ -14,6 +15,23 @@ class RDPInstance(Base):
     password = Column(String, nullable=True)
     os_type = Column(String, nullable=False)  # 'windows' or 'linux'
     plan = Column(String, nullable=False)  # 'basic', 'performance'
+    # provisioning until RDP answers, then active. Bulk seats start queued
+    # (waiting for the order's window) then scheduled (in the scheduler).
     status = Column(String, default="provisioning")
+    order_reference = Column(String, nullable=True, index=True)  # bulk seats: "<order reference>-<seat>"
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True, index=True)  # bulk seats only
     created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime, nullable=True)
+    ready_at = Column(DateTime, nullable=True)  # first successful RDP probe
+    expires_at = Column(DateTime, nullable=True)  # set on activation, moved by renewals
+
+    # Readiness prober backoff (services/readiness.py)
+    probe_attempts = Column(Integer, default=0)
+    next_probe_at = Column(DateTime, nullable=True)
+    attempt_started_at = Column(DateTime, nullable=True)  # provider call of the current attempt; the probe deadline runs from here
+
+    user = relationship("User", back_populates="rdp_instances")
+
+    __table_args__ = (
+        Index("ix_rdp_instances_probe", "status", "next_probe_at"),
+        Index("ix_rdp_instances_expiry", "status", "expires_at"),  # reminder and expiry range scans
+    )
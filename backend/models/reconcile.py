@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON
+from backend.database.connection import Base
+from datetime import datetime
+
+class ReconcileRun(Base):
+    """One reconciler pass over a provider: what drifted and what was repaired"""
+    __tablename__ = "reconcile_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String, nullable=False, index=True)
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
+    duration_ms = Column(Float, nullable=True)
+    remote_count = Column(Integer, default=0)
+    local_count = Column(Integer, default=0)
+    # Drift counts by kind: orphaned, leaked, missing, ip_changed, duplicate
+    drift = Column(JSON, nullable=False, default=dict)
+    # Repairs applied by kind, plus what was held back (e.g. deletes when disabled)
+    repaired = Column(JSON, nullable=False, default=dict)
+    samples = Column(JSON, nullable=False, default=dict)  # a few ids per kind, for follow-up
+    error = Column(String, nullable=True)
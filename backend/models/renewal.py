@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint, Index
+from backend.database.connection import Base
+from datetime import datetime
+
+class ExpiryReminder(Base):
+    """One reminder for one instance, window and expiry date; the row is the dedup record"""
+    __tablename__ = "expiry_reminders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    instance_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    window_hours = Column(Integer, nullable=False)  # one of RENEWAL_REMINDER_HOURS
+    expires_at = Column(DateTime, nullable=False)  # a renewal moves expires_at, so it gets fresh reminders
+    status = Column(String, default="pending", nullable=False)  # pending, sent, skipped (renewed/gone), failed
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("instance_id", "window_hours", "expires_at", name="uq_expiry_reminder"),
+        Index("ix_expiry_reminders_pending", "status", "user_id"),
+    )
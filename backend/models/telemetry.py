@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Float, PrimaryKeyConstraint
+from backend.database.connection import Base
+
+class InstanceMetric(Base):
+    """One bucket of one metric for one instance.
+
+    resolution 0 is a raw sample (count 1); 300 and 3600 are the 5-minute and
+    hourly tiers downsampled from it. Every tier keeps count/sum/min/max so
+    averages stay exact when buckets are merged again.
+    """
+    __tablename__ = "instance_metrics"
+
+    instance_id = Column(Integer, nullable=False)
+    metric = Column(String(16), nullable=False)  # see services/telemetry.METRICS
+    resolution = Column(SmallInteger, nullable=False)  # bucket width in seconds, 0 = raw
+    ts = Column(DateTime, nullable=False)  # bucket start (sample time for raw)
+    count = Column(Integer, nullable=False, default=1)
+    sum = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Chart reads are one range scan: instance, metric, tier, time
+        PrimaryKeyConstraint("instance_id", "metric", "resolution", "ts", name="pk_instance_metrics"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from backend.database.connection import Base
@@ -15,6 +15,14 @@ class Ticket(Base):
     
     user = relationship("User", back_populates="tickets")
 
+    # Keyset pagination: a user's tickets newest first, and the admin queue
+    # (per status, oldest first). Full-text search lives outside the model,
+    # see services/ticket_search.py.
+    __table_args__ = (
+        Index("ix_tickets_user_created", "user_id", "created_at", "id"),
+        Index("ix_tickets_status_created", "status", "created_at", "id"),
+    )
+
 # Update User model to include relation (we can do this loosely or update User model file)
 # For now, let's assume we might need to update User model if we want back_populates to work perfectly, 
 # but often it's not strictly required unless we access user.tickets.
@@ -0,0 +1,70 @@
+from sqlalchemy import Column, Integer, String, DateTime, Date, Float, UniqueConstraint, Index
+from backend.database.connection import Base
+from datetime import datetime
+
+class InstanceEvent(Base):
+    """A lifecycle event for an instance; re-recording one with another time is a correction"""
+    __tablename__ = "instance_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    instance_id = Column(Integer, nullable=False, index=True)
+    event = Column(String, nullable=False)  # provisioning, active, terminated, expired, failed
+    occurred_at = Column(DateTime, nullable=False)
+    recorded_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("instance_id", "event", name="uq_instance_event"),
+    )
+
+class UsageInterval(Base):
+    """When an instance was billable (active until terminated/expired/failed), derived from its events"""
+    __tablename__ = "usage_intervals"
+
+    instance_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    plan = Column(String, nullable=False)
+    provider = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=True, index=True)
+    ended_at = Column(DateTime, nullable=True, index=True)  # NULL while running
+
+class UsageDirtyHour(Base):
+    """An hour whose rollup must be recomputed because a late or corrected event touched it"""
+    __tablename__ = "usage_dirty_hours"
+
+    hour = Column(DateTime, primary_key=True)
+    marked_at = Column(DateTime, default=datetime.utcnow)
+
+class UsageHourly(Base):
+    __tablename__ = "usage_hourly"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hour = Column(DateTime, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    plan = Column(String, nullable=False)
+    provider = Column(String, nullable=False)
+    instances = Column(Integer, nullable=False, default=0)
+    instance_seconds = Column(Float, nullable=False, default=0)
+    revenue_kobo = Column(Float, nullable=False, default=0)  # recognised: price spread over the billing period
+    cost_kobo = Column(Float, nullable=False, default=0)  # provider list price, when the catalog knows it
+
+    __table_args__ = (
+        UniqueConstraint("hour", "user_id", "plan", "provider", name="uq_usage_hourly"),
+    )
+
+class UsageDaily(Base):
+    __tablename__ = "usage_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    plan = Column(String, nullable=False)
+    provider = Column(String, nullable=False)
+    instances = Column(Integer, nullable=False, default=0)  # most instances running in any one hour of the day
+    instance_seconds = Column(Float, nullable=False, default=0)
+    revenue_kobo = Column(Float, nullable=False, default=0)
+    cost_kobo = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "user_id", "plan", "provider", name="uq_usage_daily"),
+        Index("ix_usage_daily_user_day", "user_id", "day"),
+    )
@@ -1,16 +1,30 @@
-import httpx
 import base64
 import asyncio
-from typing import Dict
+import time
+import uuid
+from typing import Dict, List, Optional
 import os
+from backend.core.http import get_http_client
 
 class ContaboProvider:
+    # Tokens are shared by every provider instance in the process, keyed by
+    # client id, so each task doesn't pay for a fresh OAuth round trip.
+    _token_cache: Dict[str, tuple] = {}
+
     def __init__(self, client_id: str = None, client_secret: str = None):
         self.client_id = client_id or os.getenv("CONTABO_CLIENT_ID")
         self.client_secret = client_secret or os.getenv("CONTABO_CLIENT_SECRET")
         self.base_url = "https://api.contabo.com/v1"
         self.token = None
 
+    async def _ensure_token(self) -> str:
+        """Return a cached access token, refreshing it shortly before expiry"""
+        cached = self._token_cache.get(self.client_id)
+        if cached and cached[1] > time.monotonic():
+            self.token = cached[0]
+            return self.token
+        return await self.get_access_token()
+
     async def get_access_token(self) -> str:
         """Get OAuth2 access token"""
         auth_string = f"{self.client_id}:{self.client_secret}"
@@ -24,21 +38,52 @@ class ContaboProvider:
         
         data = {"grant_type": "client_credentials"}
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/auth/oauth/token",
-                data=data,
-                headers=headers
+        client = get_http_client()
+        response = await client.post(
+            f"{self.base_url}/auth/oauth/token",
+            data=data,
+            headers=headers
+        )
+        
+        if response.status_code == 200:
+            body = response.json()
+            self.token = body["access_token"]
+            expires_in = int(body.get("expires_in", 300))
+            self._token_cache[self.client_id] = (self.token, time.monotonic() + expires_in - 30)
+            return self.token
+        else:
+            raise Exception("Failed to get Contabo access token")
+
+    async def list_images(self) -> List[Dict]:
+        """Standard OS images (Contabo has no API for products or regions)"""
+        if not self.client_id or not self.client_secret:
+            return []
+        await self._ensure_token()
+        client = get_http_client()
+        images, page = [], 1
+        while True:
+            response = await client.get(
+                f"{self.base_url}/compute/images",
+                params={"standardImage": "true", "size": 100, "page": page},
+                headers={"Authorization": f"Bearer {self.token}", "x-request-id": str(uuid.uuid4())}
             )
-            
-            if response.status_code == 200:
-                self.token = response.json()["access_token"]
-                return self.token
-            else:
-                raise Exception("Failed to get Contabo access token")
+            if response.status_code != 200:
+                raise Exception(f"Contabo API error: {response.text}")
+            body = response.json()
+            images.extend(body.get("data", []))
+            if page >= body.get("_pagination", {}).get("totalPages", 1):
+                return images
+            page += 1
+
+    async def create_linux_instance(
+        self, order_id: str, product_id: str = "VPS-1-SSD-20", region: str = "EU", image_id: str = "ubuntu-22.04",
+        user_data: Optional[str] = None, password: Optional[str] = None
+    ) -> Dict:
+        """Create Ubuntu Desktop RDP instance.
 
-    async def create_linux_instance(self, order_id: str) -> Dict:
-        """Create Ubuntu Desktop RDP instance"""
+        Product/region/image come from the catalog; `user_data` (cloud-init)
+        and the `password` it sets come from services/images.py.
+        """
         if not self.client_id or not self.client_secret:
              # Mock for development
              print("CONTABO_CLIENT credentials not found. Returning mock instance.")
@@ -51,74 +96,150 @@ class ContaboProvider:
                 "status": "active"
             }
 
-        if not self.token:
-            await self.get_access_token()
+        await self._ensure_token()
+
+        # A retried task may have created the VM already; pick it back up
+        existing = await self.find_instance(f"nemordp-{order_id}")
+        if existing:
+            return await self._wait_for_linux_ready(existing, password)
             
         headers = {
             "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json"
+            "Content-Type": "application/json",
+            "x-request-id": str(uuid.uuid4())
         }
         
         payload = {
-            "imageId": "ubuntu-22.04",
-            "productId": "VPS-1-SSD-20",  # 1 vCPU, 4GB RAM - check productId validity
-            "region": "EU",
+            "imageId": image_id,
+            "productId": product_id,
+            "region": region,
             "period": 1,
             "displayName": f"nemordp-{order_id}",
-            "defaultUser": "ubuntu",
-            "userData": self._get_ubuntu_desktop_script()
+            "defaultUser": "ubuntu"
         }
+        if user_data:
+            payload["userData"] = user_data
+        
+        client = get_http_client()
+        response = await client.post(
+            f"{self.base_url}/compute/instances",
+            json=payload,
+            headers=headers,
+            timeout=60.0
+        )
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+        if response.status_code == 201:
+            instance = response.json()["data"][0]
+            return await self._wait_for_linux_ready(instance["instanceId"], password)
+        else:
+            raise Exception(f"Contabo API error: {response.text}")
+
+    async def list_instances(self, name_prefix: str = "nemordp-") -> List[Dict]:
+        """Every instance whose display name starts with the prefix, normalised for the reconciler"""
+        if not self.client_id or not self.client_secret:
+            return []
+        await self._ensure_token()
+        client = get_http_client()
+
+        async def _page(page: int) -> Dict:
+            response = await client.get(
                 f"{self.base_url}/compute/instances",
-                json=payload,
-                headers=headers,
-                timeout=60.0
+                params={"size": 100, "page": page},
+                headers={"Authorization": f"Bearer {self.token}", "x-request-id": str(uuid.uuid4())}
             )
-            
-            if response.status_code == 201:
-                instance = response.json()["data"][0]
-                return await self._wait_for_linux_ready(instance["instanceId"])
-            else:
+            if response.status_code != 200:
                 raise Exception(f"Contabo API error: {response.text}")
+            return response.json()
 
-    async def _wait_for_linux_ready(self, instance_id: str) -> Dict:
-        # Simplification: In a real scenario, we'd poll similar to Vultr
-        # For Contabo, provisioning might take longer, so typically we just return status "provisioning"
-        # But for this abstracted methods, let's assume we wait or return partial data
-        await asyncio.sleep(10) 
-        return {
-             "provider_id": str(instance_id),
-             "ip_address": "Pending", # Contabo might take time to assign IP
-             "username": "ubuntu",
-             "password": "CheckEmailOrReset", # Contabo often sends via email or requires reset
-             "status": "provisioning"
-        }
+        # Page numbers are known after the first page, so fetch the rest at once
+        first = await _page(1)
+        total_pages = first.get("_pagination", {}).get("totalPages", 1)
+        rest = await asyncio.gather(*(_page(p) for p in range(2, total_pages + 1)))
+        instances = [i for body in (first, *rest) for i in body.get("data", [])]
+        return [{
+            "provider_id": str(i["instanceId"]),
+            "label": i.get("displayName", ""),
+            "ip_address": (i.get("ipConfig") or {}).get("v4", {}).get("ip"),
+            "running": i.get("status") == "running",
+            "created_at": i.get("createdDate"),
+        } for i in instances if (i.get("displayName") or "").startswith(name_prefix)]
+
+    async def find_instance(self, display_name: str) -> Optional[str]:
+        """Id of an instance with this display name, if one exists"""
+        client = get_http_client()
+        response = await client.get(
+            f"{self.base_url}/compute/instances",
+            params={"displayName": display_name},
+            headers={"Authorization": f"Bearer {self.token}", "x-request-id": str(uuid.uuid4())}
+        )
+        if response.status_code != 200:
+            raise Exception(f"Contabo API error: {response.text}")
+        instances = response.json().get("data", [])
+        return str(instances[0]["instanceId"]) if instances else None
 
-    def _get_ubuntu_desktop_script(self) -> str:
-        """Cloud-init script for Ubuntu Desktop with RDP"""
-        return """#cloud-config
-packages:
-  - ubuntu-desktop-minimal
-  - xrdp
-  - firefox
-  - code
-
-runcmd:
-  - systemctl enable xrdp
-  - systemctl start xrdp
-  - ufw allow 3389
-  - echo 'ubuntu:NemoRDP2024!' | chpasswd
-  - adduser ubuntu sudo
-  - sed -i 's/^#*WaylandEnable=false/WaylandEnable=false/' /etc/gdm3/custom.conf
-  - ufw allow 3389
-  - echo 'ubuntu:NemoRDP2024!' | chpasswd
-  - adduser ubuntu sudo
-  - sed -i 's/^#*WaylandEnable=false/WaylandEnable=false/' /etc/gdm3/custom.conf
-  - systemctl restart gdm3
-  - reboot
-"""
+    async def _wait_for_linux_ready(self, instance_id: str, password: Optional[str] = None) -> Dict:
+        """Wait until the instance is running with an IPv4 address.
+
+        Cloud-init is still setting up the desktop at that point; the readiness
+        prober activates the instance once xrdp answers.
+        """
+        client = get_http_client()
+        for _ in range(60):  # 10 minutes max
+            response = await client.get(
+                f"{self.base_url}/compute/instances/{instance_id}",
+                headers={"Authorization": f"Bearer {self.token}", "x-request-id": str(uuid.uuid4())}
+            )
+            if response.status_code == 200:
+                instance = response.json()["data"][0]
+                ip = (instance.get("ipConfig") or {}).get("v4", {}).get("ip")
+                if instance.get("status") == "running" and ip:
+                    return {
+                        "provider_id": str(instance_id),
+                        "ip_address": ip,
+                        "username": "ubuntu",
+                        "password": password or "CheckEmailOrReset", # set by our cloud-init when we pass one
+                        "status": "provisioning"
+                    }
+            elif response.status_code == 401:
+                await self.get_access_token()
+            await asyncio.sleep(10)
+
+        raise Exception("Timeout waiting for instance to be ready")
+
+    async def create_custom_image(self, name: str, url: str, version: str, description: str = "") -> str:
+        """Register a custom image that Contabo downloads from `url`; returns its imageId"""
+        await self._ensure_token()
+        client = get_http_client()
+        response = await client.post(
+            f"{self.base_url}/compute/images",
+            json={"name": name, "description": description, "url": url, "osType": "Linux", "version": version},
+            headers={"Authorization": f"Bearer {self.token}", "x-request-id": str(uuid.uuid4())},
+            timeout=60.0
+        )
+        if response.status_code != 201:
+            raise Exception(f"Contabo API error: {response.text}")
+        return response.json()["data"][0]["imageId"]
+
+    async def get_image(self, image_id: str) -> Dict:
+        """Image details; custom images report status downloading/downloaded/error"""
+        await self._ensure_token()
+        client = get_http_client()
+        response = await client.get(
+            f"{self.base_url}/compute/images/{image_id}",
+            headers={"Authorization": f"Bearer {self.token}", "x-request-id": str(uuid.uuid4())}
+        )
+        if response.status_code != 200:
+            raise Exception(f"Contabo API error: {response.text}")
+        return response.json()["data"][0]
+
+    async def delete_image(self, image_id: str) -> bool:
+        await self._ensure_token()
+        client = get_http_client()
+        response = await client.delete(
+            f"{self.base_url}/compute/images/{image_id}",
+            headers={"Authorization": f"Bearer {self.token}", "x-request-id": str(uuid.uuid4())}
+        )
+        return response.status_code == 204
 
     async def reboot_instance(self, instance_id: str) -> bool:
         """Reboot instance"""
@@ -126,37 +247,35 @@ runcmd:
             return True
         
         # Note: Contabo API needs Token here, so ensure token is refreshed if expired
-        if not self.token:
-             await self.get_access_token()
+        await self._ensure_token()
              
         headers = {
             "Authorization": f"Bearer {self.token}",
              "x-trace-id": "reboot-trace"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/compute/instances/{instance_id}/actions/restart",
-                headers=headers
-            )
-            return response.status_code == 201
+        client = get_http_client()
+        response = await client.post(
+            f"{self.base_url}/compute/instances/{instance_id}/actions/restart",
+            headers=headers
+        )
+        return response.status_code == 201
 
     async def delete_instance(self, instance_id: str) -> bool:
         """Delete instance"""
         if not self.client_id:
             return True
             
-        if not self.token:
-             await self.get_access_token()
+        await self._ensure_token()
 
         headers = {
             "Authorization": f"Bearer {self.token}",
              "x-trace-id": "delete-trace"
         }
         
-        async with httpx.AsyncClient() as client:
-             response = await client.delete(
-                 f"{self.base_url}/compute/instances/{instance_id}",
-                 headers=headers
-             )
-             return response.status_code == 204
+        client = get_http_client()
+        response = await client.delete(
+            f"{self.base_url}/compute/instances/{instance_id}",
+            headers=headers
+        )
+        return response.status_code == 204
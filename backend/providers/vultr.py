@@ -1,7 +1,7 @@
-import httpx
 import asyncio
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import os
+from backend.core.http import get_http_client
 
 class VultrProvider:
     def __init__(self, api_key: str = None):
@@ -12,8 +12,49 @@ class VultrProvider:
             "Content-Type": "application/json"
         }
 
-    async def create_windows_instance(self, order_id: str) -> Dict:
-        """Create Windows Server 2022 RDP instance"""
+    async def _get_paged(self, path: str, key: str, params: Optional[Dict] = None) -> List[Dict]:
+        """GET every page of a Vultr list endpoint"""
+        client = get_http_client()
+        params = {"per_page": 500, **(params or {})}
+        items = []
+        while True:
+            response = await client.get(f"{self.base_url}{path}", params=params, headers=self.headers)
+            if response.status_code != 200:
+                raise Exception(f"Vultr API error: {response.text}")
+            body = response.json()
+            items.extend(body.get(key, []))
+            cursor = body.get("meta", {}).get("links", {}).get("next")
+            if not cursor:
+                return items
+            params = {**params, "cursor": cursor}
+
+    async def list_plans(self) -> List[Dict]:
+        return await self._get_paged("/plans", "plans", {"type": "vc2"}) if self.api_key else []
+
+    async def list_regions(self) -> List[Dict]:
+        return await self._get_paged("/regions", "regions") if self.api_key else []
+
+    async def list_os(self) -> List[Dict]:
+        return await self._get_paged("/os", "os") if self.api_key else []
+
+    async def region_availability(self, region: str) -> List[str]:
+        """Plan ids currently in stock in a region"""
+        if not self.api_key:
+            return []
+        client = get_http_client()
+        response = await client.get(
+            f"{self.base_url}/regions/{region}/availability",
+            params={"type": "vc2"},
+            headers=self.headers
+        )
+        if response.status_code != 200:
+            raise Exception(f"Vultr API error: {response.text}")
+        return response.json().get("available_plans", [])
+
+    async def create_windows_instance(
+        self, order_id: str, plan: str = "vc2-2c-4gb", region: str = "ewr", os_id: int = 477
+    ) -> Dict:
+        """Create a Windows RDP instance (plan/region/os_id come from the catalog)"""
         if not self.api_key:
              # Mock for development if no key
              print("VULTR_API_KEY not found. Returning mock instance.")
@@ -26,10 +67,15 @@ class VultrProvider:
                 "status": "active"
             }
 
+        # A retried task may have created the VM already; pick it back up
+        existing = await self.find_instance(f"nemordp-{order_id}")
+        if existing:
+            return await self._wait_for_instance_ready(existing)
+
         payload = {
-            "region": "ewr",  # New Jersey
-            "plan": "vc2-2c-4gb",  # 2 vCPU, 4GB RAM
-            "os_id": 477,  # Windows Server 2022 (Standard) - Check ID if changed
+            "region": region,
+            "plan": plan,
+            "os_id": int(os_id),
             "label": f"nemordp-{order_id}",
             "hostname": f"nemordp-{order_id}",
             "enable_ipv6": False,
@@ -37,46 +83,74 @@ class VultrProvider:
             "ddos_protection": False
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/instances",
-                json=payload,
-                headers=self.headers,
-                timeout=30.0
-            )
-            
-            if response.status_code == 202:
-                instance = response.json()["instance"]
-                return await self._wait_for_instance_ready(instance["id"])
-            else:
-                raise Exception(f"Vultr API error: {response.text}")
+        client = get_http_client()
+        response = await client.post(
+            f"{self.base_url}/instances",
+            json=payload,
+            headers=self.headers,
+            timeout=30.0
+        )
+        
+        if response.status_code == 202:
+            instance = response.json()["instance"]
+            return await self._wait_for_instance_ready(instance["id"])
+        else:
+            raise Exception(f"Vultr API error: {response.text}")
+
+    async def list_instances(self, label_prefix: str = "nemordp-") -> List[Dict]:
+        """Every instance whose label starts with the prefix, normalised for the reconciler"""
+        if not self.api_key:
+            return []
+        instances = await self._get_paged("/instances", "instances")
+        return [{
+            "provider_id": i["id"],
+            "label": i.get("label", ""),
+            "ip_address": i.get("main_ip") if i.get("main_ip") not in (None, "", "0.0.0.0") else None,
+            "running": i.get("power_status") == "running",
+            "created_at": i.get("date_created"),
+        } for i in instances if (i.get("label") or "").startswith(label_prefix)]
+
+    async def find_instance(self, label: str) -> Optional[str]:
+        """Id of an instance with this label, if one exists"""
+        instances = await self._get_paged("/instances", "instances", {"label": label})
+        return instances[0]["id"] if instances else None
+
+    async def get_bandwidth(self, instance_id: str) -> Dict[str, Dict]:
+        """Bytes in/out per day (YYYY-MM-DD), as Vultr accounts them for billing"""
+        client = get_http_client()
+        response = await client.get(f"{self.base_url}/instances/{instance_id}/bandwidth", headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(f"Vultr API error: {response.text}")
+        return response.json().get("bandwidth", {})
 
     async def _wait_for_instance_ready(self, instance_id: str) -> Dict:
         """Wait for instance to be ready and get credentials"""
         max_attempts = 30  # 5 minutes max
         attempt = 0
         
+        client = get_http_client()
         while attempt < max_attempts:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/instances/{instance_id}",
-                    headers=self.headers
-                )
+            response = await client.get(
+                f"{self.base_url}/instances/{instance_id}",
+                headers=self.headers
+            )
+            
+            if response.status_code == 200:
+                instance = response.json()["instance"]
                 
-                if response.status_code == 200:
-                    instance = response.json()["instance"]
+                if (instance["server_status"] == "ok" and 
+                    instance["main_ip"] and 
+                    instance["main_ip"] != "0.0.0.0"):
                     
-                    if (instance["server_status"] == "ok" and 
-                        instance["main_ip"] and 
-                        instance["main_ip"] != "0.0.0.0"):
-                        
-                        return {
-                            "provider_id": instance_id,
-                            "ip_address": instance["main_ip"],
-                            "username": "Administrator",
-                            "password": instance.get("default_password", ""),
-                            "status": "active"
-                        }
+                    # Booted, but Windows may not accept RDP yet: the readiness
+                    # prober activates it once port 3389 answers
+                    return {
+                        "provider_id": instance_id,
+                        "ip_address": instance["main_ip"],
+                        "username": "Administrator",
+                        "password": instance.get("default_password", ""),
+                        "status": "provisioning"
+                    }
             
             await asyncio.sleep(10)  # Wait 10 seconds
             attempt += 1
@@ -88,21 +162,21 @@ class VultrProvider:
         if not self.api_key:
             return True
 
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{self.base_url}/instances/{instance_id}",
-                headers=self.headers
-            )
-            return response.status_code == 204
+        client = get_http_client()
+        response = await client.delete(
+            f"{self.base_url}/instances/{instance_id}",
+            headers=self.headers
+        )
+        return response.status_code == 204
 
     async def reboot_instance(self, instance_id: str) -> bool:
         """Reboot instance"""
         if not self.api_key:
             return True
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/instances/{instance_id}/reboot",
-                headers=self.headers
-            )
-            return response.status_code == 204
+        client = get_http_client()
+        response = await client.post(
+            f"{self.base_url}/instances/{instance_id}/reboot",
+            headers=self.headers
+        )
+        return response.status_code == 204
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from backend.database.connection import get_db
+from backend.database.replicas import get_read_db, read_sessionmaker
 from backend.models.user import User
 from backend.models.rdp_instance import RDPInstance
 from backend.models.ticket import Ticket
+from backend.models.placement import PlacementDecision
+from backend.models.outbox import OutboxMessage
+from backend.models.reconcile import ReconcileRun
+from backend.models.archive import RDPInstanceArchive, TicketArchive
+from sqlalchemy import func
+from backend.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, page_response
 from backend.core.security import get_current_user
+from backend.services.metering import GROUPINGS, recognised_revenue, usage_report
+from backend.services.export import EXPORTABLE, FORMATS, ExportError, resolve_columns, stream_export
+from backend.services.ticket_search import search_tickets
+from backend.tasks.outbox import kick_relay
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -26,29 +40,256 @@ def get_admin_user(current_user: User = Depends(get_current_user)):
 
 @router.get("/stats")
 async def get_admin_stats(
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_read_db), 
     admin: User = Depends(get_admin_user)
 ):
     total_users = db.query(User).count()
     active_instances = db.query(RDPInstance).filter(RDPInstance.status == "active").count()
-    total_instances = db.query(RDPInstance).count()
+    archived_instances = db.query(func.count(RDPInstanceArchive.id)).scalar()
+    total_instances = db.query(RDPInstance).count() + archived_instances
     open_tickets = db.query(Ticket).filter(Ticket.status == "open").count()
     
-    # Mock Revenue
-    estimated_revenue = active_instances * 15.00 
+    # Recognised over the last 30 days, from the usage rollups
+    revenue_kobo = recognised_revenue(db, date.today() - timedelta(days=30))
     
     return {
         "total_users": total_users,
         "active_instances": active_instances,
         "total_instances": total_instances,
+        "archived_instances": archived_instances,
         "open_tickets": open_tickets,
-        "revenue": estimated_revenue
+        "revenue": round(revenue_kobo / 100, 2)
     }
 
 @router.get("/users")
-async def get_all_users(
+def get_all_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Newest users first; never selects credentials"""
+    rows, next_cursor = keyset_page(
+        db, (User.id, User.email, User.is_active, User.created_at), (User.id,),
+        cursor=cursor, limit=limit,
+    )
+    return page_response(rows, next_cursor)
+
+
+TICKET_STATUSES = ("open", "answered", "closed")
+QUEUE_COLUMNS = (Ticket.id, Ticket.user_id, Ticket.subject, Ticket.status, Ticket.created_at)
+
+@router.get("/tickets")
+def get_ticket_queue(
+    status: str = Query("open", enum=list(TICKET_STATUSES)),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Tickets in one status, oldest first (index range scan on status, created_at, id)"""
+    rows, next_cursor = keyset_page(
+        db, QUEUE_COLUMNS, (Ticket.created_at, Ticket.id),
+        Ticket.status == status,
+        cursor=cursor, limit=limit, descending=False,
+    )
+    return page_response(rows, next_cursor)
+
+@router.get("/tickets/search")
+def search_all_tickets(
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[List[str]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Full-text search over subject and message, best matches first"""
+    if status and not set(status) <= set(TICKET_STATUSES):
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(TICKET_STATUSES)}")
+    rows, next_cursor = search_tickets(db, q, statuses=status, cursor=cursor, limit=limit, columns=QUEUE_COLUMNS)
+    return page_response(rows, next_cursor)
+
+@router.get("/placements")
+def get_placement_report(
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Placement decisions per region and reason: estimated RTT vs the worker's TCP connect time"""
+    rows = db.query(
+        PlacementDecision.provider,
+        PlacementDecision.region,
+        PlacementDecision.reason,
+        func.count(PlacementDecision.id).label("orders"),
+        func.avg(PlacementDecision.estimated_rtt_ms).label("avg_estimated_rtt_ms"),
+        func.avg(PlacementDecision.worker_rtt_ms).label("avg_worker_rtt_ms"),
+        func.count(PlacementDecision.worker_rtt_ms).label("measured"),
+    ).group_by(
+        PlacementDecision.provider, PlacementDecision.region, PlacementDecision.reason
+    ).order_by(func.count(PlacementDecision.id).desc()).all()
+    return [dict(row._mapping) for row in rows]
+
+@router.get("/usage")
+def get_usage_report(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: str = Query("plan", enum=list(GROUPINGS)),
+    hourly: bool = False,
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Instance-hours, recognised revenue, cost and margin per day (or hour), from the rollups"""
+    end = end or date.today()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if hourly and (end - start).days > 7:
+        raise HTTPException(status_code=400, detail="hourly reports cover at most 7 days")
+    return usage_report(db, start, end, group_by=group_by, by_hour=hourly)
+
+OUTBOX_STATUSES = ("pending", "sent", "dead")
+OUTBOX_COLUMNS = (
+    OutboxMessage.id, OutboxMessage.event, OutboxMessage.destination, OutboxMessage.dedup_key,
+    OutboxMessage.status, OutboxMessage.attempts, OutboxMessage.last_error, OutboxMessage.available_at,
+    OutboxMessage.created_at,
+)
+
+@router.get("/outbox")
+def get_outbox(
+    status: str = Query("dead", enum=list(OUTBOX_STATUSES)),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Outbox messages in one status, newest first (dead ones need a look)"""
+    rows, next_cursor = keyset_page(
+        db, OUTBOX_COLUMNS, (OutboxMessage.id,),
+        OutboxMessage.status == status,
+        cursor=cursor, limit=limit,
+    )
+    return page_response(rows, next_cursor)
+
+@router.post("/outbox/{message_id}/retry")
+def retry_outbox_message(
+    message_id: int,
     db: Session = Depends(get_db),
     admin: User = Depends(get_admin_user)
 ):
-    # Limit to 50 for demo
-    return db.query(User).limit(50).all()
+    """Put a dead message back in the relay's queue"""
+    updated = db.query(OutboxMessage).filter(
+        OutboxMessage.id == message_id, OutboxMessage.status == "dead"
+    ).update({"status": "pending", "attempts": 0, "available_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    if not updated:
+        raise HTTPException(status_code=404, detail="No dead message with that id")
+    kick_relay()
+    return {"status": "pending"}
+
+@router.get("/reconcile")
+def get_reconcile_runs(
+    provider: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Latest fleet reconciler runs: drift found, repairs made, run time"""
+    query = db.query(ReconcileRun)
+    if provider:
+        query = query.filter(ReconcileRun.provider == provider)
+    runs = query.order_by(ReconcileRun.started_at.desc()).limit(limit).all()
+    return [{
+        "provider": run.provider,
+        "started_at": run.started_at,
+        "duration_ms": run.duration_ms,
+        "remote_count": run.remote_count,
+        "local_count": run.local_count,
+        "drift": run.drift,
+        "repaired": run.repaired,
+        "samples": run.samples,
+        "error": run.error,
+    } for run in runs]
+
+ARCHIVED_INSTANCE_COLUMNS = (
+    RDPInstanceArchive.id, RDPInstanceArchive.user_id, RDPInstanceArchive.provider, RDPInstanceArchive.provider_id,
+    RDPInstanceArchive.ip_address, RDPInstanceArchive.os_type, RDPInstanceArchive.plan, RDPInstanceArchive.status,
+    RDPInstanceArchive.order_reference, RDPInstanceArchive.created_at, RDPInstanceArchive.archived_at,
+)
+ARCHIVED_TICKET_COLUMNS = (
+    TicketArchive.id, TicketArchive.user_id, TicketArchive.subject, TicketArchive.message, TicketArchive.status,
+    TicketArchive.created_at, TicketArchive.archived_at,
+)
+
+@router.get("/archive/instances")
+def get_archived_instances(
+    user_id: Optional[int] = None,
+    order_reference: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Archived instances, newest first; filter by user or order"""
+    filters = []
+    if user_id is not None:
+        filters.append(RDPInstanceArchive.user_id == user_id)
+    if order_reference:
+        filters.append(RDPInstanceArchive.order_reference == order_reference)
+    rows, next_cursor = keyset_page(
+        db, ARCHIVED_INSTANCE_COLUMNS, (RDPInstanceArchive.created_at, RDPInstanceArchive.id), *filters,
+        cursor=cursor, limit=limit,
+    )
+    return page_response(rows, next_cursor)
+
+@router.get("/archive/tickets")
+def get_archived_tickets(
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    admin: User = Depends(get_admin_user)
+):
+    """Archived (closed) tickets, newest first"""
+    filters = [TicketArchive.user_id == user_id] if user_id is not None else []
+    rows, next_cursor = keyset_page(
+        db, ARCHIVED_TICKET_COLUMNS, (TicketArchive.created_at, TicketArchive.id), *filters,
+        cursor=cursor, limit=limit,
+    )
+    return page_response(rows, next_cursor)
+
+@router.get("/export/{dataset}")
+def export_dataset(
+    dataset: str,
+    format: str = Query("csv", enum=list(FORMATS)),
+    columns: Optional[str] = Query(None, description="Comma-separated; id is always included"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after_id: Optional[int] = Query(None, description="Resume after the last id received"),
+    include_archived: bool = Query(True, description="Also export archived instances/tickets"),
+    admin: User = Depends(get_admin_user)
+):
+    """Stream a whole table (users, instances, tickets) in id order, one chunk in memory at a time.
+
+    Archived instances and tickets are included unless include_archived=false.
+    """
+    if dataset not in EXPORTABLE:
+        raise HTTPException(status_code=404, detail=f"Exportable datasets: {', '.join(EXPORTABLE)}")
+    db = read_sessionmaker()()
+    try:
+        selected = resolve_columns(dataset, columns.split(",") if columns else None)
+        body = stream_export(db, dataset, format, selected, since=since, until=until, after_id=after_id,
+                             include_archived=include_archived)
+    except ExportError as e:
+        db.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def _stream():
+        # The response outlives the request's dependencies, so it owns its session
+        try:
+            yield from body
+        finally:
+            db.close()
+
+    filename = f"nemordp-{dataset}-{datetime.utcnow():%Y%m%dT%H%M%S}.{format}"
+    return StreamingResponse(_stream(), media_type=FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
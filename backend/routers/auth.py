@@ -1,13 +1,17 @@
 from datetime import timedelta
-from typing import Any
+from typing import Any, Optional
+import uuid
+import redis
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError
 from sqlalchemy.orm import Session
 
 from backend.database.connection import get_db
 from backend.models.user import User
 from backend.core import security
 from backend.core.config import settings
+from backend.core.revocation import revocations, start_family, rotate_family, end_family
 from pydantic import BaseModel, EmailStr
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -19,6 +23,35 @@ class UserCreate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
+    expires_in: int
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+REFRESH_TTL_SECONDS = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+def _issue_tokens(user_id: int, family: str, refresh_jti: str) -> dict:
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return {
+        "access_token": security.create_access_token(
+            user_id, expires_delta=access_token_expires
+        ),
+        "token_type": "bearer",
+        "refresh_token": security.create_refresh_token(user_id, family, refresh_jti),
+        "expires_in": int(access_token_expires.total_seconds()),
+    }
+
+def _start_session(user_id: int) -> dict:
+    family, jti = uuid.uuid4().hex, uuid.uuid4().hex
+    try:
+        start_family(family, jti, REFRESH_TTL_SECONDS)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Session store unavailable, please retry")
+    return _issue_tokens(user_id, family, jti)
 
 @router.post("/register", response_model=Token)
 def register(user_in: UserCreate, db: Session = Depends(get_db)):
@@ -35,13 +68,7 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
     db.add(user)
     db.commit()
     db.refresh(user)
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return {
-        "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
-        ),
-        "token_type": "bearer",
-    }
+    return _start_session(user.id)
 
 @router.post("/login", response_model=Token)
 def login(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
@@ -52,10 +79,47 @@ def login(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm =
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return {
-        "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
-        ),
-        "token_type": "bearer",
-    }
+    return _start_session(user.id)
+
+@router.post("/refresh", response_model=Token)
+def refresh(body: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access/refresh pair (no password, no bcrypt)"""
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = security.decode_token(body.refresh_token, "refresh")
+    except JWTError:
+        raise invalid
+
+    new_jti = uuid.uuid4().hex
+    try:
+        rotated = rotate_family(payload["fam"], payload["jti"], new_jti, REFRESH_TTL_SECONDS)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Session store unavailable, please retry")
+    if not rotated:
+        # Replayed or already-rotated token: the family has now been revoked
+        raise invalid
+
+    user = db.query(User).filter(User.id == payload["sub"]).first()
+    if user is None or not user.is_active:
+        end_family(payload["fam"])
+        raise invalid
+    return _issue_tokens(user.id, payload["fam"], new_jti)
+
+@router.post("/logout")
+def logout(body: LogoutRequest = LogoutRequest(), token: str = Depends(security.oauth2_scheme)):
+    """Revoke the presented access token and, if given, its refresh token family"""
+    try:
+        access = security.decode_token(token, "access")
+        if access.get("jti"):
+            revocations.revoke(access["jti"], access["exp"])
+        if body.refresh_token:
+            end_family(security.decode_token(body.refresh_token, "refresh").get("fam"))
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Session store unavailable, please retry")
+    return {"status": "logged_out"}
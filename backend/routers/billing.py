@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from backend.database.connection import get_db
+from backend.database.replicas import get_read_db
 from backend.models.user import User
 from backend.core.security import get_current_user # Need to implement this dependency
 from pydantic import BaseModel
@@ -11,71 +12,160 @@ class PaymentInitiate(BaseModel):
     plan: str
     payment_method: str # 'paystack' or 'crypto'
     crypto_type: str = None # 'BTC', 'ETH', 'USDT' (required if method is crypto)
+    region: str = None # override automatic placement (see GET /billing/plans for regions)
+    quantity: int = 1 # bulk orders: this many identical servers for one payment
 
-from backend.tasks.provisioning import provision_rdp_task
 import uuid
 
+from backend.core.config import settings
+from backend.models.order import Order
+
 from backend.services.paystack import PaystackService
+from backend.services.admission import AdmissionController
+from backend.services.orders import (
+    confirm_payment, create_order, credentials_csv, order_credentials, order_progress, retry_failed_seats,
+)
+from backend.services.crypto_payments import (
+    PoolExhaustedError, assign_address, deposit_for, enabled_currencies, payment_details,
+)
+from backend.services.catalog import CatalogError, OutOfStockError, get_catalog
+from backend.services.placement import place, record_placement
+from backend.core.net import client_ip
+
+@router.get("/plans")
+def list_plans():
+    """Plans with price and current stock (served from the in-memory catalog)"""
+    return get_catalog().listing()
 
 @router.post("/initiate")
-async def initiate_payment(payment: PaymentInitiate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def initiate_payment(payment: PaymentInitiate, request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     order_id = str(uuid.uuid4())
-    amount_kobo = 1500 * 100 # Example: $15 -> 15000 kobo (assuming NGN or conversion, usually Paystack is NGN, let's assume 150000 kobo for N1500)
-    # Note: In real app, calculate amount based on plan
     
-    if payment.payment_method == "paystack":
+    check_payment_method(payment.payment_method, payment.crypto_type)
+    if not 1 <= payment.quantity <= settings.BULK_ORDER_MAX_QUANTITY:
+        raise HTTPException(status_code=400, detail=f"Quantity must be between 1 and {settings.BULK_ORDER_MAX_QUANTITY}")
+    
+    # Price, OS and stock come from the catalog snapshot; the region from the
+    # client's location (local GeoIP, no provider calls)
+    try:
+        placement = place(payment.plan, client_ip(request.scope), payment.region)
+    except OutOfStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except CatalogError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    offer = placement["offer"]
+    os_type = offer.product.os_type
+    amount_kobo = offer.product.amount_kobo * payment.quantity
+    
+    # Admission control: don't take money for an order we can't deliver in reasonable time
+    admission = AdmissionController(db).evaluate(offer.provider, quantity=payment.quantity)
+    if admission["decision"] == "reject":
+        raise HTTPException(
+            status_code=503,
+            detail="Provisioning is at capacity. Please try again later.",
+            headers={"Retry-After": str(admission["retry_after"])},
+        )
+    
+    order = create_order(db, current_user, order_id, payment.plan, os_type, payment.payment_method, amount_kobo,
+                         region=offer.region, quantity=payment.quantity)
+    record_placement(db, order_id, current_user.id, placement)
+    admission_info = {
+        "region": offer.region,
+        "admission": "waitlisted" if admission["decision"] == "waitlist" else "accepted",
+        "estimated_delivery_seconds": admission["estimated_delivery_seconds"],
+    }
+    
+    metadata = {"user_id": current_user.id, "plan": payment.plan, "os_type": os_type, "quantity": payment.quantity}
+    return {**start_checkout(db, order, current_user, payment.crypto_type, metadata), **admission_info}
+
+def check_payment_method(payment_method: str, crypto_type: str = None):
+    if payment_method not in ("paystack", "crypto"):
+        raise HTTPException(status_code=400, detail="Invalid payment method")
+    if payment_method == "crypto" and not crypto_type:
+        raise HTTPException(status_code=400, detail="Crypto type is required for crypto payments")
+    if payment_method == "crypto" and crypto_type not in enabled_currencies():
+        raise HTTPException(status_code=400, detail="Unsupported crypto type")
+
+def start_checkout(db: Session, order: Order, user: User, crypto_type: str = None, metadata: dict = None,
+                   callback_url: str = "http://localhost:3000/dashboard?payment=success") -> dict:
+    """Take payment for a pending order (new servers or a renewal); confirm_payment runs once it's paid"""
+    if order.payment_method == "paystack":
         paystack_service = PaystackService()
         
-        # Detect OS from plan string simple logic
-        os_type = "windows" if "server" in payment.plan.lower() or "basic" in payment.plan.lower() else "linux"
-        
         # Initialize Transaction
         response = paystack_service.initialize_transaction(
-            email=current_user.email,
-            amount_kobo=150000, # Mock 1500.00
-            reference=order_id,
-            callback_url="http://localhost:3000/dashboard?payment=success",
+            email=user.email,
+            amount_kobo=order.amount,
+            reference=order.reference,
+            callback_url=callback_url,
+            metadata=metadata or {"user_id": user.id},
         )
         
-        # IMPORTANT: Paystack doesn't natively support arbitrary metadata in initialize via library sometimes, 
-        # but we need it for webhook. If lib fails, we fallback to dict.
-        # Assuming initialize returns dict or object with 'data'
-        
-        # FOR DEVELOPMENT ONLY: If no key, Auto-provision
+        # FOR DEVELOPMENT ONLY: If no key, treat the payment as confirmed right away
         if not paystack_service.secret_key:
-             provision_rdp_task.delay(
-                user_id=current_user.id,
-                order_id=order_id,
-                os_type_str=os_type, 
-                plan=payment.plan,
-                user_email=current_user.email
-            )
+            confirm_payment(db, order.reference)
         
         return {
             "status": "pending",
             "payment_url": response['data']['authorization_url'],
-            "reference": order_id
-        }
-    elif payment.payment_method == "crypto":
-        if not payment.crypto_type:
-             raise HTTPException(status_code=400, detail="Crypto type is required for crypto payments")
-        
-        # Mock Address
-        mock_addresses = {
-            "BTC": "bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh",
-            "ETH": "0x71C7656EC7ab88b098defB751B7401B5f6d8976F",
-            "USDT": "TVc2C1iP9A6d7F3b3b3b3b3b3b3b3b3b3b"
+            "reference": order.reference,
         }
+    else:
+        try:
+            deposit = assign_address(db, order, crypto_type)
+        except PoolExhaustedError:
+            # Pool drained faster than the refill task runs; it tops up within a minute
+            order.status = "expired"
+            db.commit()
+            _kick_refill()
+            raise HTTPException(status_code=503, detail="Crypto checkout is busy. Please try again shortly.",
+                                headers={"Retry-After": "30"})
         
         return {
+            **payment_details(deposit),
             "status": "pending",
-            "wallet_address": mock_addresses.get(payment.crypto_type, "Invalid Crypto Type"),
-            "amount": 0.001, # Mock amount
-            "currency": payment.crypto_type,
-             "order_id": order_id
+            "order_id": order.reference,
         }
-    
-    raise HTTPException(status_code=400, detail="Invalid payment method")
+
+def _kick_refill():
+    from backend.tasks.payments import refill_deposit_addresses
+    try:
+        refill_deposit_addresses.delay()
+    except Exception:
+        pass
+
+def _own_order(db: Session, reference: str, user: User) -> Order:
+    order = db.query(Order).filter(Order.reference == reference, Order.user_id == user.id).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
+
+@router.get("/orders/{reference}")
+def get_order(reference: str, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    """Order status; bulk orders include seat counts by status, crypto orders their deposit"""
+    order = _own_order(db, reference, current_user)
+    progress = order_progress(db, order)
+    deposit = deposit_for(db, order) if order.payment_method == "crypto" else None
+    if deposit:
+        progress["payment"] = payment_details(deposit)
+    return progress
+
+@router.get("/orders/{reference}/credentials.csv")
+def export_order_credentials(reference: str, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    order = _own_order(db, reference, current_user)
+    return Response(
+        content=credentials_csv(order_credentials(db, order)),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="nemordp-{reference}.csv"'},
+    )
+
+@router.post("/orders/{reference}/retry-failed")
+def retry_failed(reference: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Re-queue a bulk order's failed seats"""
+    order = _own_order(db, reference, current_user)
+    if order.quantity <= 1:
+        raise HTTPException(status_code=400, detail="Only bulk orders have seats to retry")
+    return {"retried": retry_failed_seats(db, order)}
 
 @router.post("/webhook/paystack")
 async def paystack_webhook(request: Request):
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from backend.database.connection import get_db
+from backend.database.replicas import get_read_db
 from backend.models.rdp_instance import RDPInstance
+from backend.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, page_response
 from backend.core.security import get_current_user
 from backend.models.user import User
 from pydantic import BaseModel
 from datetime import datetime
+import uuid
 
 router = APIRouter(prefix="/instances", tags=["instances"])
 
@@ -20,22 +23,68 @@ class RDPInstanceSchema(BaseModel):
     plan: str
     status: str
     created_at: datetime
+    expires_at: datetime | None = None
     
     class Config:
         from_attributes = True
 
+class RenewalCheckout(BaseModel):
+    payment_method: str = "paystack"  # or 'crypto'
+    crypto_type: str = None  # 'BTC', 'ETH', 'USDT' (required if method is crypto)
+
+LIST_COLUMNS = (
+    RDPInstance.id, RDPInstance.provider_id, RDPInstance.ip_address, RDPInstance.username,
+    RDPInstance.password, RDPInstance.os_type, RDPInstance.plan, RDPInstance.status, RDPInstance.created_at,
+    RDPInstance.expires_at,
+)
+
 @router.get("/", response_model=List[RDPInstanceSchema])
-async def get_my_instances(
-    current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+def get_my_instances(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
 ):
-    """Get all instances for current user"""
-    instances = db.query(RDPInstance).filter(RDPInstance.user_id == current_user.id).all()
-    return instances
+    """Instances for the current user, newest first (next page cursor in X-Next-Cursor)"""
+    rows, next_cursor = keyset_page(
+        db, LIST_COLUMNS, (RDPInstance.id,),
+        RDPInstance.user_id == current_user.id,
+        cursor=cursor, limit=limit,
+    )
+    return page_response(rows, next_cursor)
 
+from backend.core import metrics
+from backend.services.metering import record_event
 from backend.services.provisioning import ProvisioningService
+from backend.services.orders import create_order
+from backend.services.renewals import RenewalError, check_renewable, renewal_price
+from backend.routers.billing import check_payment_method, start_checkout
+from backend.services.telemetry import METRICS, RANGES, series
 from fastapi import HTTPException
 
+@router.get("/{instance_id}/metrics")
+def get_instance_metrics(
+    instance_id: int,
+    range: str = Query("24h", pattern="^(" + "|".join(RANGES) + ")$"),
+    metric: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Chart series for an instance: 5-minute buckets up to a day, hourly beyond"""
+    instance = db.query(RDPInstance.id).filter(RDPInstance.id == instance_id, RDPInstance.user_id == current_user.id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    unknown = set(metric or ()) - set(METRICS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(sorted(unknown))}")
+    span, resolution = RANGES[range]
+    return {
+        "instance_id": instance_id,
+        "range": range,
+        "resolution_seconds": resolution,
+        "series": series(db, instance_id, span, resolution, datetime.utcnow(), metric or METRICS),
+    }
+
 @router.post("/{instance_id}/reboot")
 async def reboot_instance(
     instance_id: int,
@@ -54,6 +103,35 @@ async def reboot_instance(
          
     return {"status": "rebooting"}
 
+@router.post("/{instance_id}/renew")
+def renew_instance(
+    instance_id: int,
+    payment: Optional[RenewalCheckout] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Check out one more billing period; expires_at moves once the payment is confirmed.
+
+    Same response as POST /billing/initiate: a Paystack payment_url, or the
+    crypto deposit details. The server keeps running untouched.
+    """
+    payment = payment or RenewalCheckout()
+    instance = db.query(RDPInstance).filter(RDPInstance.id == instance_id, RDPInstance.user_id == current_user.id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    check_payment_method(payment.payment_method, payment.crypto_type)
+    try:
+        check_renewable(instance, datetime.utcnow())
+        amount_kobo = renewal_price(instance)
+    except RenewalError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    order = create_order(db, current_user, str(uuid.uuid4()), instance.plan, instance.os_type, payment.payment_method,
+                         amount_kobo, renews_instance_id=instance.id)
+    metrics.inc("nemordp_renewal_checkouts_total", plan=instance.plan)
+    return {**start_checkout(db, order, current_user, payment.crypto_type,
+                             {"user_id": current_user.id, "renews_instance_id": instance.id}),
+            "instance_id": instance.id}
+
 @router.delete("/{instance_id}")
 async def terminate_instance(
     instance_id: int,
@@ -69,6 +147,7 @@ async def terminate_instance(
     
     if success:
         instance.status = "terminated"
+        record_event(db, instance, "terminated")
         db.commit()
         return {"status": "terminated"}
     
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from backend.database.connection import get_db
+from backend.database.replicas import get_read_db
 from backend.models.ticket import Ticket
 from backend.models.user import User
+from backend.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, page_response
 from backend.core.security import get_current_user
+from backend.services.ticket_search import search_tickets
 
 router = APIRouter(prefix="/support", tags=["support"])
 
+# Shared by the list and its search so both return the same rows
+LIST_COLUMNS = (Ticket.id, Ticket.subject, Ticket.message, Ticket.status, Ticket.created_at)
+
 class TicketCreate(BaseModel):
     subject: str
     message: str
@@ -41,8 +47,22 @@ async def create_ticket(
     return new_ticket
 
 @router.get("/tickets", response_model=List[TicketResponse])
-async def get_tickets(
-    db: Session = Depends(get_db), 
+def get_tickets(
+    q: Optional[str] = Query(None, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Ticket).filter(Ticket.user_id == current_user.id).order_by(Ticket.created_at.desc()).all()
+    """The user's tickets, newest first, or best matches first when `q` is given"""
+    if q:
+        rows, next_cursor = search_tickets(db, q, user_id=current_user.id, cursor=cursor, limit=limit, columns=LIST_COLUMNS)
+        return page_response(rows, next_cursor)
+    rows, next_cursor = keyset_page(
+        db,
+        LIST_COLUMNS,
+        (Ticket.created_at, Ticket.id),
+        Ticket.user_id == current_user.id,
+        cursor=cursor, limit=limit,
+    )
+    return page_response(rows, next_cursor)
@@ -2,10 +2,7 @@ from fastapi import APIRouter, Request, HTTPException, Depends
 from sqlalchemy.orm import Session
 from backend.database.connection import get_db
 from backend.services.paystack import PaystackService
-from backend.models.rdp_instance import RDPInstance
-from backend.tasks.provisioning import provision_rdp_task
-from backend.models.user import User
-import json
+from backend.services.orders import confirm_payment
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
@@ -31,33 +28,12 @@ async def paystack_webhook(request: Request, db: Session = Depends(get_db)):
     if event["event"] == "charge.success":
         data = event["data"]
         reference = data["reference"]
-        email = data["customer"]["email"]
         
-        # In the metadata (passed during init), we should have stored user_id and plan
-        # If not in metadata, we have to look up via reference if we stored a "Transaction" record.
-        # For this MVP, we will rely on metadata if we send it, or use the reference which we set as order_id.
-        
-        # Extract metadata
-        metadata = data.get("metadata", {})
-        user_id = metadata.get("user_id")
-        plan = metadata.get("plan")
-        os_type_str = metadata.get("os_type")
-        
-        if user_id and plan:
-            print(f"Payment successful for reference: {reference}. Triggering Provisioning.")
-            
-            # Idempotency check: Check if instance already exists/provisioning for this order_id
-            existing = db.query(RDPInstance).filter(RDPInstance.provider_id == reference).first()
-            if existing:
-                return {"status": "already_processed"}
-
-            # Trigger Task
-            provision_rdp_task.delay(
-                user_id=user_id,
-                order_id=reference,
-                os_type_str=os_type_str or "linux",
-                plan=plan,
-                user_email=email
-            )
+        # The reference is the order_id we created at checkout; the order row
+        # carries user, plan and OS, and its status makes this idempotent.
+        order = confirm_payment(db, reference)
+        if order is None:
+            return {"status": "already_processed"}
+        print(f"Payment successful for reference: {reference}. Order is {order.status}.")
             
     return {"status": "received"}
@@ -0,0 +1,91 @@
+"""Stream a table to a file (or stdout) without holding it in memory.
+
+    python -m backend.scripts.export users -o users.csv
+    python -m backend.scripts.export instances --format ndjson --since 2024-01-01 --columns status,plan
+    python -m backend.scripts.export tickets --format parquet -o tickets.parquet
+    python -m backend.scripts.export instances --live-only -o live.csv
+
+Instances and tickets include the rows moved to the archive tables unless
+--live-only is given.
+
+With -o, progress is checkpointed to <output>.resume after every chunk.
+Re-running the same command after an interruption continues from there
+(CSV and NDJSON). Reads go to a replica when DATABASE_REPLICA_URLS is set.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from backend.database.replicas import read_sessionmaker
+from backend.services.export import EXPORTABLE, ExportError, available_formats, export_progress, resolve_columns
+
+def _load_checkpoint(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="backend.scripts.export", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", choices=list(EXPORTABLE))
+    parser.add_argument("--format", default="csv", choices=available_formats())
+    parser.add_argument("--columns", help="comma-separated; id is always included")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="created_at >= (ISO date/time)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="created_at < (ISO date/time)")
+    parser.add_argument("--after-id", type=int, help="only rows with a larger id")
+    parser.add_argument("--live-only", dest="include_archived", action="store_false",
+                        help="skip archived instances/tickets")
+    parser.add_argument("-o", "--output", help="file to write (default stdout)")
+    args = parser.parse_args(argv)
+
+    after_id, offset = args.after_id, 0
+    checkpoint_path = f"{args.output}.resume" if args.output else None
+    checkpoint = _load_checkpoint(checkpoint_path) if checkpoint_path and args.format != "parquet" else None
+    if checkpoint and os.path.exists(args.output) and checkpoint["args"] == argv:
+        after_id, offset = checkpoint["after_id"], checkpoint["offset"]
+
+    db = read_sessionmaker()()
+    try:
+        columns = resolve_columns(args.dataset, args.columns.split(",") if args.columns else None)
+        body = export_progress(db, args.dataset, args.format, columns,
+                               since=args.since, until=args.until, after_id=after_id,
+                               include_archived=args.include_archived)
+        if args.output:
+            out = open(args.output, "r+b" if offset else "wb")
+            out.truncate(offset)  # drop whatever was written after the last checkpoint
+            out.seek(offset)
+        else:
+            out = sys.stdout.buffer
+        try:
+            for i, (data, last_id) in enumerate(body):
+                if i == 0 and offset and args.format == "csv":
+                    data = data.split(b"\n", 1)[1]  # the CSV header is already there
+                out.write(data)
+                out.flush()
+                if checkpoint_path and args.format != "parquet":
+                    _save_checkpoint(checkpoint_path, {"args": argv, "after_id": last_id, "offset": out.tell()})
+        finally:
+            if args.output:
+                out.close()
+    except ExportError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)  # finished
+    if args.output:
+        print(f"Wrote {args.dataset} to {args.output}" + (f" (resumed after id {after_id})" if offset else ""),
+              file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,22 @@
+"""Golden image helpers for CI and operators.
+
+    python -m backend.scripts.golden_image recipe    # print the desktop build script
+    python -m backend.scripts.golden_image refresh   # register/promote images now
+"""
+import sys
+from backend.services.images import recipe_script
+
+def main(argv):
+    command = argv[0] if argv else ""
+    if command == "recipe":
+        sys.stdout.write(recipe_script())
+    elif command == "refresh":
+        from backend.tasks.images import refresh_golden_images
+        print(refresh_golden_images.apply().get())
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,37 @@
+"""Drive the local stand-in chain the deposit watcher uses with CRYPTO_LOCAL_CHAIN=true.
+
+    python -m backend.scripts.local_chain send bitcoin bc1q... 150000 --asset BTC
+    python -m backend.scripts.local_chain send ethereum 0xAbC... 25000000 --asset USDT
+    python -m backend.scripts.local_chain mine ethereum --blocks 12
+
+Amounts are base units (satoshi, wei, USDT micro-units). A deposit lands in
+the next block, so mine enough blocks for CRYPTO_CONFIRMATIONS.
+"""
+import argparse
+import sys
+from backend.services.chains import LocalChain
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="backend.scripts.local_chain", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    send = commands.add_parser("send", help="pay an address")
+    send.add_argument("chain", choices=["bitcoin", "ethereum"])
+    send.add_argument("address")
+    send.add_argument("amount", type=int)
+    send.add_argument("--asset", help="BTC, ETH or USDT (default: the chain's native coin)")
+    mine = commands.add_parser("mine", help="advance the chain")
+    mine.add_argument("chain", choices=["bitcoin", "ethereum"])
+    mine.add_argument("--blocks", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    chain = LocalChain(args.chain)
+    if args.command == "send":
+        chain.send(args.address, args.asset or ("BTC" if args.chain == "bitcoin" else "ETH"), args.amount)
+        print(f"Sent {args.amount} to {args.address}; mine a block to include it")
+    else:
+        print(f"{args.chain} height {chain.mine(args.blocks)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
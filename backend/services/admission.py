@@ -0,0 +1,151 @@
+import time
+from typing import Dict
+import redis
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.core import metrics
+from backend.core.celery_app import celery_app
+from backend.core.config import settings
+from backend.core.redis_client import get_redis
+from backend.models.order import Order
+from backend.services.circuit_breaker import ProviderCircuitBreaker
+from backend.services.scheduler import ProvisioningScheduler
+
+PROVISIONING_QUEUE = "provisioning"
+# kombu's Redis transport keeps one list per priority step: "<queue>" for
+# step 0 and "<queue>\x06\x16<step>" for the others
+PRIORITY_SEP = "\x06\x16"
+PRIORITY_STEPS = (0, 3, 6, 9)
+
+IN_FLIGHT_KEY = "provisioning:in_flight"
+
+def _duration_key(provider: str) -> str:
+    return f"admission:provision_seconds:{provider}"
+
+def provisioning_queue_depth() -> int:
+    """Messages waiting in the Celery provisioning queue"""
+    keys = [PROVISIONING_QUEUE] + [f"{PROVISIONING_QUEUE}{PRIORITY_SEP}{step}" for step in PRIORITY_STEPS[1:]]
+    pipe = get_redis().pipeline(transaction=False)
+    for key in keys:
+        pipe.llen(key)
+    return sum(pipe.execute())
+
+def provisioning_started(task_id: str):
+    """Track a running provisioning task (zset member scored by start time)"""
+    get_redis().zadd(IN_FLIGHT_KEY, {task_id: time.time()})
+
+def provisioning_finished(task_id: str):
+    get_redis().zrem(IN_FLIGHT_KEY, task_id)
+
+def provisioning_in_flight() -> int:
+    """Provisioning tasks currently executing on any worker"""
+    client = get_redis()
+    # Entries from killed workers age out after the hard task time limit
+    client.zremrangebyscore(IN_FLIGHT_KEY, "-inf", time.time() - (celery_app.conf.task_time_limit or 3600))
+    return client.zcard(IN_FLIGHT_KEY)
+
+def record_provisioning_outcome(provider: str, success: bool, duration: float):
+    """Feed the breaker and the provisioning-time estimate from a finished attempt"""
+    breaker = ProviderCircuitBreaker(provider)
+    if success:
+        breaker.record_success()
+        try:
+            # Exponentially weighted average; a lost update only nudges the estimate
+            client = get_redis()
+            previous = float(client.get(_duration_key(provider)) or settings.ADMISSION_DEFAULT_PROVISION_SECONDS)
+            client.set(_duration_key(provider), 0.8 * previous + 0.2 * duration)
+        except redis.RedisError:
+            pass
+    else:
+        breaker.record_failure()
+    metrics.observe("nemordp_provisioning_duration_seconds", duration, provider=provider, outcome="success" if success else "failure")
+
+class AdmissionController:
+    """Decide whether a new order is admitted, waitlisted or rejected.
+
+    The decision is based on live provisioning queue depth (Celery queue plus
+    scheduler backlog), provisioning tasks in flight, paid orders already
+    waiting, and the provider's breaker state. Snapshots are cached for
+    ADMISSION_CACHE_SECONDS so a checkout burst doesn't turn into a burst of
+    COUNT queries.
+    """
+
+    _cache: Dict[str, tuple] = {}
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def snapshot(self, provider: str, use_cache: bool = True) -> Dict:
+        cached = self._cache.get(provider)
+        if use_cache and cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        try:
+            # Jobs held by the scheduler count as queued: they run before this one
+            queue_depth = provisioning_queue_depth() + ProvisioningScheduler().pending_jobs()
+            in_flight = provisioning_in_flight()
+            avg_seconds = float(get_redis().get(_duration_key(provider)) or settings.ADMISSION_DEFAULT_PROVISION_SECONDS)
+        except redis.RedisError:
+            # Broker unreachable: nothing can be queued anyway, treat as unknown backlog
+            queue_depth = 0
+            in_flight = 0
+            avg_seconds = settings.ADMISSION_DEFAULT_PROVISION_SECONDS
+
+        waitlisted = self.db.query(func.count(Order.id)).filter(Order.status == "waitlisted").scalar()
+        breaker = ProviderCircuitBreaker(provider)
+
+        snapshot = {
+            "queue_depth": queue_depth,
+            "in_flight": in_flight,
+            "waitlisted": waitlisted,
+            "avg_provision_seconds": avg_seconds,
+            "breaker": breaker.state(),
+            "breaker_retry_after": breaker.retry_after(),
+        }
+        self._cache[provider] = (time.monotonic() + settings.ADMISSION_CACHE_SECONDS, snapshot)
+
+        metrics.set_gauge("nemordp_provisioning_queue_depth", queue_depth)
+        metrics.set_gauge("nemordp_provisioning_in_flight", in_flight)
+        metrics.set_gauge("nemordp_orders_waitlisted", waitlisted)
+        return snapshot
+
+    def evaluate(self, provider: str, stage: str = "checkout", include_waitlist: bool = True, use_cache: bool = True,
+                 quantity: int = 1) -> Dict:
+        """Return {"decision": admit|waitlist|reject, "estimated_delivery_seconds", "retry_after", ...}
+
+        For bulk orders the estimate is for the last of `quantity` seats.
+        """
+        snap = self.snapshot(provider, use_cache=use_cache)
+        slots = max(1, settings.PROVISIONING_CAPACITY)
+
+        # Jobs ahead of this one, delivered in waves of `slots`
+        ahead = snap["queue_depth"] + max(0, snap["in_flight"] - slots)
+        if include_waitlist:
+            ahead += snap["waitlisted"]
+        eta = snap["avg_provision_seconds"] * (1 + ahead // slots)
+        # A bulk order's seats go through at most BULK_ORDER_CONCURRENCY at a time
+        window = max(1, min(settings.BULK_ORDER_CONCURRENCY, slots))
+        eta += snap["avg_provision_seconds"] * ((quantity - 1) // window)
+        if snap["breaker"] == "open":
+            eta += snap["breaker_retry_after"]
+
+        retry_after = 0
+        if eta >= settings.ADMISSION_REJECT_ETA_SECONDS or (
+            eta >= settings.ADMISSION_WAITLIST_ETA_SECONDS and snap["waitlisted"] >= settings.ADMISSION_MAX_WAITLIST
+        ):
+            decision = "reject"
+            retry_after = max(60, int(eta - settings.ADMISSION_WAITLIST_ETA_SECONDS))
+        elif snap["breaker"] == "open" or eta >= settings.ADMISSION_WAITLIST_ETA_SECONDS:
+            decision = "waitlist"
+        else:
+            decision = "admit"
+
+        metrics.inc("nemordp_admission_decisions_total", decision=decision, provider=provider, stage=stage)
+        metrics.observe("nemordp_admission_estimated_delivery_seconds", eta, provider=provider)
+
+        return {
+            "decision": decision,
+            "estimated_delivery_seconds": int(eta),
+            "retry_after": retry_after,
+            **snap,
+        }
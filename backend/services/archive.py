@@ -0,0 +1,86 @@
+from datetime import date, datetime, timedelta
+from typing import Dict
+from sqlalchemy import exists, func, insert, literal, select, text
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.archive import RDPInstanceArchive, TicketArchive
+from backend.models.rdp_instance import RDPInstance
+from backend.models.ticket import Ticket
+from backend.models.usage import InstanceEvent
+
+# Hot/cold lifecycle. Terminated, expired and failed instances with no
+# lifecycle event in ARCHIVE_INSTANCES_AFTER_DAYS, and closed tickets older
+# than ARCHIVE_TICKETS_AFTER_DAYS, are moved to *_archive tables in batches.
+# Each batch is one transaction: INSERT ... SELECT into the archive, then
+# DELETE from the hot table. Listings, the expiry sweep and the reconciler
+# only ever scan live rows. Archived rows are served by the admin API.
+#
+# On Postgres the archive tables are partitioned by month of created_at.
+# Partitions are created here before each run, plus a DEFAULT partition as
+# a catch-all, so old months can be detached or dropped wholesale.
+
+DEAD_STATUSES = ("terminated", "expired", "failed")
+
+def _month(day: date) -> date:
+    return day.replace(day=1)
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def ensure_partitions(db: Session, table: str, start: datetime, end: datetime):
+    """Monthly partitions of `table` covering [start, end], plus the default one (Postgres only)"""
+    if db.bind.dialect.name != "postgresql":
+        return
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+    month = _month(start.date())
+    while month <= end.date():
+        upper = _next_month(month)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {table}_{month:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        month = upper
+    db.commit()
+
+def _move(db: Session, hot, cold, condition, limit: int, now: datetime) -> int:
+    """Move one batch of rows matching `condition` from hot to cold (commits)"""
+    ids = [i for (i,) in db.query(hot.id).filter(condition).order_by(hot.id).limit(limit)
+           .with_for_update(skip_locked=True)]
+    if not ids:
+        return 0
+    columns = [c.name for c in cold.__table__.columns if c.name != "archived_at"]
+    source = select(*[hot.__table__.c[name] for name in columns], literal(now)).where(hot.id.in_(ids))
+    db.execute(insert(cold).from_select(columns + ["archived_at"], source))
+    db.query(hot).filter(hot.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
+
+def instance_condition(cutoff: datetime):
+    recent = exists().where(InstanceEvent.instance_id == RDPInstance.id, InstanceEvent.occurred_at >= cutoff)
+    return (RDPInstance.status.in_(DEAD_STATUSES)) & (RDPInstance.created_at < cutoff) & ~recent
+
+def ticket_condition(cutoff: datetime):
+    return (Ticket.status == "closed") & (Ticket.created_at < cutoff)
+
+def archive(db: Session, now: datetime = None) -> Dict[str, int]:
+    """Run batches until nothing is left to archive or ARCHIVE_MAX_BATCHES is reached"""
+    now = now or datetime.utcnow()
+    jobs = (
+        ("rdp_instances", RDPInstance, RDPInstanceArchive,
+         instance_condition(now - timedelta(days=settings.ARCHIVE_INSTANCES_AFTER_DAYS))),
+        ("tickets", Ticket, TicketArchive,
+         ticket_condition(now - timedelta(days=settings.ARCHIVE_TICKETS_AFTER_DAYS))),
+    )
+    moved = {}
+    for name, hot, cold, condition in jobs:
+        oldest = db.query(func.min(hot.created_at)).filter(condition).scalar()
+        moved[name] = 0
+        if oldest is None:
+            continue
+        ensure_partitions(db, cold.__tablename__, oldest, now)
+        for _ in range(settings.ARCHIVE_MAX_BATCHES):
+            count = _move(db, hot, cold, condition, settings.ARCHIVE_BATCH_SIZE, now)
+            moved[name] += count
+            if count < settings.ARCHIVE_BATCH_SIZE:
+                break
+    return moved
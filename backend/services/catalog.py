@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.database.connection import SessionLocal
+from backend.models.catalog import CatalogItem
+from backend.providers.contabo import ContaboProvider
+from backend.providers.vultr import VultrProvider
+
+# What we sell, and which provider offering backs it. Plan keys are what
+# orders store and what the frontend sends; provider plan/image ids are
+# checked against the synced catalog (see sync_catalog) instead of being
+# trusted blindly. Regions are in order of preference.
+
+class Product:
+    def __init__(self, key: str, name: str, os_type: str, provider: str, plan: str,
+                 image: str, default_image: str, regions: List[str], amount_kobo: int):
+        self.key = key
+        self.name = name
+        self.os_type = os_type
+        self.provider = provider
+        self.plan = plan
+        self.image = image  # provider image name, resolved to an id from the catalog
+        self.default_image = default_image  # id used until the catalog has been synced
+        self.regions = regions
+        self.amount_kobo = amount_kobo
+
+VULTR_REGIONS = ["ewr", "ord", "lax", "fra", "ams", "lhr", "sgp", "jnb", "bom", "nrt"]
+CONTABO_REGIONS = ["EU", "US-central", "US-east", "US-west", "UK", "SIN", "AUS", "JPN"]
+
+PRODUCTS: Dict[str, Product] = {p.key: p for p in (
+    Product("basic_windows", "Basic RDP (Windows)", "windows", "vultr", "vc2-2c-4gb",
+            "Windows 2022 Standard x64", "477", VULTR_REGIONS, 150000),
+    Product("performance_windows", "Performance RDP (Windows)", "windows", "vultr", "vc2-4c-8gb",
+            "Windows 2022 Standard x64", "477", VULTR_REGIONS, 300000),
+    Product("basic_linux", "Basic RDP (Ubuntu)", "linux", "contabo", "VPS-1-SSD-20",
+            "ubuntu-22.04", "ubuntu-22.04", CONTABO_REGIONS, 150000),
+    Product("performance_linux", "Performance RDP (Ubuntu)", "linux", "contabo", "VPS-2-SSD-40",
+            "ubuntu-22.04", "ubuntu-22.04", CONTABO_REGIONS, 300000),
+)}
+
+class CatalogError(Exception):
+    pass
+
+class OutOfStockError(CatalogError):
+    pass
+
+class Offer:
+    """A product resolved to concrete provider parameters"""
+
+    def __init__(self, product: Product, region: str, image: str):
+        self.product = product
+        self.provider = product.provider
+        self.plan = product.plan
+        self.region = region
+        self.image = image
+
+    def as_dict(self) -> Dict:
+        return {"product": self.product.key, "provider": self.provider, "plan": self.plan,
+                "region": self.region, "image": self.image}
+
+class CatalogSnapshot:
+    """Immutable in-memory view of catalog_items; every lookup is a dict hit"""
+
+    def __init__(self, items: List[CatalogItem]):
+        self.items = {(i.provider, i.kind, i.ref): i for i in items}
+        self.images_by_name = {
+            (i.provider, i.name.lower()): i.ref for i in items if i.kind == "image" and i.name and i.available
+        }
+        self.synced_providers = {i.provider for i in items}
+
+    def stocked_regions(self, product: Product) -> List[str]:
+        if product.provider not in self.synced_providers:
+            return list(product.regions)  # never synced (dev/mock): trust the defaults
+        plan = self.items.get((product.provider, "plan", product.plan))
+        if plan is None or not plan.available:
+            return []
+        in_stock = set(plan.data.get("regions", []))
+        return [r for r in product.regions if r in in_stock]
+
+    def resolve(self, plan_key: str, region: Optional[str] = None) -> Offer:
+        product = PRODUCTS.get(plan_key)
+        if product is None:
+            raise CatalogError(f"Unknown plan: {plan_key}")
+        regions = self.stocked_regions(product)
+        if region is not None:
+            if region not in product.regions:
+                raise CatalogError(f"{product.name} is not offered in {region}")
+            if region not in regions:
+                raise OutOfStockError(f"{product.name} is out of stock in {region}")
+        elif regions:
+            region = regions[0]
+        else:
+            raise OutOfStockError(f"{product.name} is out of stock")
+        image = self.images_by_name.get((product.provider, product.image.lower()), product.default_image)
+        return Offer(product, region, image)
+
+    def listing(self) -> List[Dict]:
+        """Products with price and stock, for the pricing page"""
+        listing = []
+        for product in PRODUCTS.values():
+            regions = self.stocked_regions(product)
+            plan = self.items.get((product.provider, "plan", product.plan))
+            listing.append({
+                "plan": product.key,
+                "name": product.name,
+                "os_type": product.os_type,
+                "amount_kobo": product.amount_kobo,
+                "specs": {k: plan.data.get(k) for k in ("vcpu", "ram_mb", "disk_gb")} if plan else None,
+                "regions": regions,
+                "in_stock": bool(regions),
+            })
+        return listing
+
+_snapshot: Optional[CatalogSnapshot] = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+def get_catalog(db: Optional[Session] = None) -> CatalogSnapshot:
+    """Process-wide snapshot, reloaded from the DB at most every CATALOG_CACHE_SECONDS"""
+    global _snapshot, _loaded_at
+    if _snapshot is not None and time.monotonic() - _loaded_at < settings.CATALOG_CACHE_SECONDS:
+        return _snapshot
+    with _lock:
+        if _snapshot is None or time.monotonic() - _loaded_at >= settings.CATALOG_CACHE_SECONDS:
+            session = db or SessionLocal()
+            try:
+                items = session.query(CatalogItem).all()
+                for item in items:
+                    session.expunge(item)
+            finally:
+                if db is None:
+                    session.close()
+            _snapshot = CatalogSnapshot(items)
+            _loaded_at = time.monotonic()
+    return _snapshot
+
+def invalidate_catalog():
+    global _loaded_at
+    _loaded_at = 0.0
+
+# --- Sync -----------------------------------------------------------------
+
+async def fetch_vultr() -> List[Dict]:
+    vultr = VultrProvider()
+    if not vultr.api_key:
+        return []
+    regions = sorted({r for p in PRODUCTS.values() if p.provider == "vultr" for r in p.regions})
+    plans, all_regions, oses, *availability = await asyncio.gather(
+        vultr.list_plans(), vultr.list_regions(), vultr.list_os(),
+        *(vultr.region_availability(r) for r in regions),
+    )
+    in_stock = dict(zip(regions, (set(a) for a in availability)))
+    rows = [{
+        "kind": "plan", "ref": p["id"], "name": p["id"],
+        "data": {
+            "vcpu": p.get("vcpu_count"), "ram_mb": p.get("ram"), "disk_gb": p.get("disk"),
+            "monthly_cost": p.get("monthly_cost"),
+            "regions": [r for r in regions if p["id"] in in_stock[r]],
+        },
+    } for p in plans]
+    rows += [{
+        "kind": "region", "ref": r["id"], "name": r.get("city"),
+        "data": {"city": r.get("city"), "country": r.get("country"), "continent": r.get("continent")},
+    } for r in all_regions]
+    rows += [{
+        "kind": "image", "ref": str(o["id"]), "name": o.get("name"),
+        "data": {"family": o.get("family")},
+    } for o in oses]
+    return rows
+
+async def fetch_contabo() -> List[Dict]:
+    contabo = ContaboProvider()
+    images = await contabo.list_images()
+    if not images:
+        return []
+    # No product/region API: our products and Contabo's published regions
+    plans = {p.plan for p in PRODUCTS.values() if p.provider == "contabo"}
+    rows = [{"kind": "plan", "ref": plan, "name": plan, "data": {"regions": CONTABO_REGIONS}} for plan in plans]
+    rows += [{"kind": "region", "ref": r, "name": r, "data": {}} for r in CONTABO_REGIONS]
+    rows += [{
+        "kind": "image", "ref": i["imageId"], "name": i.get("name"),
+        "data": {"os_type": i.get("osType")},
+    } for i in images]
+    return rows
+
+def store_provider_catalog(db: Session, provider: str, rows: List[Dict]) -> int:
+    """Upsert one provider's items; ones the provider no longer lists become unavailable"""
+    existing = {(i.kind, i.ref): i for i in db.query(CatalogItem).filter(CatalogItem.provider == provider)}
+    now = datetime.utcnow()
+    for row in rows:
+        item = existing.pop((row["kind"], row["ref"]), None)
+        if item is None:
+            item = CatalogItem(provider=provider, kind=row["kind"], ref=row["ref"])
+            db.add(item)
+        item.name = row.get("name")
+        item.data = row.get("data", {})
+        item.available = row.get("available", True)
+        item.synced_at = now
+    for item in existing.values():
+        item.available = False
+    db.commit()
+    invalidate_catalog()
+    return len(rows)
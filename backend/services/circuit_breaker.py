@@ -0,0 +1,58 @@
+import time
+import redis
+from backend.core.config import settings
+from backend.core.redis_client import get_redis
+
+class ProviderCircuitBreaker:
+    """Per-provider breaker kept in Redis, so workers record outcomes and the API reads them.
+
+    closed    -> provider healthy
+    open      -> BREAKER_FAILURE_THRESHOLD failures within BREAKER_WINDOW_SECONDS;
+                 stays open for BREAKER_COOLDOWN_SECONDS
+    half_open -> cooldown elapsed; the next success closes it, the next failure re-opens it
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.failures_key = f"breaker:{provider}:failures"
+        self.opened_key = f"breaker:{provider}:opened_at"
+
+    def _opened_at(self) -> float:
+        try:
+            return float(get_redis().get(self.opened_key) or 0)
+        except redis.RedisError:
+            return 0.0
+
+    def state(self) -> str:
+        opened_at = self._opened_at()
+        if not opened_at:
+            return "closed"
+        if time.time() - opened_at < settings.BREAKER_COOLDOWN_SECONDS:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> int:
+        """Seconds until an open breaker moves to half-open"""
+        opened_at = self._opened_at()
+        if not opened_at:
+            return 0
+        return max(0, int(opened_at + settings.BREAKER_COOLDOWN_SECONDS - time.time()))
+
+    def record_success(self):
+        try:
+            get_redis().delete(self.failures_key, self.opened_key)
+        except redis.RedisError:
+            pass
+
+    def record_failure(self):
+        try:
+            client = get_redis()
+            pipe = client.pipeline()
+            pipe.incr(self.failures_key)
+            pipe.expire(self.failures_key, settings.BREAKER_WINDOW_SECONDS, nx=True)
+            failures, _ = pipe.execute()
+            if failures >= settings.BREAKER_FAILURE_THRESHOLD or self.state() == "half_open":
+                client.set(self.opened_key, time.time())
+                print(f"Circuit breaker opened for {self.provider} after {failures} failures")
+        except redis.RedisError:
+            pass
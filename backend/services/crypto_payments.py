@@ -0,0 +1,210 @@
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from backend.core import metrics
+from backend.core.config import settings
+from backend.models.order import Order
+from backend.models.payment import DepositAddress
+from backend.services.hdwallet import derive_addresses
+from backend.services.orders import confirm_payment
+
+# Crypto checkout: every order gets its own deposit address.
+#
+#   refill_deposit_addresses (beat) --> deposit_addresses, status available
+#   POST /billing/initiate ----------> claim the lowest available index
+#   watch_crypto_deposits (beat) ----> balances per new block -> confirm_payment
+#
+# Addresses are derived ahead of time from the account xpubs (services/
+# hdwallet.py), so checkout is one UPDATE and never does EC math. Claims
+# take the lowest index first, keeping used addresses within the treasury
+# wallet's gap limit.
+#
+# An address is used once. After its quote expires it is still watched for
+# CRYPTO_LATE_PAYMENT_HOURS, since a payment may already be in flight. After
+# that it is marked expired and never handed out again. Funds arriving later
+# need a manual refund.
+#
+# Amounts are integers in base units. Order amounts are converted to USD at
+# CRYPTO_KOBO_PER_USD and priced from CRYPTO_USD_PRICES; there is no live
+# price feed.
+#
+# Development: CRYPTO_LOCAL_CHAIN=true enables every currency without
+# configuring anything. Chains without an xpub derive from DEV_XPUB (BIP32
+# test vector 1, testnet encoding; its private key is public) and deposits
+# are paid and mined by hand with backend/scripts/local_chain.py.
+
+CURRENCIES = {
+    # currency -> chain, branch under the chain's xpub, decimals
+    "BTC": {"chain": "bitcoin", "branch": 0, "decimals": 8},
+    "ETH": {"chain": "ethereum", "branch": 0, "decimals": 18},
+    "USDT": {"chain": "ethereum", "branch": 1, "decimals": 6},  # ERC-20
+}
+
+WATCH_TIP_KEY = "crypto:watch:{chain}:tip"
+DEV_XPUB = "tpubD6NzVbkrYhZ4XgiXtGrdW5XDAPFCL9h7we1vwNCpn8tGbBcgfVYjXyhWo4E1xkh56hjod1RhGjxbaTLV3X4FyWuejifB9jusQ46QzG87VKp"
+
+class PoolExhaustedError(Exception):
+    pass
+
+def _pairs(value: str) -> Dict[str, float]:
+    pairs = {}
+    for part in value.split(","):
+        name, _, number = part.strip().partition(":")
+        if name and number:
+            pairs[name.upper()] = float(number)
+    return pairs
+
+def xpub_for(currency: str) -> str:
+    chain = CURRENCIES[currency]["chain"]
+    xpub = settings.CRYPTO_BTC_XPUB if chain == "bitcoin" else settings.CRYPTO_ETH_XPUB
+    return xpub or (DEV_XPUB if settings.CRYPTO_LOCAL_CHAIN else "")
+
+def enabled_currencies():
+    prices = _pairs(settings.CRYPTO_USD_PRICES)
+    return [c for c in CURRENCIES if xpub_for(c) and prices.get(c)]
+
+def confirmations(currency: str) -> int:
+    return int(_pairs(settings.CRYPTO_CONFIRMATIONS).get(currency, 1))
+
+def quote(amount_kobo: int, currency: str) -> int:
+    """Price of an order in the currency's base units, rounded up"""
+    usd = Decimal(amount_kobo) / Decimal(str(settings.CRYPTO_KOBO_PER_USD))
+    price = Decimal(str(_pairs(settings.CRYPTO_USD_PRICES)[currency]))
+    return math.ceil(usd / price * 10 ** CURRENCIES[currency]["decimals"])
+
+# --- Pool -------------------------------------------------------------------------
+
+def pool_sizes(db: Session) -> Dict[str, int]:
+    rows = db.query(DepositAddress.currency, func.count(DepositAddress.id)).filter(
+        DepositAddress.status == "available"
+    ).group_by(DepositAddress.currency).all()
+    return dict(rows)
+
+def refill_pool(db: Session) -> Dict[str, int]:
+    """Derive addresses for every enabled currency below the low-water mark (callers hold the refill lock)"""
+    available = pool_sizes(db)
+    added = {}
+    for currency in enabled_currencies():
+        have = available.get(currency, 0)
+        if have >= settings.CRYPTO_POOL_LOW_WATER:
+            continue
+        last = db.query(func.max(DepositAddress.derivation_index)).filter(DepositAddress.currency == currency).scalar()
+        spec = CURRENCIES[currency]
+        derived = derive_addresses(xpub_for(currency), spec["chain"], spec["branch"],
+                                   0 if last is None else last + 1, settings.CRYPTO_POOL_TARGET - have)
+        db.execute(insert(DepositAddress), [
+            {"currency": currency, "chain": spec["chain"], "derivation_index": index, "address": address,
+             "status": "available"}
+            for index, address in derived
+        ])
+        db.commit()
+        added[currency] = len(derived)
+    return added
+
+def assign_address(db: Session, order: Order, currency: str) -> DepositAddress:
+    """Claim the lowest free address for an order, with its quote"""
+    now = datetime.utcnow()
+    for _ in range(3):
+        candidate = db.query(DepositAddress.id).filter(
+            DepositAddress.currency == currency, DepositAddress.status == "available"
+        ).order_by(DepositAddress.derivation_index).limit(1).with_for_update(skip_locked=True).scalar()
+        if candidate is None:
+            break
+        claimed = db.query(DepositAddress).filter(
+            DepositAddress.id == candidate, DepositAddress.status == "available"
+        ).update({
+            "status": "assigned", "order_id": order.id, "assigned_at": now,
+            "expected_amount": quote(order.amount, currency),
+            "expires_at": now + timedelta(minutes=settings.CRYPTO_PAYMENT_WINDOW_MINUTES),
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return db.get(DepositAddress, candidate)
+    metrics.inc("nemordp_crypto_pool_exhausted_total", currency=currency)
+    raise PoolExhaustedError(f"No {currency} deposit addresses available")
+
+def deposit_for(db: Session, order: Order) -> Optional[DepositAddress]:
+    return db.query(DepositAddress).filter(DepositAddress.order_id == order.id).first()
+
+def _human(amount, currency: str) -> str:
+    return format((Decimal(amount or 0) / 10 ** CURRENCIES[currency]["decimals"]).normalize(), "f")
+
+def payment_details(deposit: DepositAddress) -> dict:
+    expected = int(deposit.expected_amount)
+    if deposit.currency == "BTC":
+        uri = f"bitcoin:{deposit.address}?amount={_human(expected, 'BTC')}"
+    elif deposit.currency == "ETH":
+        uri = f"ethereum:{deposit.address}?value={expected}"  # EIP-681, in wei
+    else:
+        uri = f"ethereum:{settings.CRYPTO_USDT_CONTRACT}/transfer?address={deposit.address}&uint256={expected}"
+    return {
+        "currency": deposit.currency,
+        "wallet_address": deposit.address,
+        "amount": _human(expected, deposit.currency),
+        "received": _human(deposit.received_amount, deposit.currency),
+        "confirmations_required": confirmations(deposit.currency),
+        "payment_uri": uri,
+        "status": deposit.status,
+        "expires_at": deposit.expires_at.isoformat() if deposit.expires_at else None,
+    }
+
+# --- Watching -----------------------------------------------------------------------
+
+def settle(db: Session, deposit: DepositAddress) -> bool:
+    """Confirm the order paid through this address; safe to repeat"""
+    order = db.get(Order, deposit.order_id)
+    if confirm_payment(db, order.reference):
+        print(f"Crypto payment confirmed for order {order.reference} ({deposit.currency})")
+        metrics.inc("nemordp_crypto_payments_total", currency=deposit.currency)
+    # Only after the order is confirmed: a crash in between re-runs the
+    # (idempotent) confirmation next block
+    settled = db.query(DepositAddress).filter(
+        DepositAddress.id == deposit.id, DepositAddress.status == "assigned"
+    ).update({"status": "paid", "paid_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return settled == 1
+
+def watched_by_currency(db: Session, chain: str) -> Dict[str, List[DepositAddress]]:
+    """Addresses of a chain still waiting for funds"""
+    by_currency = defaultdict(list)
+    for deposit in db.query(DepositAddress).filter(DepositAddress.chain == chain, DepositAddress.status == "assigned"):
+        by_currency[deposit.currency].append(deposit)
+    return by_currency
+
+def apply_balances(db: Session, deposits: List[DepositAddress], received: Dict[str, int]) -> Counter:
+    """Record confirmed amounts and settle the addresses that are fully paid"""
+    outcomes = Counter(checked=len(deposits))
+    for deposit in deposits:
+        amount = received.get(deposit.address, 0)
+        if amount and amount != deposit.received_amount:
+            deposit.received_amount = amount
+    db.commit()
+    for deposit in deposits:
+        if deposit.received_amount and deposit.received_amount >= deposit.expected_amount:
+            outcomes["paid"] += settle(db, deposit)
+        elif deposit.received_amount:
+            outcomes["partial"] += 1
+    return outcomes
+
+def expire_deposits(db: Session, now: datetime) -> int:
+    """Stop watching addresses whose quote and late-payment window have both passed"""
+    cutoff = now - timedelta(hours=settings.CRYPTO_LATE_PAYMENT_HOURS)
+    stale = db.query(DepositAddress).filter(
+        DepositAddress.status == "assigned", DepositAddress.expires_at < cutoff
+    ).limit(1000).all()
+    for deposit in stale:
+        if deposit.received_amount:
+            print(f"Deposit {deposit.address} expired underpaid ({_human(deposit.received_amount, deposit.currency)} "
+                  f"{deposit.currency} of {_human(deposit.expected_amount, deposit.currency)}); refund manually")
+        db.query(DepositAddress).filter(
+            DepositAddress.id == deposit.id, DepositAddress.status == "assigned"
+        ).update({"status": "expired"}, synchronize_session=False)
+        db.query(Order).filter(Order.id == deposit.order_id, Order.status == "pending").update(
+            {"status": "expired"}, synchronize_session=False
+        )
+    db.commit()
+    return len(stale)
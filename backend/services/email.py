@@ -1,4 +1,6 @@
+import asyncio
 import smtplib
+from email.mime.application import MIMEApplication
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from jinja2 import Template
@@ -16,7 +18,7 @@ class EmailService:
         """Send RDP credentials to user"""
         if not self.smtp_username:
              print(f"SMTP Credentials missing. Mocking email to {to_email}")
-             print(f"Credentials: {credentials}")
+             print(f"Instance {credentials['ip_address']} ready for {credentials['username']}")
              return
 
         subject = f"Your NemoRDP {str(os_type).split('.')[-1].title()} Server is Ready! 🚀"
@@ -32,6 +34,68 @@ class EmailService:
         
         await self._send_email(to_email, subject, html_content)
 
+    async def send_order_credentials(self, to_email: str, reference: str, plan: str, os_type: str,
+                                     seats: list, csv_content: str):
+        """One email for a whole bulk order: a table of every seat plus the same data as CSV"""
+        active = [seat for seat in seats if seat["status"] == "active"]
+        if not self.smtp_username:
+            print(f"SMTP Credentials missing. Mocking email to {to_email}")
+            print(f"Order {reference}: {len(active)}/{len(seats)} servers ready")
+            return
+
+        os_name = str(os_type).split('.')[-1].title()
+        subject = f"Your {len(active)} NemoRDP {os_name} Servers are Ready! 🚀"
+        html_content = Template(self._get_order_template()).render(
+            os_type=os_name, reference=reference, plan=plan, seats=seats, active=len(active),
+        )
+        await self._send_email(to_email, subject, html_content,
+                               attachments=[(f"nemordp-{reference}.csv", csv_content)])
+
+    def _get_order_template(self) -> str:
+        return """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 800px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center; }
+        table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+        th, td { text-align: left; padding: 6px 10px; border-bottom: 1px solid #dee2e6; }
+        td { font-family: monospace; }
+        .failed { color: #c0392b; }
+        .footer { text-align: center; color: #6c757d; font-size: 14px; margin-top: 30px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🎉 {{ active }} of {{ seats|length }} {{ os_type }} servers are ready</h1>
+            <p>Order {{ reference }} ({{ plan }})</p>
+        </div>
+
+        <table>
+            <tr><th>Seat</th><th>IP Address</th><th>Port</th><th>Username</th><th>Password</th></tr>
+            {% for seat in seats %}
+            {% if seat.status == "active" %}
+            <tr><td>{{ seat.seat }}</td><td>{{ seat.ip_address }}</td><td>{{ seat.port }}</td><td>{{ seat.username }}</td><td>{{ seat.password }}</td></tr>
+            {% else %}
+            <tr class="failed"><td>{{ seat.seat }}</td><td colspan="4">Could not be provisioned. Reply to this email and we will retry or refund it.</td></tr>
+            {% endif %}
+            {% endfor %}
+        </table>
+
+        <p>The attached CSV has the same details, one server per line.</p>
+
+        <div class="footer">
+            <p>Need help? Reply to this email or visit our support center.</p>
+            <p>© 2024 NemoRDP. All rights reserved.</p>
+        </div>
+    </div>
+</body>
+</html>
+        """
+
     def _get_credentials_template(self) -> str:
         # Use simple string template for now, or read from file
         return """
@@ -97,23 +161,113 @@ class EmailService:
 </html>
         """
 
-    async def _send_email(self, to_email: str, subject: str, html_content: str):
-        """Send email via SMTP"""
-        msg = MIMEMultipart('alternative')
+    async def send_renewal_digests(self, digests: list) -> list:
+        """One reminder per user listing every server about to expire, all over one SMTP connection.
+
+        Returns None or the exception for each digest, in order.
+        """
+        if not self.smtp_username:
+            for digest in digests:
+                print(f"SMTP Credentials missing. Mocking email to {digest['email']}")
+                print(f"{len(digest['instances'])} servers expiring soon")
+            return [None] * len(digests)
+
+        template = Template(self._get_renewal_template())
+        messages = []
+        for digest in digests:
+            count = len(digest["instances"])
+            subject = ("Your NemoRDP server expires soon" if count == 1
+                       else f"{count} of your NemoRDP servers expire soon")
+            messages.append(self._build_message(digest["email"], subject, template.render(instances=digest["instances"])))
+        return await asyncio.to_thread(self._send_batch, messages)
+
+    def _get_renewal_template(self) -> str:
+        return """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 800px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; text-align: center; }
+        table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+        th, td { text-align: left; padding: 6px 10px; border-bottom: 1px solid #dee2e6; }
+        .button { display: inline-block; background: #667eea; color: white; padding: 6px 14px; text-decoration: none; border-radius: 4px; }
+        .footer { text-align: center; color: #6c757d; font-size: 14px; margin-top: 30px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>⏰ Renew your servers before they expire</h1>
+        </div>
+
+        <p>Expired servers are deleted together with their data.</p>
+
+        <table>
+            <tr><th>Server</th><th>Plan</th><th>Expires (UTC)</th><th></th></tr>
+            {% for instance in instances %}
+            <tr>
+                <td>{{ instance.ip_address }} ({{ instance.os_type }})</td>
+                <td>{{ instance.plan }}</td>
+                <td>{{ instance.expires_at.strftime("%Y-%m-%d %H:%M") }}</td>
+                <td><a class="button" href="{{ instance.renew_url }}">Renew</a></td>
+            </tr>
+            {% endfor %}
+        </table>
+
+        <div class="footer">
+            <p>Need help? Reply to this email or visit our support center.</p>
+            <p>© 2024 NemoRDP. All rights reserved.</p>
+        </div>
+    </div>
+</body>
+</html>
+        """
+
+    def _build_message(self, to_email: str, subject: str, html_content: str, attachments: list = None):
+        """attachments are (filename, text) pairs"""
+        msg = MIMEMultipart('mixed' if attachments else 'alternative')
         msg['Subject'] = subject
         msg['From'] = self.from_email
         msg['To'] = to_email
         
         html_part = MIMEText(html_content, 'html')
         msg.attach(html_part)
-        
-        try:
-            # Note: synchronous standard library call in async function is blocking
-            # ideally run in threadpool or use aiosmtplib. For low volume this is "ok" for mvp
+        for filename, content in attachments or []:
+            part = MIMEApplication(content.encode(), _subtype="csv")
+            part.add_header("Content-Disposition", "attachment", filename=filename)
+            msg.attach(part)
+        return msg
+
+    def _send_batch(self, messages: list) -> list:
+        """Send on one connection (one TLS handshake and login for the whole batch).
+
+        A refused recipient only fails its own message; losing the connection
+        raises, failing the rest of the batch.
+        """
+        results = []
+        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            server.starttls()
+            server.login(self.smtp_username, self.smtp_password)
+            for msg in messages:
+                try:
+                    server.send_message(msg)
+                    results.append(None)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                    results.append(e)
+        return results
+
+    async def _send_email(self, to_email: str, subject: str, html_content: str, attachments: list = None):
+        """Send email via SMTP; attachments are (filename, text) pairs"""
+        msg = self._build_message(to_email, subject, html_content, attachments)
+
+        def _send():
             with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
                 server.starttls()
                 server.login(self.smtp_username, self.smtp_password)
                 server.send_message(msg)
-        except Exception as e:
-            # Log error but don't fail the provisioning
-            print(f"Email sending failed: {e}")
+
+        # smtplib blocks; keep it off the shared event loop. Errors propagate so
+        # the calling task retries instead of silently dropping the email.
+        await asyncio.to_thread(_send)
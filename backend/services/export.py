@@ -0,0 +1,179 @@
+import csv
+import io
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+import orjson
+from sqlalchemy import Boolean, DateTime, Float, Integer, select, union_all
+from sqlalchemy.orm import Session
+from backend.models.archive import RDPInstanceArchive, TicketArchive
+from backend.models.rdp_instance import RDPInstance
+from backend.models.ticket import Ticket
+from backend.models.user import User
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: CSV and NDJSON only
+    pa = None
+
+# Streaming bulk export. Rows are read in id order through a server-side
+# cursor (stream_results + yield_per, so psycopg2 uses a named cursor) and
+# each chunk is encoded and handed to the response before the next is
+# fetched. Memory stays at one chunk whatever the table size.
+#
+# Every export starts with the id column and is ordered by it, so an
+# interrupted download resumes with after_id=<last id received>.
+# Credentials and password hashes are not exportable: they are simply
+# absent from EXPORTABLE.
+#
+# Instances and tickets moved to the archive tables (services/archive.py)
+# are part of a full export: include_archived (on by default) reads the
+# hot and archive table as one UNION ALL in id order. Archived rows keep
+# their ids, so the two never overlap and after_id resumes across both.
+# Turn it off to export only the live rows.
+
+CHUNK_SIZE = 5000
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORTABLE = {
+    # dataset -> model, exportable columns, archive model (same columns) or None
+    "users": (User, ("id", "email", "paystack_customer_id", "crypto_wallet_address", "is_active", "created_at"), None),
+    "instances": (RDPInstance, (
+        "id", "user_id", "provider", "provider_id", "ip_address", "os_type", "plan", "status",
+        "order_reference", "order_id", "created_at", "ready_at", "expires_at",
+    ), RDPInstanceArchive),
+    "tickets": (Ticket, ("id", "user_id", "subject", "message", "status", "created_at"), TicketArchive),
+}
+
+class ExportError(ValueError):
+    pass
+
+def available_formats() -> List[str]:
+    return [f for f in FORMATS if f != "parquet" or pa is not None]
+
+def resolve_columns(dataset: str, columns: Optional[Sequence[str]] = None) -> List[str]:
+    """The requested columns (all exportable ones by default), always led by id"""
+    if dataset not in EXPORTABLE:
+        raise ExportError(f"Unknown dataset: {dataset}")
+    allowed = EXPORTABLE[dataset][1]
+    if not columns:
+        return list(allowed)
+    unknown = [c for c in columns if c not in allowed]
+    if unknown:
+        raise ExportError(f"Columns not exportable from {dataset}: {', '.join(unknown)}")
+    return ["id"] + [c for c in dict.fromkeys(columns) if c != "id"]
+
+def _select(model, columns: List[str], since: Optional[datetime], until: Optional[datetime],
+            after_id: Optional[int]):
+    statement = select(*[getattr(model, c) for c in columns])
+    if since is not None:
+        statement = statement.where(model.created_at >= since)
+    if until is not None:
+        statement = statement.where(model.created_at < until)
+    if after_id is not None:
+        statement = statement.where(model.id > after_id)
+    return statement
+
+def iter_chunks(db: Session, dataset: str, columns: List[str], since: Optional[datetime] = None,
+                until: Optional[datetime] = None, after_id: Optional[int] = None,
+                include_archived: bool = True, chunk_size: int = CHUNK_SIZE) -> Iterator[List[tuple]]:
+    model, _, archive = EXPORTABLE[dataset]
+    statement = _select(model, columns, since, until, after_id)
+    if include_archived and archive is not None:
+        # Both sides are read in id order (primary keys), merged by the outer ORDER BY
+        both = union_all(statement, _select(archive, columns, since, until, after_id)).subquery()
+        statement = select(both).order_by(both.c.id)
+    else:
+        statement = statement.order_by(model.id)
+    result = db.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+# --- Encoders: chunks of rows in, bytes out --------------------------------------
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_csv(columns: List[str], chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows([[_csv_value(v) for v in row] for row in rows])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def encode_ndjson(columns: List[str], chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+def _arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands over whatever was written since the last drain"""
+
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+def encode_parquet(dataset: str, columns: List[str], chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """One row group per chunk, flushed as soon as it is written"""
+    model = EXPORTABLE[dataset][0]
+    schema = pa.schema([(c, _arrow_type(model.__table__.c[c])) for c in columns])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in chunks:
+            writer.write_table(pa.Table.from_pylist([dict(zip(columns, row)) for row in rows], schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_progress(db: Session, dataset: str, fmt: str, columns: List[str], **filters) -> Iterator[Tuple[bytes, int]]:
+    """(bytes, last id they contain) per chunk; what a resumable writer checkpoints on"""
+    if fmt not in available_formats():
+        raise ExportError(f"Format must be one of {', '.join(available_formats())}")
+    last = {"id": filters.get("after_id")}
+
+    def _tracked():
+        for rows in iter_chunks(db, dataset, columns, **filters):
+            last["id"] = rows[-1][0]
+            yield rows
+
+    if fmt == "csv":
+        encoded = encode_csv(columns, _tracked())
+    elif fmt == "ndjson":
+        encoded = encode_ndjson(columns, _tracked())
+    else:
+        encoded = encode_parquet(dataset, columns, _tracked())
+    return ((data, last["id"]) for data in encoded)
+
+def stream_export(db: Session, dataset: str, fmt: str, columns: List[str], **filters) -> Iterator[bytes]:
+    return (data for data, _ in export_progress(db, dataset, fmt, columns, **filters))
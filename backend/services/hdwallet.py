@@ -0,0 +1,127 @@
+import hashlib
+import hmac
+from typing import Dict, List, Tuple
+from ecdsa import SECP256k1, VerifyingKey
+from eth_utils import keccak, to_checksum_address
+
+# Watch-only BIP32 derivation (public parent -> public child, non-hardened
+# indexes only). The API and workers hold account-level extended public
+# keys; the private keys never leave the treasury wallet, which can spend
+# from every derived address with the matching xprv.
+#
+#   <xpub>/<branch>/<index>  -> compressed public key -> chain address
+#
+# Bitcoin addresses are native segwit (P2WPKH, bech32). Ethereum addresses
+# are the EIP-55 checksummed keccak of the uncompressed key, and hold both
+# ETH and ERC-20 deposits.
+
+BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BECH32 = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+HARDENED = 0x80000000
+
+# Extended public key version bytes -> bech32 prefix of the network
+VERSIONS = {
+    "0488b21e": "bc",  # xpub
+    "04b24746": "bc",  # zpub
+    "043587cf": "tb",  # tpub
+    "045f1cf6": "tb",  # vpub
+}
+
+class DerivationError(ValueError):
+    pass
+
+def _b58check_decode(value: str) -> bytes:
+    number = 0
+    for char in value:
+        if char not in BASE58:
+            raise DerivationError("Extended key is not base58")
+        number = number * 58 + BASE58.index(char)
+    raw = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    raw = b"\x00" * (len(value) - len(value.lstrip("1"))) + raw
+    payload, checksum = raw[:-4], raw[-4:]
+    if hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4] != checksum:
+        raise DerivationError("Extended key checksum mismatch")
+    return payload
+
+def _hash160(data: bytes) -> bytes:
+    sha = hashlib.sha256(data).digest()
+    try:
+        return hashlib.new("ripemd160", sha).digest()
+    except ValueError:  # OpenSSL 3 builds without the legacy provider
+        from Crypto.Hash import RIPEMD160
+        return RIPEMD160.new(sha).digest()
+
+def _bech32_polymod(values: List[int]) -> int:
+    generator = (0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3)
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1FFFFFF) << 5 ^ value
+        for i in range(5):
+            checksum ^= generator[i] if (top >> i) & 1 else 0
+    return checksum
+
+def _convert_bits(data: bytes, from_bits: int, to_bits: int) -> List[int]:
+    acc, bits, out = 0, 0, []
+    for value in data:
+        acc = (acc << from_bits) | value
+        bits += from_bits
+        while bits >= to_bits:
+            bits -= to_bits
+            out.append((acc >> bits) & ((1 << to_bits) - 1))
+    if bits:
+        out.append((acc << (to_bits - bits)) & ((1 << to_bits) - 1))
+    return out
+
+def segwit_address(hrp: str, program: bytes) -> str:
+    """Version 0 witness program as a bech32 address (BIP173)"""
+    data = [0] + _convert_bits(program, 8, 5)
+    expanded = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+    polymod = _bech32_polymod(expanded + data + [0] * 6) ^ 1
+    checksum = [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+    return hrp + "1" + "".join(BECH32[d] for d in data + checksum)
+
+class ExtendedPublicKey:
+    def __init__(self, key: bytes, chain_code: bytes, hrp: str):
+        self.key = key  # 33-byte compressed point
+        self.chain_code = chain_code
+        self.hrp = hrp
+
+    @classmethod
+    def parse(cls, value: str) -> "ExtendedPublicKey":
+        payload = _b58check_decode(value.strip())
+        if len(payload) != 78:
+            raise DerivationError("Extended key has the wrong length")
+        version = payload[:4].hex()
+        if version not in VERSIONS:
+            raise DerivationError("Not an extended public key (xpub/zpub/tpub/vpub)")
+        return cls(payload[45:], payload[13:45], VERSIONS[version])
+
+    def child(self, index: int) -> "ExtendedPublicKey":
+        """CKDpub"""
+        if index >= HARDENED:
+            raise DerivationError("Hardened children can't be derived from a public key")
+        digest = hmac.new(self.chain_code, self.key + index.to_bytes(4, "big"), hashlib.sha512).digest()
+        tweak = int.from_bytes(digest[:32], "big")
+        if tweak >= SECP256k1.order:
+            raise DerivationError(f"Invalid child {index}")  # ~2^-127; BIP32 says skip the index
+        point = SECP256k1.generator * tweak + VerifyingKey.from_string(self.key, curve=SECP256k1).pubkey.point
+        child_key = VerifyingKey.from_public_point(point, curve=SECP256k1).to_string("compressed")
+        return ExtendedPublicKey(child_key, digest[32:], self.hrp)
+
+    def address(self, chain: str) -> str:
+        if chain == "bitcoin":
+            return segwit_address(self.hrp, _hash160(self.key))
+        if chain == "ethereum":
+            uncompressed = VerifyingKey.from_string(self.key, curve=SECP256k1).to_string("uncompressed")
+            return to_checksum_address(keccak(uncompressed[1:])[-20:])
+        raise DerivationError(f"Unknown chain {chain}")
+
+_branches: Dict[Tuple[str, int], ExtendedPublicKey] = {}
+
+def derive_addresses(xpub: str, chain: str, branch: int, start: int, count: int) -> List[Tuple[int, str]]:
+    """[(index, address)] for <xpub>/<branch>/<start .. start+count-1>"""
+    node = _branches.get((xpub, branch))
+    if node is None:
+        node = _branches[(xpub, branch)] = ExtendedPublicKey.parse(xpub).child(branch)
+    return [(index, node.child(index).address(chain)) for index in range(start, start + count)]
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import secrets
+import string
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.golden_image import GoldenImage
+
+# Linux desktops used to install ubuntu-desktop-minimal, xrdp and friends via
+# cloud-init on every order (gigabytes and many minutes per VM). The same
+# recipe is now baked once into a versioned golden image:
+#
+#   1. CI runs recipe_script() against the stock cloud image, e.g.
+#        python -m backend.scripts.golden_image recipe > desktop.sh
+#        virt-customize -a ubuntu-22.04.qcow2 --run desktop.sh
+#      and publishes the qcow2 at GOLDEN_IMAGE_URL_LINUX.
+#   2. refresh_golden_images registers the artifact with the provider
+#      (Contabo custom images; its API cannot capture a running VM) under
+#      a new version whenever the recipe or the URL changes, and promotes
+#      it once the provider reports it ready.
+#   3. Provisioning boots the newest ready image with a first-boot script
+#      that only sets a fresh password, or falls back to the full
+#      cloud-init install when no image is ready.
+
+DESKTOP_USER = "ubuntu"
+DESKTOP_PACKAGES = ["ubuntu-desktop-minimal", "xrdp", "firefox", "code"]
+DESKTOP_SETUP = [
+    "systemctl enable xrdp",
+    "ufw allow 3389",
+    f"adduser {DESKTOP_USER} sudo",
+    "sed -i 's/^#*WaylandEnable=false/WaylandEnable=false/' /etc/gdm3/custom.conf",
+]
+# Strip per-machine state so every clone gets its own identity on first boot
+GENERALIZE = [
+    "cloud-init clean --logs",
+    "truncate -s 0 /etc/machine-id",
+    "rm -f /etc/ssh/ssh_host_*",
+    # xrdp's TLS key/cert are symlinks to the snakeoil pair; rsakeys.ini signs classic RDP security
+    "rm -f /etc/xrdp/key.pem /etc/xrdp/cert.pem /etc/xrdp/rsakeys.ini",
+    "rm -f /etc/ssl/private/ssl-cert-snakeoil.key /etc/ssl/certs/ssl-cert-snakeoil.pem",
+]
+# ...and recreate it on the clone (SSH host keys are regenerated by cloud-init)
+REGENERATE_KEYS = [
+    "make-ssl-cert generate-default-snakeoil --force-overwrite",
+    "ln -sf /etc/ssl/private/ssl-cert-snakeoil.key /etc/xrdp/key.pem",
+    "ln -sf /etc/ssl/certs/ssl-cert-snakeoil.pem /etc/xrdp/cert.pem",
+    "xrdp-keygen xrdp auto",
+]
+
+# Artifacts published per (provider, os_type)
+def image_sources() -> dict:
+    return {("contabo", "linux"): settings.GOLDEN_IMAGE_URL_LINUX}
+
+BUILD_TIMEOUT = timedelta(hours=6)
+BUILD_RETRY_AFTER = timedelta(hours=1)  # a failed recipe is registered again as a new version
+
+def recipe_script() -> str:
+    lines = ["#!/bin/sh", "set -e", "export DEBIAN_FRONTEND=noninteractive", "apt-get update",
+             f"apt-get install -y {' '.join(DESKTOP_PACKAGES)}"]
+    return "\n".join(lines + DESKTOP_SETUP + GENERALIZE) + "\n"
+
+def recipe_hash(source_url: str) -> str:
+    return hashlib.sha256((recipe_script() + source_url).encode()).hexdigest()[:16]
+
+def generate_password(length: int = 16) -> str:
+    alphabet = string.ascii_letters + string.digits + "!@#%^*-_"
+    while True:
+        password = "".join(secrets.choice(alphabet) for _ in range(length))
+        if (any(c.islower() for c in password) and any(c.isupper() for c in password)
+                and any(c.isdigit() for c in password)):
+            return password
+
+def _chpasswd(password: str) -> List[str]:
+    # JSON strings are valid YAML scalars, so any password character is safe
+    return ["chpasswd:", "  expire: false", "  users:",
+            f"    - {{name: {DESKTOP_USER}, password: {json.dumps(password)}, type: text}}"]
+
+def full_install_user_data(password: str) -> str:
+    """Fallback: install the desktop at boot (slow)"""
+    lines = ["#cloud-config", "packages:"] + [f"  - {p}" for p in DESKTOP_PACKAGES]
+    lines += _chpasswd(password)
+    lines += ["runcmd:"] + [f"  - {json.dumps(c)}" for c in DESKTOP_SETUP + ["reboot"]]
+    return "\n".join(lines) + "\n"
+
+def first_boot_user_data(password: str) -> str:
+    """Golden image: the desktop is already there, only set credentials and host keys"""
+    lines = ["#cloud-config"] + _chpasswd(password)
+    lines += ["runcmd:"] + [f"  - {json.dumps(c)}" for c in REGENERATE_KEYS + ["systemctl restart xrdp"]]
+    return "\n".join(lines) + "\n"
+
+def find_golden_image(db: Session, provider: str, os_type: str, region: Optional[str] = None,
+                      plan: Optional[str] = None) -> Optional[GoldenImage]:
+    """Newest ready image usable for this provider/region/plan, if any"""
+    return db.query(GoldenImage).filter(
+        GoldenImage.provider == provider,
+        GoldenImage.os_type == os_type,
+        GoldenImage.status == "ready",
+        or_(GoldenImage.region.is_(None), GoldenImage.region == region),
+        or_(GoldenImage.plan.is_(None), GoldenImage.plan == plan),
+    ).order_by(GoldenImage.version.desc()).first()
+
+def pending_builds(db: Session) -> List[GoldenImage]:
+    """Create a `building` row for every artifact whose recipe has no image yet.
+
+    Failed attempts only count for BUILD_RETRY_AFTER, so a transient provider
+    error doesn't block the recipe until its URL changes.
+    """
+    created = []
+    retry_before = datetime.utcnow() - BUILD_RETRY_AFTER
+    for (provider, os_type), url in image_sources().items():
+        if not url:
+            continue
+        recipe = recipe_hash(url)
+        if db.query(GoldenImage).filter(
+            GoldenImage.provider == provider, GoldenImage.os_type == os_type, GoldenImage.recipe == recipe,
+            or_(GoldenImage.status != "failed", GoldenImage.created_at > retry_before),
+        ).first():
+            continue
+        latest = db.query(GoldenImage.version).filter(GoldenImage.provider == provider, GoldenImage.os_type == os_type) \
+            .order_by(GoldenImage.version.desc()).first()
+        image = GoldenImage(provider=provider, os_type=os_type, version=(latest[0] if latest else 0) + 1,
+                            recipe=recipe, source_url=url, status="building")
+        db.add(image)
+        created.append(image)
+    db.commit()
+    return created
+
+def mark_ready(db: Session, image: GoldenImage) -> List[GoldenImage]:
+    """Promote an image; returns older ones past GOLDEN_IMAGE_KEEP to delete at the provider
+
+    Statuses: building -> ready -> retired -> deleted, or building -> failed.
+    """
+    image.status = "ready"
+    image.ready_at = datetime.utcnow()
+    older = db.query(GoldenImage).filter(
+        GoldenImage.provider == image.provider,
+        GoldenImage.os_type == image.os_type,
+        GoldenImage.region.is_(None) if image.region is None else GoldenImage.region == image.region,
+        GoldenImage.status.in_(("ready", "retired")),
+        GoldenImage.version < image.version,
+    ).order_by(GoldenImage.version.desc()).all()
+    # Keep the previous version(s) registered for rollback, but stop using them
+    for old in older:
+        old.status = "retired"
+    db.commit()
+    return older[max(0, settings.GOLDEN_IMAGE_KEEP - 1):]
+
+def mark_failed(db: Session, image: GoldenImage, error: str):
+    image.status = "failed"
+    image.error = error[:2000]
+    db.commit()
+
+def timed_out(image: GoldenImage) -> bool:
+    return image.created_at is not None and datetime.utcnow() - image.created_at > BUILD_TIMEOUT
@@ -0,0 +1,248 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.rdp_instance import RDPInstance
+from backend.models.usage import InstanceEvent, UsageDaily, UsageDirtyHour, UsageHourly, UsageInterval
+from backend.services.catalog import PRODUCTS, get_catalog
+
+# Instance-hour metering.
+#
+#   lifecycle code --record_event--> instance_events (one row per instance+event)
+#                                    usage_intervals (billable span per instance)
+#                                    usage_dirty_hours (hours a change touched)
+#   rollup_usage (beat) ----------> usage_hourly -> usage_daily
+#
+# An instance is billable from `active` until the first of terminated,
+# expired or failed. Each rollup recomputes whole hours from the intervals
+# (delete + insert), so reruns are harmless. It covers everything from the
+# newest hour already rolled up through the current hour, plus any hour a
+# late or corrected event has marked dirty. Days are then re-summed from
+# their hours. Reports read only the rollup tables.
+
+START_EVENT = "active"
+END_EVENTS = ("terminated", "expired", "failed")
+EVENTS = ("provisioning", START_EVENT) + END_EVENTS
+
+HOUR = timedelta(hours=1)
+MAX_CATCHUP = timedelta(days=7)
+HOURS_PER_MONTH = 730  # provider list prices are monthly
+
+def floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+def hours_between(start: datetime, end: datetime) -> List[datetime]:
+    """Hour buckets touching [start, end]"""
+    hours, hour = [], floor_hour(start)
+    while hour <= end:
+        hours.append(hour)
+        hour += HOUR
+    return hours
+
+def _touched(old: Tuple, new: Tuple, now: datetime) -> Set[datetime]:
+    """Hours whose usage differs between two (start, end) intervals; end None = still running"""
+    (s1, e1), (s2, e2) = old, new
+    if s1 is None and s2 is None:
+        return set()
+    if s1 is None or s2 is None:
+        start, end = (s2, e2) if s1 is None else (s1, e1)
+        return set(hours_between(start, end or now))
+    e1, e2 = e1 or now, e2 or now
+    hours = set()
+    if s1 != s2:
+        hours.update(hours_between(min(s1, s2), max(s1, s2)))
+    if e1 != e2:
+        hours.update(hours_between(min(e1, e2), max(e1, e2)))
+    return hours
+
+def mark_dirty(db: Session, hours: Iterable[datetime], now: datetime):
+    # Every state change marks the current hour, so concurrent writers hit the
+    # same row: upsert instead of select-then-insert, which raced into a
+    # unique violation that aborted the caller's transaction. Sorted so two
+    # writers lock the rows in the same order.
+    hours = sorted(set(hours))
+    if not hours:
+        return
+    dialect_insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    statement = dialect_insert(UsageDirtyHour).values([{"hour": hour, "marked_at": now} for hour in hours])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[UsageDirtyHour.hour], set_={"marked_at": statement.excluded.marked_at}
+    ))
+
+def record_event(db: Session, instance: RDPInstance, event: str, occurred_at: Optional[datetime] = None) -> bool:
+    """Record a lifecycle event in the caller's transaction (caller commits).
+
+    Idempotent per (instance, event): a repeat with the same time is a no-op,
+    one with a different time is a correction and re-dirties the hours it moves.
+    """
+    if event not in EVENTS:
+        raise ValueError(f"Unknown lifecycle event: {event}")
+    now = datetime.utcnow()
+    occurred_at = occurred_at or now
+    row = db.query(InstanceEvent).filter(
+        InstanceEvent.instance_id == instance.id, InstanceEvent.event == event
+    ).first()
+    if row is not None and row.occurred_at == occurred_at:
+        return False
+    if row is None:
+        db.add(InstanceEvent(instance_id=instance.id, event=event, occurred_at=occurred_at, recorded_at=now))
+    else:
+        row.occurred_at = occurred_at
+        row.recorded_at = now
+    if event == START_EVENT or event in END_EVENTS:
+        db.flush()
+        _update_interval(db, instance, now)
+    return True
+
+def clear_event(db: Session, instance: RDPInstance, event: str) -> bool:
+    """Withdraw a lifecycle event (caller commits), e.g. the `failed` of a seat that is being retried.
+
+    The interval is recomputed without it, so a retried seat doesn't keep an
+    end that precedes its next start.
+    """
+    deleted = db.query(InstanceEvent).filter(
+        InstanceEvent.instance_id == instance.id, InstanceEvent.event == event
+    ).delete(synchronize_session=False)
+    if deleted and (event == START_EVENT or event in END_EVENTS):
+        db.flush()
+        _update_interval(db, instance, datetime.utcnow())
+    return deleted > 0
+
+def _update_interval(db: Session, instance: RDPInstance, now: datetime):
+    times = dict(db.query(InstanceEvent.event, InstanceEvent.occurred_at).filter(
+        InstanceEvent.instance_id == instance.id
+    ).all())
+    ends = [times[e] for e in END_EVENTS if e in times]
+    interval = db.get(UsageInterval, instance.id)
+    if interval is None:
+        interval = UsageInterval(instance_id=instance.id, user_id=instance.user_id, plan=instance.plan,
+                                 provider=instance.provider)
+        db.add(interval)
+    old = (interval.started_at, interval.ended_at)
+    interval.started_at = times.get(START_EVENT)
+    interval.ended_at = min(ends) if ends else None
+    mark_dirty(db, _touched(old, (interval.started_at, interval.ended_at), now), now)
+
+# --- Pricing ----------------------------------------------------------------
+
+def hourly_rates(db: Session) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """(plan key, provider) -> (revenue, cost) in kobo per instance-hour"""
+    catalog = get_catalog(db)
+    rates = {}
+    for product in PRODUCTS.values():
+        revenue = product.amount_kobo / settings.BILLING_PERIOD_HOURS
+        item = catalog.items.get((product.provider, "plan", product.plan))
+        monthly_usd = (item.data or {}).get("monthly_cost") if item is not None else None
+        cost = float(monthly_usd) * settings.USAGE_KOBO_PER_USD / HOURS_PER_MONTH if monthly_usd else 0.0
+        rates[(product.key, product.provider)] = (revenue, cost)
+    return rates
+
+# --- Rollups ----------------------------------------------------------------
+
+def rollup_hour(db: Session, hour: datetime, now: datetime, rates: Dict) -> int:
+    """Recompute one hour's rows from the intervals (caller commits)"""
+    end = hour + HOUR
+    intervals = db.query(UsageInterval).filter(
+        UsageInterval.started_at < end,
+        or_(UsageInterval.ended_at.is_(None), UsageInterval.ended_at > hour),
+    ).all()
+    totals = defaultdict(lambda: [0, 0.0])
+    for interval in intervals:
+        seconds = (min(interval.ended_at or now, end, now) - max(interval.started_at, hour)).total_seconds()
+        if seconds > 0:
+            bucket = totals[(interval.user_id, interval.plan, interval.provider)]
+            bucket[0] += 1
+            bucket[1] += seconds
+
+    db.query(UsageHourly).filter(UsageHourly.hour == hour).delete(synchronize_session=False)
+    rows = []
+    for (user_id, plan, provider), (instances, seconds) in totals.items():
+        revenue, cost = rates.get((plan, provider), (0.0, 0.0))
+        rows.append({
+            "hour": hour, "user_id": user_id, "plan": plan, "provider": provider, "instances": instances,
+            "instance_seconds": seconds, "revenue_kobo": seconds / 3600 * revenue, "cost_kobo": seconds / 3600 * cost,
+        })
+    if rows:
+        db.execute(insert(UsageHourly), rows)
+    return len(rows)
+
+def rollup_day(db: Session, day: date) -> int:
+    """Re-sum one day from its hourly rows (caller commits)"""
+    start = datetime.combine(day, datetime.min.time())
+    db.query(UsageDaily).filter(UsageDaily.day == day).delete(synchronize_session=False)
+    hourly = select(
+        UsageHourly.user_id, UsageHourly.plan, UsageHourly.provider,
+        func.max(UsageHourly.instances), func.sum(UsageHourly.instance_seconds),
+        func.sum(UsageHourly.revenue_kobo), func.sum(UsageHourly.cost_kobo),
+    ).where(
+        UsageHourly.hour >= start, UsageHourly.hour < start + timedelta(days=1)
+    ).group_by(UsageHourly.user_id, UsageHourly.plan, UsageHourly.provider)
+    rows = db.execute(hourly).all()
+    if rows:
+        db.execute(insert(UsageDaily), [{
+            "day": day, "user_id": user_id, "plan": plan, "provider": provider, "instances": instances,
+            "instance_seconds": seconds, "revenue_kobo": revenue, "cost_kobo": cost,
+        } for user_id, plan, provider, instances, seconds, revenue, cost in rows])
+    return len(rows)
+
+def run_rollup(db: Session, now: Optional[datetime] = None) -> Dict:
+    """Bring the rollups up to date: open hours since the last run plus dirty ones"""
+    now = now or datetime.utcnow()
+    current = floor_hour(now)
+    last = db.query(func.max(UsageHourly.hour)).scalar()
+    start = max(last or current - HOUR, current - MAX_CATCHUP)
+    hours = set(hours_between(start, current))
+    dirty = [hour for (hour,) in db.query(UsageDirtyHour.hour).filter(UsageDirtyHour.hour <= current)
+             .order_by(UsageDirtyHour.hour).limit(settings.USAGE_ROLLUP_MAX_DIRTY)]
+    hours.update(dirty)
+
+    rates = hourly_rates(db)
+    for hour in sorted(hours):
+        rollup_hour(db, hour, now, rates)
+    days = sorted({hour.date() for hour in hours})
+    for day in days:
+        rollup_day(db, day)
+    if dirty:
+        # Hours re-marked while we ran keep their newer marked_at and go next time
+        db.query(UsageDirtyHour).filter(
+            UsageDirtyHour.hour.in_(dirty), UsageDirtyHour.marked_at <= now
+        ).delete(synchronize_session=False)
+    db.commit()
+    return {"hours": len(hours), "days": len(days), "dirty": len(dirty)}
+
+# --- Reports ------------------------------------------------------------------
+
+GROUPINGS = ("plan", "provider", "user")
+
+def usage_report(db: Session, start: date, end: date, group_by: str = "plan", by_hour: bool = False) -> List[Dict]:
+    """Usage, revenue and margin per period and group, from the rollup tables only"""
+    table = UsageHourly if by_hour else UsageDaily
+    period = table.hour if by_hour else table.day
+    lower = datetime.combine(start, datetime.min.time()) if by_hour else start
+    upper = datetime.combine(end, datetime.min.time()) + timedelta(days=1) if by_hour else end + timedelta(days=1)
+    group = {"plan": table.plan, "provider": table.provider, "user": table.user_id}[group_by]
+    rows = db.query(
+        period.label("period"),
+        group.label(group_by),
+        func.sum(table.instances).label("instances"),
+        func.sum(table.instance_seconds).label("instance_seconds"),
+        func.sum(table.revenue_kobo).label("revenue_kobo"),
+        func.sum(table.cost_kobo).label("cost_kobo"),
+    ).filter(period >= lower, period < upper).group_by(period, group).order_by(period, group).all()
+    return [{
+        "period": row.period.isoformat(),
+        group_by: row[1],
+        "instances": row.instances,
+        "instance_hours": round(row.instance_seconds / 3600, 2),
+        "revenue_kobo": round(row.revenue_kobo),
+        "cost_kobo": round(row.cost_kobo),
+        "margin_kobo": round(row.revenue_kobo - row.cost_kobo),
+    } for row in rows]
+
+def recognised_revenue(db: Session, since: date) -> float:
+    """Kobo recognised from `since` (inclusive) to now"""
+    return db.query(func.coalesce(func.sum(UsageDaily.revenue_kobo), 0)).filter(UsageDaily.day >= since).scalar()
@@ -0,0 +1,307 @@
+import csv
+import io
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.order import Order
+from backend.models.rdp_instance import RDPInstance
+from backend.models.user import User
+from backend.services.admission import AdmissionController
+from backend.services.metering import clear_event
+from backend.services.outbox import enqueue_event
+from backend.services.provisioning import OSType, provider_for
+from backend.services.renewals import apply_renewal
+from backend.services.scheduler import ProvisioningScheduler
+
+# Paid orders stuck in "paid" this long (crash between payment and dispatch)
+# are picked up again by the waitlist release task.
+STALE_PAID_AFTER = timedelta(minutes=5)
+
+def create_order(db: Session, user: User, reference: str, plan: str, os_type: str, payment_method: str, amount: int,
+                 region: Optional[str] = None, quantity: int = 1, renews_instance_id: Optional[int] = None) -> Order:
+    order = Order(
+        reference=reference,
+        user_id=user.id,
+        user_email=user.email,
+        plan=plan,
+        os_type=os_type,
+        region=region,
+        payment_method=payment_method,
+        amount=amount,
+        quantity=quantity,
+        kind="renewal" if renews_instance_id else "provision",
+        renews_instance_id=renews_instance_id,
+        status="pending",
+    )
+    db.add(order)
+    db.commit()
+    db.refresh(order)
+    return order
+
+def _claim(db: Session, order: Order, from_statuses: tuple, to_status: str, **values) -> bool:
+    """Conditionally move an order between statuses; False if someone else got there first"""
+    updated = db.query(Order).filter(
+        Order.id == order.id,
+        Order.status.in_(from_statuses),
+    ).update({"status": to_status, **values}, synchronize_session=False)
+    db.commit()
+    db.refresh(order)
+    return updated == 1
+
+def _task_kwargs(order: Order, order_id: str) -> dict:
+    return {
+        "user_id": order.user_id,
+        "order_id": order_id,
+        "os_type_str": order.os_type,
+        "plan": order.plan,
+        "user_email": order.user_email,
+        "region": order.region,
+    }
+
+def _kick_dispatcher():
+    from backend.tasks.scheduler import dispatch_provisioning_jobs
+    try:
+        dispatch_provisioning_jobs.delay()
+    except Exception:
+        pass  # beat runs the dispatcher every few seconds anyway
+
+def dispatch_order(db: Session, order: Order, from_statuses: tuple = ("paid",)) -> bool:
+    """Hand a paid order to the provisioning scheduler exactly once"""
+    if not _claim(db, order, from_statuses, "queued", queued_at=datetime.utcnow()):
+        return False
+    if order.quantity > 1:
+        create_seats(db, order)
+        release_seats(db, order)
+        return True
+    try:
+        ProvisioningScheduler().submit(tenant=order.user_id, plan=order.plan,
+                                       task_kwargs=_task_kwargs(order, order.reference))
+    except Exception:
+        # Redis unavailable: park it so the release task retries
+        _claim(db, order, ("queued",), "waitlisted", queued_at=None)
+        raise
+    _kick_dispatcher()
+    return True
+
+# --- Bulk orders --------------------------------------------------------------
+#
+# A bulk order (quantity > 1) becomes one rdp_instances row per seat, inserted
+# in one batch when the order is dispatched. Each seat is an ordinary
+# provisioning job with its own retries, keyed "<reference>-<seat>", so the
+# order-level idempotency of provision_rdp_task applies per seat.
+#
+# Seats go through the scheduler at most BULK_ORDER_CONCURRENCY at a time:
+# every seat that finishes releases the next one, so one reseller's 50 seats
+# don't flood the shared capacity. Instead of a chord, completion is a
+# barrier in the database. After each seat reaches active or failed, a
+# conditional UPDATE marks the order completed once no seat is still
+# unfinished. Exactly one caller wins it, and the winner queues the single
+# consolidated credentials email through the outbox.
+
+SEAT_WAITING = ("queued", "scheduled")  # created, not yet picked up by a worker
+SEAT_UNFINISHED = SEAT_WAITING + ("provisioning", "retrying")
+
+def seat_reference(order: Order, seat: int) -> str:
+    return f"{order.reference}-{seat:03d}"
+
+def create_seats(db: Session, order: Order) -> int:
+    """Insert every seat's pending instance row in one statement (idempotent)"""
+    if db.query(RDPInstance.id).filter(RDPInstance.order_id == order.id).first():
+        return 0
+    db.execute(insert(RDPInstance), [{
+        "user_id": order.user_id,
+        "order_id": order.id,
+        "order_reference": seat_reference(order, seat),
+        "provider": provider_for(OSType(order.os_type)),
+        "provider_id": "pending",
+        "os_type": order.os_type,
+        "plan": order.plan,
+        "status": "queued",
+        "created_at": datetime.utcnow(),
+    } for seat in range(1, order.quantity + 1)])
+    db.commit()
+    return order.quantity
+
+def release_seats(db: Session, order: Order) -> int:
+    """Move queued seats into the scheduler while the order is under its concurrency limit"""
+    running = db.query(func.count(RDPInstance.id)).filter(
+        RDPInstance.order_id == order.id,
+        RDPInstance.status.in_(("scheduled", "provisioning", "retrying")),
+    ).scalar()
+    free = settings.BULK_ORDER_CONCURRENCY - running
+    if free <= 0:
+        return 0
+    seats = db.query(RDPInstance.id, RDPInstance.order_reference).filter(
+        RDPInstance.order_id == order.id, RDPInstance.status == "queued"
+    ).order_by(RDPInstance.id).limit(free).all()
+
+    scheduler = ProvisioningScheduler()
+    released = 0
+    for seat_id, reference in seats:
+        # Conditional so concurrent releasers never submit a seat twice
+        claimed = db.query(RDPInstance).filter(
+            RDPInstance.id == seat_id, RDPInstance.status == "queued"
+        ).update({"status": "scheduled"}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            continue
+        try:
+            scheduler.submit(tenant=order.user_id, plan=order.plan, task_kwargs=_task_kwargs(order, reference))
+        except Exception as e:
+            db.query(RDPInstance).filter(RDPInstance.id == seat_id).update({"status": "queued"}, synchronize_session=False)
+            db.commit()
+            print(f"Could not schedule seat {reference}: {e}")  # release_waitlisted_orders retries
+            break
+        released += 1
+    if released:
+        _kick_dispatcher()
+    return released
+
+def seat_finished(db: Session, order_id: int) -> bool:
+    """Called after a seat goes active or failed: release the next seat, complete the order if it was the last"""
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if order is None:
+        return False
+    release_seats(db, order)
+
+    unfinished = db.query(RDPInstance.id).filter(
+        RDPInstance.order_id == order_id, RDPInstance.status.in_(SEAT_UNFINISHED)
+    ).exists()
+    completed = db.query(Order).filter(
+        Order.id == order_id, Order.status == "queued", ~unfinished
+    ).update({"status": "completed", "completed_at": datetime.utcnow()}, synchronize_session=False)
+    if completed:
+        counts = dict(db.query(RDPInstance.status, func.count(RDPInstance.id)).filter(
+            RDPInstance.order_id == order_id
+        ).group_by(RDPInstance.status).all())
+        enqueue_event(db, "order.completed", order_id, {
+            "order_id": order_id,
+            "reference": order.reference,
+            "user_id": order.user_id,
+            "quantity": order.quantity,
+            "active": counts.get("active", 0),
+            "failed": counts.get("failed", 0),
+        })
+    db.commit()
+    return completed == 1
+
+def order_progress(db: Session, order: Order) -> dict:
+    counts = dict(db.query(RDPInstance.status, func.count(RDPInstance.id)).filter(
+        RDPInstance.order_id == order.id
+    ).group_by(RDPInstance.status).all())
+    return {
+        "reference": order.reference,
+        "plan": order.plan,
+        "quantity": order.quantity,
+        "status": order.status,
+        "seats": counts,
+        "done": counts.get("active", 0) + counts.get("failed", 0),
+        "completed_at": order.completed_at,
+    }
+
+CREDENTIAL_COLUMNS = ("seat", "status", "ip_address", "port", "username", "password")
+
+def order_credentials(db: Session, order: Order) -> list:
+    """One row per seat, in seat order; failed seats are listed without credentials"""
+    instances = db.query(RDPInstance).filter(RDPInstance.order_id == order.id).order_by(RDPInstance.order_reference)
+    return [{
+        "seat": instance.order_reference,
+        "status": instance.status,
+        "ip_address": instance.ip_address if instance.status == "active" else "",
+        "port": 3389 if instance.status == "active" else "",
+        "username": instance.username if instance.status == "active" else "",
+        "password": instance.password if instance.status == "active" else "",
+    } for instance in instances]
+
+def credentials_csv(rows: list) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CREDENTIAL_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def retry_failed_seats(db: Session, order: Order) -> int:
+    """Put an order's failed seats back in line to get a new VM.
+
+    A seat that failed readiness had its VM deleted, so its provider_id and
+    address are dropped; provisioning then creates a server (or reuses one
+    the delete missed, found by its order label).
+    """
+    failed = db.query(RDPInstance).filter(RDPInstance.order_id == order.id, RDPInstance.status == "failed").all()
+    retried = db.query(RDPInstance).filter(
+        RDPInstance.id.in_([seat.id for seat in failed]), RDPInstance.status == "failed"
+    ).update({"status": "queued", "provider_id": "pending", "ip_address": None, "probe_attempts": 0,
+              "next_probe_at": None, "attempt_started_at": None}, synchronize_session=False) if failed else 0
+    if retried:
+        # The seat isn't over: its next `active` must not meet the old `failed`
+        for seat in failed:
+            clear_event(db, seat, "failed")
+        db.query(Order).filter(Order.id == order.id).update(
+            {"status": "queued", "completed_at": None}, synchronize_session=False
+        )
+    db.commit()
+    db.refresh(order)
+    if retried:
+        release_seats(db, order)
+    return retried
+
+def release_bulk_seats(db: Session, limit: int = 100) -> int:
+    """Safety net: top up the window of bulk orders whose seat hand-off was missed"""
+    orders = db.query(Order).filter(
+        Order.status == "queued", Order.quantity > 1,
+        db.query(RDPInstance.id).filter(RDPInstance.order_id == Order.id, RDPInstance.status == "queued").exists(),
+    ).order_by(Order.queued_at).limit(limit).all()
+    return sum(release_seats(db, order) for order in orders)
+
+def confirm_payment(db: Session, reference: str) -> Optional[Order]:
+    """Mark an order paid and either queue it or hold it on the waitlist (renewals: extend the instance).
+
+    Idempotent: returns None if the order is unknown or was already confirmed.
+    """
+    order = db.query(Order).filter(Order.reference == reference).first()
+    if not order or not _claim(db, order, ("pending",), "paid", paid_at=datetime.utcnow()):
+        return None
+    if order.kind == "renewal":
+        apply_renewal(db, order, datetime.utcnow())
+        db.refresh(order)
+        return order
+
+    decision = AdmissionController(db).evaluate(provider_for(OSType(order.os_type)), stage="payment",
+                                                quantity=order.quantity)
+    # The customer has already paid, so a saturated backlog waitlists instead of rejecting
+    if decision["decision"] == "admit":
+        dispatch_order(db, order)
+    else:
+        _claim(db, order, ("paid",), "waitlisted")
+        print(f"Order {reference} waitlisted (eta {decision['estimated_delivery_seconds']}s)")
+    return order
+
+def release_waitlist(db: Session, limit: int = 50) -> int:
+    """Dispatch waitlisted orders, oldest payment first, while admission allows"""
+    controller = AdmissionController(db)
+    stale_before = datetime.utcnow() - STALE_PAID_AFTER
+    orders = db.query(Order).filter(
+        (Order.status == "waitlisted") | ((Order.status == "paid") & (Order.paid_at < stale_before))
+    ).order_by(Order.paid_at).limit(limit).all()
+
+    released = 0
+    for order in orders:
+        if order.kind == "renewal":
+            # Paid but not applied (crash or contention in confirm_payment); nothing to provision
+            if order.status == "paid":
+                apply_renewal(db, order, datetime.utcnow())
+            continue
+        decision = controller.evaluate(
+            provider_for(OSType(order.os_type)),
+            stage="release",
+            include_waitlist=False,
+            use_cache=False,
+            quantity=order.quantity,
+        )
+        if decision["decision"] != "admit":
+            continue
+        if dispatch_order(db, order, from_statuses=("waitlisted", "paid")):
+            released += 1
+    return released
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from typing import Dict, List
+import redis
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.core.redis_client import get_redis
+from backend.models.outbox import OutboxMessage
+
+# Transactional outbox. Code that changes state and wants something to happen
+# because of it (email the customer, call a webhook, publish an event) adds
+# outbox rows in the same transaction instead of doing it inline. Either both
+# commit or neither does, and the worker never waits on SMTP or HTTP.
+#
+# relay_outbox (tasks/outbox.py) drains pending rows in batches, one row per
+# destination so each retries on its own. Delivery is at-least-once: every
+# message carries its dedup_key, which consumers use to drop repeats (the
+# email task checks it in Redis; webhooks get it as Idempotency-Key).
+
+DESTINATIONS = {
+    "instance.ready": ("email", "webhook", "pubsub"),
+    "instance.failed": ("webhook", "pubsub"),
+    "order.completed": ("email", "webhook", "pubsub"),
+}
+PUBSUB_CHANNEL = "nemordp:events"
+DELIVERED_PREFIX = "outbox:delivered:"
+DELIVERED_TTL = 7 * 24 * 3600
+
+def enqueue_event(db: Session, event: str, subject_id, payload: Dict, skip: tuple = ()) -> int:
+    """Add an event's outbox rows to the caller's transaction; returns rows added (caller commits)"""
+    keys = {
+        f"{destination}:{event}:{subject_id}": destination
+        for destination in DESTINATIONS[event]
+        if destination not in skip and (destination != "webhook" or settings.OUTBOX_WEBHOOK_URL)
+    }
+    existing = {k for (k,) in db.query(OutboxMessage.dedup_key).filter(OutboxMessage.dedup_key.in_(list(keys)))}
+    for key, destination in keys.items():
+        if key not in existing:
+            db.add(OutboxMessage(event=event, destination=destination, dedup_key=key, payload=payload))
+    return len(keys) - len(existing)
+
+def claim_batch(db: Session, now: datetime, limit: int) -> List[OutboxMessage]:
+    """Due messages, oldest first; row-locked on Postgres so parallel relays skip each other's batch"""
+    return db.query(OutboxMessage).filter(
+        OutboxMessage.status == "pending",
+        OutboxMessage.available_at <= now,
+    ).order_by(OutboxMessage.id).limit(limit).with_for_update(skip_locked=True).all()
+
+def mark_sent(message: OutboxMessage, now: datetime):
+    message.status = "sent"
+    message.sent_at = now
+    message.attempts = (message.attempts or 0) + 1
+
+def mark_failed(message: OutboxMessage, now: datetime, error: str):
+    """Back off exponentially; give up after OUTBOX_MAX_ATTEMPTS (caller commits)"""
+    message.attempts = (message.attempts or 0) + 1
+    message.last_error = error[:2000]
+    if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        message.status = "dead"
+    else:
+        message.available_at = now + timedelta(seconds=min(3600, 5 * 2 ** message.attempts))
+
+def envelope(message: OutboxMessage) -> Dict:
+    """What webhook and pub/sub consumers receive"""
+    return {
+        "id": message.dedup_key,
+        "event": message.event,
+        "created_at": message.created_at.isoformat() if message.created_at else None,
+        "data": message.payload,
+    }
+
+def purge_sent(db: Session, now: datetime) -> int:
+    cutoff = now - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    deleted = db.query(OutboxMessage).filter(
+        OutboxMessage.status == "sent", OutboxMessage.sent_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+# Consumer-side dedup. Redis trouble means we deliver anyway (at-least-once).
+
+def already_delivered(dedup_key: str) -> bool:
+    try:
+        return bool(get_redis().exists(DELIVERED_PREFIX + dedup_key))
+    except redis.RedisError:
+        return False
+
+def record_delivered(dedup_key: str):
+    try:
+        get_redis().set(DELIVERED_PREFIX + dedup_key, 1, ex=DELIVERED_TTL)
+    except redis.RedisError:
+        pass
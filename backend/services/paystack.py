@@ -10,7 +10,7 @@ class PaystackService:
             # Fallback for dev environment without key
             pass
 
-    def initialize_transaction(self, email: str, amount_kobo: int, reference: str, callback_url: str):
+    def initialize_transaction(self, email: str, amount_kobo: int, reference: str, callback_url: str, metadata: dict = None):
         """Initialize a transaction with Paystack"""
         if not self.secret_key:
             # Mock response for dev
@@ -34,7 +34,8 @@ class PaystackService:
             reference=reference,
             email=email,
             amount=amount_kobo,
-            callback_url=callback_url
+            callback_url=callback_url,
+            metadata=metadata or {}
         )
 
     def verify_transaction(self, reference: str):
@@ -0,0 +1,147 @@
+import ipaddress
+import json
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from backend.core import metrics
+from backend.core.config import settings
+from backend.models.placement import PlacementDecision
+from backend.services.catalog import Offer, OutOfStockError, Product, get_catalog
+
+try:
+    import geoip2.database
+    import geoip2.errors
+except ImportError:  # optional: without it every order gets the default region order
+    geoip2 = None
+
+# Picks the provider region for an order: the in-stock region with the
+# lowest expected RTT from where the customer is, unless they chose one.
+#
+# Client location comes from local MaxMind databases (no network calls at
+# checkout). Expected RTT comes from a static latency matrix keyed by client
+# country, falling back to continent (data/region_latency.json); regions
+# missing from it rank after the ones it knows, in catalog order.
+
+_lock = threading.Lock()
+_readers: Dict[str, object] = {}
+_matrix: Optional[Dict] = None
+
+def _reader(path: str):
+    if geoip2 is None or not path:
+        return None
+    with _lock:
+        if path not in _readers:
+            try:
+                _readers[path] = geoip2.database.Reader(path)
+            except (OSError, ValueError) as e:
+                print(f"GeoIP database {path} unavailable: {e}")
+                _readers[path] = None
+        return _readers[path]
+
+def locate(ip: str) -> Dict:
+    """{"country", "continent", "asn"} for an IP; values are None when unknown"""
+    location = {"country": None, "continent": None, "asn": None}
+    try:
+        if not ipaddress.ip_address(ip).is_global:
+            return location
+    except ValueError:
+        return location
+    reader = _reader(settings.GEOIP_DB_PATH)
+    if reader is not None:
+        try:
+            record = reader.country(ip)
+            location["country"] = record.country.iso_code
+            location["continent"] = record.continent.code
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+    asn_reader = _reader(settings.GEOIP_ASN_DB_PATH)
+    if asn_reader is not None:
+        try:
+            location["asn"] = asn_reader.asn(ip).autonomous_system_number
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+    return location
+
+def latency_matrix() -> Dict:
+    global _matrix
+    if _matrix is None:
+        try:
+            with open(settings.PLACEMENT_LATENCY_PATH) as f:
+                _matrix = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Latency matrix {settings.PLACEMENT_LATENCY_PATH} unavailable: {e}")
+            _matrix = {}
+    return _matrix
+
+def expected_rtts(location: Dict) -> Dict[str, float]:
+    """provider:region -> RTT ms for the client's country, else its continent"""
+    matrix = latency_matrix()
+    return (
+        matrix.get("countries", {}).get(location["country"] or "")
+        or matrix.get("continents", {}).get(location["continent"] or "")
+        or {}
+    )
+
+def rank_regions(product: Product, regions: List[str], location: Dict) -> List[tuple]:
+    """[(region, expected rtt or None)] best first; unknown RTTs keep catalog order at the end"""
+    rtts = expected_rtts(location)
+    ranked = [(r, rtts.get(f"{product.provider}:{r}")) for r in regions]
+    return sorted(ranked, key=lambda item: (item[1] is None, item[1] or 0))
+
+def place(plan_key: str, client_ip: str, requested_region: Optional[str] = None) -> Dict:
+    """Choose a region for a plan; raises CatalogError/OutOfStockError like resolve()"""
+    catalog = get_catalog()
+    offer = catalog.resolve(plan_key, requested_region)  # validates plan (and override)
+    location = locate(client_ip)
+    rtts = expected_rtts(location)
+
+    if requested_region is not None:
+        region, reason = requested_region, "override"
+    else:
+        ranked = rank_regions(offer.product, catalog.stocked_regions(offer.product), location)
+        if not ranked:
+            raise OutOfStockError(f"{offer.product.name} is out of stock")
+        region = ranked[0][0]
+        reason = "latency" if ranked[0][1] is not None else "default"
+
+    return {
+        "offer": catalog.resolve(plan_key, region),
+        "region": region,
+        "reason": reason,
+        "estimated_rtt_ms": rtts.get(f"{offer.provider}:{region}"),
+        **{f"client_{k}": v for k, v in location.items()},
+    }
+
+def reroute(db: Session, catalog, plan_key: str, order_reference: str) -> Offer:
+    """The best stocked region for an order whose region sold out, ranked for the client recorded at checkout"""
+    offer = catalog.resolve(plan_key)  # OutOfStockError if nothing is stocked
+    # Bulk order seats are "<reference>-<seat>"; the decision is per order
+    decision = db.query(PlacementDecision).filter(PlacementDecision.order_reference.in_(
+        [order_reference, order_reference.rsplit("-", 1)[0]]
+    )).first()
+    location = {
+        "country": decision.client_country if decision else None,
+        "continent": decision.client_continent if decision else None,
+        "asn": decision.client_asn if decision else None,
+    }
+    ranked = rank_regions(offer.product, catalog.stocked_regions(offer.product), location)
+    return catalog.resolve(plan_key, ranked[0][0])
+
+def record_placement(db: Session, order_reference: str, user_id: int, placement: Dict) -> PlacementDecision:
+    offer = placement["offer"]
+    decision = PlacementDecision(
+        order_reference=order_reference,
+        user_id=user_id,
+        plan=offer.product.key,
+        provider=offer.provider,
+        region=placement["region"],
+        reason=placement["reason"],
+        client_country=placement["client_country"],
+        client_continent=placement["client_continent"],
+        client_asn=placement["client_asn"],
+        estimated_rtt_ms=placement["estimated_rtt_ms"],
+    )
+    db.add(decision)
+    db.commit()
+    metrics.inc("nemordp_placements_total", provider=offer.provider, region=placement["region"], reason=placement["reason"])
+    return decision
@@ -1,25 +1,48 @@
+import asyncio
 from enum import Enum
 from typing import Dict, Optional
 import os
 from backend.providers.vultr import VultrProvider
 from backend.providers.contabo import ContaboProvider
+from backend.services.images import first_boot_user_data, full_install_user_data, generate_password
 
 class OSType(Enum):
     WINDOWS = "windows"
     LINUX = "linux"
 
+def provider_for(os_type: OSType) -> str:
+    """Provider that serves a given OS"""
+    return "vultr" if os_type == OSType.WINDOWS else "contabo"
+
 class ProvisioningService:
     def __init__(self):
         self.vultr = VultrProvider()
         self.contabo = ContaboProvider()
 
-    async def provision_rdp(self, order_id: str, os_type: OSType, plan: str) -> Dict:
-        """Route provisioning to appropriate provider"""
+    async def provision_rdp(self, order_id: str, os_type: OSType, plan: str, offer=None,
+                            golden_image: Optional[str] = None, password: Optional[str] = None) -> Dict:
+        """Route provisioning to appropriate provider.
+
+        `offer` (services.catalog.Offer) carries the provider plan, region and
+        image; without one the provider defaults are used. Linux desktops boot
+        from `golden_image` when given, else install the desktop via cloud-init;
+        `password` is set on them (generated if not given, reused on retries).
+        """
+        params = {}
         try:
             if os_type == OSType.WINDOWS:
-                return await self.vultr.create_windows_instance(order_id)
+                if offer is not None:
+                    params = {"plan": offer.plan, "region": offer.region, "os_id": offer.image}
+                return await self.vultr.create_windows_instance(order_id, **params)
             else:
-                return await self.contabo.create_linux_instance(order_id)
+                if offer is not None:
+                    params = {"product_id": offer.plan, "region": offer.region, "image_id": offer.image}
+                password = password or generate_password()
+                if golden_image:
+                    params.update(image_id=golden_image, user_data=first_boot_user_data(password))
+                else:
+                    params.update(user_data=full_install_user_data(password))
+                return await self.contabo.create_linux_instance(order_id, password=password, **params)
         except Exception as e:
             # Log error and potentially retry with different provider
             raise Exception(f"Provisioning failed: {str(e)}")
@@ -33,6 +56,13 @@ class ProvisioningService:
         else:
             raise ValueError(f"Unknown provider: {provider}")
 
+    async def terminate_many(self, instances: list) -> list:
+        """Terminate instances concurrently; returns a success flag or exception per instance"""
+        return await asyncio.gather(
+            *(self.terminate_rdp(i.provider, i.provider_id) for i in instances),
+            return_exceptions=True,
+        )
+
     async def reboot_rdp(self, provider: str, instance_id: str) -> bool:
         """Reboot RDP instance"""
         if provider == "vultr":
@@ -0,0 +1,165 @@
+import asyncio
+import random
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Tuple, Union
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from backend.core import metrics
+from backend.core.config import settings
+from backend.models.placement import PlacementDecision
+from backend.models.rdp_instance import RDPInstance
+from backend.services.metering import record_event
+from backend.services.outbox import enqueue_event
+from backend.services.renewals import initial_expiry
+
+# A provider saying "running" only means the VM booted; Windows is still
+# finishing setup and xrdp may not be listening yet. An instance counts as
+# ready once its RDP stack answers a connection request:
+#
+#   1. TCP connect to 3389 (the connect time approximates one RTT)
+#   2. send an X.224 Connection Request carrying an RDP Negotiation Request
+#      (TLS | CredSSP) inside a TPKT header [MS-RDPBCGR 2.2.1.1]
+#   3. expect a TPKT v3 frame holding an X.224 Connection Confirm; either a
+#      negotiation response or failure inside it proves RDP is up
+#
+# The probe_pending_instances beat task probes every due instance at once on
+# the shared event loop; failures back off per instance (next_probe_at).
+
+RDP_PORT = 3389
+
+_NEG_REQUEST = struct.pack("<BBHI", 0x01, 0x00, 8, 0x00000003)  # TYPE_RDP_NEG_REQ, PROTOCOL_SSL | PROTOCOL_HYBRID
+_X224_CR = bytes([6 + len(_NEG_REQUEST), 0xE0, 0, 0, 0, 0, 0]) + _NEG_REQUEST  # LI, CR, dst-ref, src-ref, class 0
+CONNECTION_REQUEST = struct.pack(">BBH", 3, 0, 4 + len(_X224_CR)) + _X224_CR
+X224_CONNECTION_CONFIRM = 0xD0
+
+class ProbeError(Exception):
+    def __init__(self, stage: str, detail: str):
+        super().__init__(f"{stage}: {detail}")
+        self.stage = stage  # 'tcp' or 'handshake'
+
+async def _handshake(host: str, port: int, progress: Dict[str, str]) -> Dict[str, float]:
+    started = time.perf_counter()
+    progress["stage"] = "tcp"
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        raise ProbeError("tcp", str(e) or type(e).__name__)
+    connected = time.perf_counter()
+    progress["stage"] = "handshake"
+    try:
+        writer.write(CONNECTION_REQUEST)
+        await writer.drain()
+        version, _, length = struct.unpack(">BBH", await reader.readexactly(4))
+        if version != 3 or length < 7:
+            raise ProbeError("handshake", "not a TPKT response")
+        tpdu = await reader.readexactly(length - 4)
+        if tpdu[1] & 0xF0 != X224_CONNECTION_CONFIRM:
+            raise ProbeError("handshake", f"unexpected X.224 code {tpdu[1]:#x}")
+    except (OSError, asyncio.IncompleteReadError) as e:
+        raise ProbeError("handshake", str(e) or type(e).__name__)
+    finally:
+        writer.close()
+    return {
+        "connect_ms": (connected - started) * 1000,
+        "handshake_ms": (time.perf_counter() - started) * 1000,
+    }
+
+async def probe_rdp(host: str, port: int = RDP_PORT, timeout: float = None) -> Dict[str, float]:
+    """{"connect_ms", "handshake_ms"} if RDP answers on host:port; raises ProbeError"""
+    timeout = timeout or settings.RDP_PROBE_TIMEOUT_SECONDS
+    progress = {"stage": "tcp"}  # where the timeout hit: port closed/filtered vs xrdp not answering
+    try:
+        return await asyncio.wait_for(_handshake(host, port, progress), timeout)
+    except asyncio.TimeoutError:
+        raise ProbeError(progress["stage"], f"timed out after {timeout}s")
+
+async def probe_all(targets: List[Tuple[Hashable, str]]) -> Dict[Hashable, Union[Dict, ProbeError]]:
+    """Probe (key, host) pairs concurrently, at most RDP_PROBE_CONCURRENCY sockets at a time"""
+    semaphore = asyncio.Semaphore(settings.RDP_PROBE_CONCURRENCY)
+
+    async def _one(host: str):
+        async with semaphore:
+            try:
+                return await probe_rdp(host)
+            except ProbeError as e:
+                return e
+
+    results = await asyncio.gather(*(_one(host) for _, host in targets))
+    return {key: result for (key, _), result in zip(targets, results)}
+
+def due_instances(db: Session, now: datetime, limit: int) -> List[RDPInstance]:
+    """Booting instances with an address whose next probe is due"""
+    return db.query(RDPInstance).filter(
+        RDPInstance.status == "provisioning",
+        RDPInstance.ip_address.isnot(None),
+        RDPInstance.ip_address != "Pending",
+        or_(RDPInstance.next_probe_at.is_(None), RDPInstance.next_probe_at <= now),
+    ).order_by(RDPInstance.next_probe_at).limit(limit).all()
+
+def backoff(attempts: int) -> timedelta:
+    """Exponential with +-20% jitter so a batch of new instances doesn't probe in lockstep"""
+    delay = min(settings.RDP_PROBE_BACKOFF_MAX_SECONDS, settings.RDP_PROBE_BACKOFF_BASE_SECONDS * 2 ** attempts)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def gave_up(instance: RDPInstance, now: datetime) -> bool:
+    # From the current attempt: a retried seat gets a fresh VM and a full deadline
+    started = instance.attempt_started_at or instance.created_at
+    return now - started > timedelta(minutes=settings.RDP_PROBE_DEADLINE_MINUTES)
+
+def record_failure(instance: RDPInstance, now: datetime):
+    """Schedule the next probe (caller commits)"""
+    instance.next_probe_at = now + backoff(instance.probe_attempts or 0)
+    instance.probe_attempts = (instance.probe_attempts or 0) + 1
+
+def event_payload(instance: RDPInstance, status: str, reason: str = None) -> Dict:
+    """Outbox payload: identifiers only, consumers load credentials themselves"""
+    payload = {
+        "instance_id": instance.id,
+        "user_id": instance.user_id,
+        "order_reference": instance.order_reference,
+        "provider": instance.provider,
+        "os_type": instance.os_type,
+        "plan": instance.plan,
+        "status": status,
+    }
+    if reason:
+        payload["reason"] = reason
+    return payload
+
+def mark_unreachable(db: Session, instance: RDPInstance) -> bool:
+    """Flip provisioning -> failed once; the caller then deletes the VM, which would otherwise keep billing"""
+    updated = db.query(RDPInstance).filter(
+        RDPInstance.id == instance.id, RDPInstance.status == "provisioning"
+    ).update({"status": "failed", "next_probe_at": None}, synchronize_session=False)
+    if updated:
+        record_event(db, instance, "failed")
+        enqueue_event(db, "instance.failed", instance.id, event_payload(instance, "failed", "rdp_unreachable"))
+    db.commit()
+    return updated == 1
+
+def mark_ready(db: Session, instance: RDPInstance, latency: Dict[str, float]) -> bool:
+    """Flip provisioning -> active exactly once and queue its side effects; False if another sweep already did"""
+    now = datetime.utcnow()
+    updated = db.query(RDPInstance).filter(
+        RDPInstance.id == instance.id, RDPInstance.status == "provisioning"
+    ).update({"status": "active", "ready_at": now, "next_probe_at": None, "expires_at": initial_expiry(now)},
+             synchronize_session=False)
+    if updated:
+        if instance.order_reference:
+            db.query(PlacementDecision).filter(
+                PlacementDecision.order_reference == instance.order_reference
+            ).update({"worker_rtt_ms": latency["connect_ms"]}, synchronize_session=False)
+        record_event(db, instance, "active", now)
+        # Same transaction as the status flip: the email goes out iff the instance is active.
+        # Bulk order seats get one consolidated email when the whole order completes.
+        enqueue_event(db, "instance.ready", instance.id, event_payload(instance, "active"),
+                      skip=("email",) if instance.order_id else ())
+    db.commit()
+    if updated:
+        metrics.observe("nemordp_rdp_probe_seconds", latency["connect_ms"] / 1000, provider=instance.provider, phase="connect")
+        metrics.observe("nemordp_rdp_probe_seconds", latency["handshake_ms"] / 1000, provider=instance.provider, phase="handshake")
+        metrics.observe("nemordp_instance_ready_seconds", (now - instance.created_at).total_seconds(),
+                        provider=instance.provider)
+    return updated == 1
@@ -0,0 +1,159 @@
+import asyncio
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from backend.core import metrics
+from backend.core.config import settings
+from backend.models.rdp_instance import RDPInstance
+from backend.models.reconcile import ReconcileRun
+from backend.services.metering import record_event
+
+# Fleet reconciler: the provider's instance list (every VM labelled
+# nemordp-<order>) joined against rdp_instances in one hash-join pass.
+#
+#   orphaned    VM with no row (failed retry, lost create response)
+#   leaked      VM whose row is terminated/failed: we stopped billing, the
+#               provider didn't (failed delete in the expiry sweep)
+#   missing     live row whose VM is gone
+#   ip_changed  live row with a stale IP
+#   duplicate   several VMs for one order, or several rows for one VM
+#
+# Rows and IPs are repaired in bulk. VMs are only deleted when
+# RECONCILE_DELETE_ORPHANS is on; otherwise they are reported. Rows and VMs
+# younger than RECONCILE_GRACE_MINUTES are left alone, since provisioning
+# may still be in flight.
+
+LABEL_PREFIX = "nemordp-"
+LIVE_STATUSES = ("queued", "scheduled", "provisioning", "retrying", "active")
+DEAD_STATUSES = ("terminated", "failed", "expired")
+SAMPLE_SIZE = 20
+IN_CHUNK = 1000
+
+_COLUMNS = (RDPInstance.id, RDPInstance.provider_id, RDPInstance.status, RDPInstance.ip_address,
+            RDPInstance.order_reference, RDPInstance.created_at)
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def load_local(db: Session, provider: str, remote_ids: Iterable[str]) -> List:
+    """Live rows for the provider, plus dead rows whose VM still shows up remotely"""
+    rows = list(db.query(*_COLUMNS).filter(
+        RDPInstance.provider == provider, RDPInstance.status.in_(LIVE_STATUSES)
+    ).yield_per(5000))
+    remote_ids = list(remote_ids)
+    for i in range(0, len(remote_ids), IN_CHUNK):
+        rows.extend(db.query(*_COLUMNS).filter(
+            RDPInstance.provider == provider,
+            RDPInstance.status.in_(DEAD_STATUSES),
+            RDPInstance.provider_id.in_(remote_ids[i:i + IN_CHUNK]),
+        ))
+    return rows
+
+def diff(remote: List[Dict], local: List, now: datetime) -> Dict[str, list]:
+    """Drift between provider inventory and local rows.
+
+    Returns kind -> list of (row or None, remote instance or None).
+    """
+    grace = now - timedelta(minutes=settings.RECONCILE_GRACE_MINUTES)
+    drift = defaultdict(list)
+
+    by_id, in_flight = {}, set()
+    for row in local:
+        if row.provider_id == "pending":
+            in_flight.add(row.order_reference)
+        elif row.provider_id.startswith("mock-"):
+            continue  # dev instances never existed at the provider
+        elif row.provider_id in by_id:
+            drift["duplicate"].append((row, None))
+            if row.status in LIVE_STATUSES:
+                by_id[row.provider_id] = row  # judge the VM against its live row
+        else:
+            by_id[row.provider_id] = row
+
+    labels = Counter(vm["label"] for vm in remote)
+    seen = set()
+    for vm in remote:
+        if labels[vm["label"]] > 1:
+            drift["duplicate"].append((None, vm))
+        row = by_id.get(vm["provider_id"])
+        if row is None:
+            created = _parse_time(vm.get("created_at"))
+            if vm["label"][len(LABEL_PREFIX):] in in_flight or (created is not None and created > grace):
+                continue
+            drift["orphaned"].append((None, vm))
+            continue
+        seen.add(vm["provider_id"])
+        if row.status in DEAD_STATUSES:
+            drift["leaked"].append((row, vm))
+        elif vm["ip_address"] and vm["ip_address"] != row.ip_address:
+            drift["ip_changed"].append((row, vm))
+
+    for provider_id, row in by_id.items():
+        if provider_id not in seen and row.status in LIVE_STATUSES and row.created_at < grace:
+            drift["missing"].append((row, None))
+    return drift
+
+async def delete_all(provider, vms: List[Dict]) -> List:
+    semaphore = asyncio.Semaphore(settings.RECONCILE_DELETE_CONCURRENCY)
+
+    async def _one(vm: Dict):
+        async with semaphore:
+            return await provider.delete_instance(vm["provider_id"])
+
+    return await asyncio.gather(*(_one(vm) for vm in vms), return_exceptions=True)
+
+def repair(db: Session, drift: Dict[str, list], local_count: int, now: datetime) -> Dict[str, int]:
+    """Apply row-level repairs in bulk (caller commits); returns counts applied or held"""
+    repaired = {}
+    ip_fixes = [{"id": row.id, "ip_address": vm["ip_address"]} for row, vm in drift.get("ip_changed", [])]
+    if ip_fixes:
+        db.execute(update(RDPInstance), ip_fixes)
+        repaired["ip_changed"] = len(ip_fixes)
+
+    missing = [row for row, _ in drift.get("missing", [])]
+    # A provider API that suddenly lists nothing must not wipe the fleet. The
+    # floor keeps small fleets repairable: 1 missing of 1 is not an outage.
+    held_above = max(settings.RECONCILE_MIN_HELD, settings.RECONCILE_MAX_MISSING_FRACTION * local_count)
+    if missing and len(missing) > held_above:
+        repaired["missing_held"] = len(missing)
+    elif missing:
+        db.execute(update(RDPInstance), [{"id": row.id, "status": "terminated"} for row in missing])
+        for instance in db.query(RDPInstance).filter(RDPInstance.id.in_([row.id for row in missing])):
+            record_event(db, instance, "terminated", now)
+        repaired["missing"] = len(missing)
+    return repaired
+
+def _sample(items: list) -> list:
+    return [
+        {"instance_id": row.id if row is not None else None, "provider_id": vm["provider_id"] if vm else row.provider_id,
+         **({"label": vm["label"]} if vm else {})}
+        for row, vm in items[:SAMPLE_SIZE]
+    ]
+
+def record_run(db: Session, provider: str, started: datetime, duration: float, remote_count: int,
+               local_count: int, drift: Dict[str, list], repaired: Dict[str, int], error: str = None) -> ReconcileRun:
+    run = ReconcileRun(
+        provider=provider,
+        started_at=started,
+        duration_ms=duration * 1000,
+        remote_count=remote_count,
+        local_count=local_count,
+        drift={kind: len(items) for kind, items in drift.items()},
+        repaired=repaired,
+        samples={kind: _sample(items) for kind, items in drift.items()},
+        error=error,
+    )
+    db.add(run)
+    db.commit()
+    metrics.observe("nemordp_reconcile_seconds", duration, provider=provider)
+    for kind in ("orphaned", "leaked", "missing", "ip_changed", "duplicate"):
+        metrics.set_gauge("nemordp_reconcile_drift", len(drift.get(kind, [])), provider=provider, kind=kind)
+    return run
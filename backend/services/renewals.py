@@ -0,0 +1,200 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.core import metrics
+from backend.core.config import settings
+from backend.models.order import Order
+from backend.models.rdp_instance import RDPInstance
+from backend.models.renewal import ExpiryReminder
+from backend.models.user import User
+from backend.services.catalog import PRODUCTS
+
+# Expiry reminders and renewals.
+#
+#   send_renewal_reminders (beat) --> range scan of active instances expiring
+#                                     within the widest window (status, expires_at)
+#                                 --> expiry_reminders rows, unique per
+#                                     instance + window + expiry date
+#                                 --> one digest per user, sent in batches
+#                                     over a single SMTP connection
+#   POST /instances/{id}/renew -----> renewal order (kind=renewal), paid through
+#                                     the normal Paystack / crypto checkout
+#   confirm_payment ----------------> apply_renewal: expires_at += one billing period
+#
+# An instance only gets a reminder for the tightest window it is inside. One
+# first seen 20h from expiry gets the 24h reminder, not a late 72h one too.
+# A renewal moves expires_at, so reminders still pending for the old date are
+# skipped at send time and the new period gets its own set.
+#
+# A renewal costs the plan's current price and nothing moves until it is
+# paid. RENEWAL_MAX_AHEAD_HOURS is checked at checkout only: a payment that
+# arrives is always applied while the instance is active. If the instance
+# expired or was terminated before the payment confirmed, the order is
+# marked refund_due for a manual refund.
+
+class RenewalError(ValueError):
+    pass
+
+def reminder_windows() -> List[int]:
+    """Reminder windows in hours, widest first"""
+    return sorted({int(h) for h in settings.RENEWAL_REMINDER_HOURS.split(",") if h.strip()}, reverse=True)
+
+def initial_expiry(activated_at: datetime) -> datetime:
+    return activated_at + timedelta(hours=settings.BILLING_PERIOD_HOURS)
+
+def _tightest_window(remaining: timedelta, windows: List[int]) -> Optional[int]:
+    inside = [w for w in windows if remaining <= timedelta(hours=w)]
+    return min(inside) if inside else None
+
+def claim_due_reminders(db: Session, now: datetime, limit: int = 5000) -> int:
+    """Record a pending reminder for every instance that has entered a new window; returns how many"""
+    windows = reminder_windows()
+    if not windows:
+        return 0
+    due = db.query(RDPInstance.id, RDPInstance.user_id, RDPInstance.expires_at).filter(
+        RDPInstance.status == "active",
+        RDPInstance.expires_at > now,
+        RDPInstance.expires_at <= now + timedelta(hours=windows[0]),
+    ).order_by(RDPInstance.expires_at).limit(limit).all()
+    if not due:
+        return 0
+    existing = set(db.query(ExpiryReminder.instance_id, ExpiryReminder.window_hours, ExpiryReminder.expires_at).filter(
+        ExpiryReminder.instance_id.in_([instance_id for instance_id, _, _ in due])
+    ).all())
+    rows = []
+    for instance_id, user_id, expires_at in due:
+        window = _tightest_window(expires_at - now, windows)
+        if (instance_id, window, expires_at) not in existing:
+            rows.append({"instance_id": instance_id, "user_id": user_id, "window_hours": window,
+                         "expires_at": expires_at, "status": "pending", "attempts": 0, "created_at": now})
+    if not rows:
+        return 0
+    try:
+        db.execute(insert(ExpiryReminder), rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # a concurrent run claimed them; its rows are the dedup record
+        return 0
+    return len(rows)
+
+def pending_digests(db: Session, now: datetime, limit: int) -> List[Dict]:
+    """Pending reminders of up to `limit` users, one digest per user.
+
+    Reminders whose instance was renewed, stopped, deleted or has already
+    expired are marked skipped here instead of being sent.
+    """
+    users = [user_id for (user_id,) in db.query(ExpiryReminder.user_id).filter(
+        ExpiryReminder.status == "pending"
+    ).group_by(ExpiryReminder.user_id).order_by(ExpiryReminder.user_id).limit(limit)]
+    if not users:
+        return []
+    reminders = db.query(ExpiryReminder).filter(
+        ExpiryReminder.status == "pending", ExpiryReminder.user_id.in_(users)
+    ).order_by(ExpiryReminder.expires_at, ExpiryReminder.window_hours).all()
+    instances = {i.id: i for i in db.query(RDPInstance).filter(
+        RDPInstance.id.in_({r.instance_id for r in reminders})
+    )}
+    emails = dict(db.query(User.id, User.email).filter(User.id.in_(users)).all())
+
+    digests, stale = OrderedDict(), []
+    for reminder in reminders:
+        instance = instances.get(reminder.instance_id)
+        if instance is None or instance.status != "active" or instance.expires_at != reminder.expires_at \
+                or instance.expires_at <= now or reminder.user_id not in emails:
+            stale.append(reminder.id)
+            continue
+        digest = digests.setdefault(reminder.user_id, {
+            "user_id": reminder.user_id, "email": emails[reminder.user_id], "reminder_ids": [], "instances": {},
+        })
+        digest["reminder_ids"].append(reminder.id)
+        # A failed earlier send can leave two windows pending for one instance: list it once
+        digest["instances"].setdefault(instance.id, {
+            "id": instance.id,
+            "ip_address": instance.ip_address,
+            "plan": instance.plan,
+            "os_type": instance.os_type,
+            "expires_at": instance.expires_at,
+            "renew_url": settings.RENEWAL_URL_TEMPLATE.format(instance_id=instance.id),
+        })
+    if stale:
+        db.query(ExpiryReminder).filter(ExpiryReminder.id.in_(stale)).update(
+            {"status": "skipped"}, synchronize_session=False
+        )
+        db.commit()
+    return [{**digest, "instances": list(digest["instances"].values())} for digest in digests.values()]
+
+def mark_sent(db: Session, reminder_ids: List[int], now: datetime):
+    if reminder_ids:
+        db.query(ExpiryReminder).filter(ExpiryReminder.id.in_(reminder_ids)).update(
+            {"status": "sent", "sent_at": now, "attempts": ExpiryReminder.attempts + 1}, synchronize_session=False
+        )
+        db.commit()
+
+def mark_failed(db: Session, reminder_ids: List[int]):
+    """Retry next run, up to RENEWAL_MAX_ATTEMPTS sends"""
+    if not reminder_ids:
+        return
+    db.query(ExpiryReminder).filter(ExpiryReminder.id.in_(reminder_ids)).update(
+        {"attempts": ExpiryReminder.attempts + 1}, synchronize_session=False
+    )
+    db.query(ExpiryReminder).filter(
+        ExpiryReminder.id.in_(reminder_ids), ExpiryReminder.attempts >= settings.RENEWAL_MAX_ATTEMPTS
+    ).update({"status": "failed"}, synchronize_session=False)
+    db.commit()
+
+def _extended(instance: RDPInstance, now: datetime) -> datetime:
+    current = instance.expires_at or initial_expiry(instance.ready_at or instance.created_at)
+    return max(current, now) + timedelta(hours=settings.BILLING_PERIOD_HOURS)
+
+def check_renewable(instance: RDPInstance, now: datetime):
+    """Raise RenewalError unless the instance can be sold one more period now"""
+    if instance.status != "active":
+        raise RenewalError("Only active instances can be renewed")
+    if _extended(instance, now) - now > timedelta(hours=settings.RENEWAL_MAX_AHEAD_HOURS):
+        raise RenewalError(f"Already renewed until {instance.expires_at.isoformat()}")
+
+def renewal_price(instance: RDPInstance) -> int:
+    """One more billing period at the plan's current price, in kobo"""
+    product = PRODUCTS.get(instance.plan)
+    if product is None:
+        raise RenewalError(f"Plan {instance.plan} is no longer sold; order a new server instead")
+    return product.amount_kobo
+
+def apply_renewal(db: Session, order: Order, now: datetime) -> Optional[datetime]:
+    """Extend the instance of a paid renewal order by one billing period, once.
+
+    Returns the new expiry, or None if the order was already applied or the
+    instance is gone (the order is then refund_due).
+    """
+    for _ in range(3):
+        # Order and instance move in one transaction: whoever flips the order
+        # row extends the instance, a concurrent caller finds it completed
+        claimed = db.query(Order).filter(Order.id == order.id, Order.status == "paid").update(
+            {"status": "completed", "completed_at": now}, synchronize_session=False
+        )
+        if not claimed:
+            db.rollback()
+            return None
+        instance = db.get(RDPInstance, order.renews_instance_id, populate_existing=True)
+        if instance is None or instance.status != "active":
+            db.query(Order).filter(Order.id == order.id).update({"status": "refund_due"}, synchronize_session=False)
+            db.commit()
+            print(f"Renewal {order.reference} paid for instance {order.renews_instance_id}, which is no longer "
+                  f"active; refund manually")
+            return None
+        new_expiry = _extended(instance, now)
+        # Conditional on the expiry we read: two renewals paid at once extend twice, not once
+        condition = RDPInstance.expires_at.is_(None) if instance.expires_at is None else RDPInstance.expires_at == instance.expires_at
+        updated = db.query(RDPInstance).filter(
+            RDPInstance.id == instance.id, RDPInstance.status == "active", condition
+        ).update({"expires_at": new_expiry}, synchronize_session=False)
+        if updated:
+            db.commit()
+            metrics.inc("nemordp_renewals_total", plan=instance.plan)
+            return new_expiry
+        db.rollback()  # the instance moved under us: the order is paid again, retry
+    print(f"Renewal {order.reference} not applied after 3 attempts; the waitlist release retries it")
+    return None
@@ -0,0 +1,198 @@
+import json
+import time
+from typing import Dict, List, Optional
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.redis_client import get_redis
+
+# Provisioning jobs wait here instead of going straight onto the Celery
+# queue. The dispatcher releases only as many as there are free provisioning
+# slots, so ordering is decided here rather than by the broker's FIFO:
+#
+#   between classes - smooth weighted round-robin; a class's weight grows
+#                     with how long its oldest job has waited (aging), so
+#                     basic orders are never starved by performance ones
+#   within a class  - round-robin over tenants, one job per turn, so a
+#                     reseller's 100 jobs interleave with everyone else's
+#
+# Redis layout, per class:
+#   sched:{cls}:ring           list of tenants with pending jobs (visit order)
+#   sched:{cls}:tenants        set of those tenants (membership for submit)
+#   sched:{cls}:jobs:{tenant}  list of job payloads, FIFO per tenant
+#   sched:{cls}:heads          zset tenant -> enqueued_at of that tenant's head job
+# plus sched:pending (total jobs) and sched:current (SWRR state per class).
+
+PENDING_KEY = "sched:pending"
+CURRENT_KEY = "sched:current"
+LOCK_KEY = "sched:lock"
+
+# KEYS: ring, tenants, jobs, heads, pending  ARGV: tenant, payload, enqueued_at, front
+_SUBMIT = """
+if ARGV[4] == '1' then
+    redis.call('LPUSH', KEYS[3], ARGV[2])
+    redis.call('ZADD', KEYS[4], ARGV[3], ARGV[1])
+else
+    redis.call('RPUSH', KEYS[3], ARGV[2])
+    redis.call('ZADD', KEYS[4], 'NX', ARGV[3], ARGV[1])
+end
+redis.call('INCR', KEYS[5])
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+    if ARGV[4] == '1' then
+        redis.call('LPUSH', KEYS[1], ARGV[1])
+    else
+        redis.call('RPUSH', KEYS[1], ARGV[1])
+    end
+end
+return 1
+"""
+
+# KEYS: ring, tenants, heads, pending  ARGV: jobs key prefix
+# Pops the next tenant's head job and rotates the tenant to the back of the ring.
+_POP = """
+local tenant = redis.call('LPOP', KEYS[1])
+if not tenant then return nil end
+local jobs = ARGV[1] .. tenant
+local job = redis.call('LPOP', jobs)
+if job then redis.call('DECR', KEYS[4]) end
+local head = redis.call('LINDEX', jobs, 0)
+if head then
+    redis.call('RPUSH', KEYS[1], tenant)
+    redis.call('ZADD', KEYS[3], cjson.decode(head)['enqueued_at'], tenant)
+else
+    redis.call('SREM', KEYS[2], tenant)
+    redis.call('ZREM', KEYS[3], tenant)
+end
+return job
+"""
+
+def class_weights() -> Dict[str, float]:
+    weights = {}
+    for part in settings.SCHEDULER_CLASS_WEIGHTS.split(","):
+        name, _, weight = part.strip().partition(":")
+        if name:
+            weights[name] = float(weight or 1)
+    weights.setdefault(settings.SCHEDULER_DEFAULT_CLASS, 1.0)
+    return weights
+
+def priority_class(plan: str) -> str:
+    """Map a plan (e.g. 'performance_windows') to its priority class"""
+    plan = (plan or "").lower()
+    for name in class_weights():
+        if name in plan:
+            return name
+    return settings.SCHEDULER_DEFAULT_CLASS
+
+class ProvisioningScheduler:
+    def __init__(self):
+        self.redis = get_redis()
+        self._submit = self.redis.register_script(_SUBMIT)
+        self._pop = self.redis.register_script(_POP)
+
+    @staticmethod
+    def _keys(cls: str) -> Dict[str, str]:
+        return {
+            "ring": f"sched:{cls}:ring",
+            "tenants": f"sched:{cls}:tenants",
+            "jobs": f"sched:{cls}:jobs:",
+            "heads": f"sched:{cls}:heads",
+        }
+
+    def submit(self, tenant: int, plan: str, task_kwargs: Dict, enqueued_at: Optional[float] = None, front: bool = False):
+        """Add a provisioning job for `tenant`; `front` puts it back at the head (failed dispatch)"""
+        cls = priority_class(plan)
+        keys = self._keys(cls)
+        enqueued_at = enqueued_at or time.time()
+        payload = json.dumps({"tenant": str(tenant), "plan": plan, "class": cls, "enqueued_at": enqueued_at,
+                              "kwargs": task_kwargs})
+        self._submit(
+            keys=[keys["ring"], keys["tenants"], keys["jobs"] + str(tenant), keys["heads"], PENDING_KEY],
+            args=[str(tenant), payload, enqueued_at, "1" if front else "0"],
+        )
+
+    def pending_jobs(self) -> int:
+        return int(self.redis.get(PENDING_KEY) or 0)
+
+    def _oldest_waits(self, classes: List[str], now: float) -> Dict[str, Optional[float]]:
+        """Wait time of each class's oldest head job (None if the class is empty)"""
+        pipe = self.redis.pipeline(transaction=False)
+        for cls in classes:
+            pipe.zrange(self._keys(cls)["heads"], 0, 0, withscores=True)
+        return {cls: (now - head[0][1] if head else None) for cls, head in zip(classes, pipe.execute())}
+
+    def _pop_job(self, cls: str) -> Optional[Dict]:
+        keys = self._keys(cls)
+        raw = self._pop(keys=[keys["ring"], keys["tenants"], keys["heads"], PENDING_KEY], args=[keys["jobs"]])
+        return json.loads(raw) if raw else None
+
+    def next_jobs(self, slots: int) -> List[Dict]:
+        """Pick up to `slots` jobs. Callers must hold the dispatch lock."""
+        weights = class_weights()
+        current = {k: float(v) for k, v in self.redis.hgetall(CURRENT_KEY).items()}
+        picked, drained = [], set()
+        # One pass over every ring at most: if the heads zset and a ring
+        # have drifted apart, pops come back empty and must not spin forever
+        pipe = self.redis.pipeline(transaction=False)
+        for cls in weights:
+            pipe.llen(self._keys(cls)["ring"])
+        budget = slots + sum(pipe.execute())
+
+        while len(picked) < slots and budget > 0:
+            budget -= 1
+            waits = self._oldest_waits(list(weights), time.time())
+            effective = {
+                cls: weights[cls] * (1 + wait / settings.SCHEDULER_AGING_SECONDS)
+                for cls, wait in waits.items() if wait is not None and cls not in drained
+            }
+            if not effective:
+                break
+
+            # Smooth weighted round-robin (interleaves classes instead of bursting)
+            total = sum(effective.values())
+            for cls, weight in effective.items():
+                current[cls] = current.get(cls, 0.0) + weight
+            chosen = max(effective, key=lambda c: current[c])
+            current[chosen] -= total
+
+            job = self._pop_job(chosen)
+            if job:
+                picked.append(job)
+            elif not self.redis.llen(self._keys(chosen)["ring"]):
+                drained.add(chosen)  # heads say waiting, ring says nobody: skip it this run
+
+        if current:
+            self.redis.hset(CURRENT_KEY, mapping=current)
+        return picked
+
+    def dispatch(self, free_slots: int, send) -> int:
+        """Hand up to `free_slots` jobs to `send(job)`; returns how many were sent.
+
+        Only one dispatcher runs at a time; a concurrent call returns 0.
+        """
+        if free_slots <= 0:
+            return 0
+        lock = self.redis.lock(LOCK_KEY, timeout=60, blocking=False)
+        if not lock.acquire():
+            return 0
+        try:
+            sent = 0
+            now = time.time()
+            jobs = self.next_jobs(min(free_slots, settings.SCHEDULER_MAX_DISPATCH))
+            for index, job in enumerate(jobs):
+                try:
+                    send(job)
+                except Exception as e:
+                    # Broker trouble: put this and every later pick back at the front
+                    print(f"Dispatch failed, requeueing {len(jobs) - index} jobs: {e}")
+                    for unsent in reversed(jobs[index:]):
+                        self.submit(unsent["tenant"], unsent.get("plan", unsent["class"]), unsent["kwargs"],
+                                    enqueued_at=unsent["enqueued_at"], front=True)
+                    break
+                sent += 1
+                metrics.observe("nemordp_provisioning_queue_wait_seconds", now - job["enqueued_at"], priority_class=job["class"])
+                metrics.inc("nemordp_provisioning_dispatched_total", priority_class=job["class"])
+            for cls, wait in self._oldest_waits(list(class_weights()), time.time()).items():
+                metrics.set_gauge("nemordp_scheduler_oldest_wait_seconds", wait or 0, priority_class=cls)
+                metrics.set_gauge("nemordp_scheduler_waiting_tenants", self.redis.scard(self._keys(cls)["tenants"]), priority_class=cls)
+            return sent
+        finally:
+            lock.release()
@@ -0,0 +1,212 @@
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.models.rdp_instance import RDPInstance
+from backend.models.telemetry import InstanceMetric
+from backend.services.readiness import ProbeError, probe_all
+
+# Per-instance resource telemetry, for answering "why is my box slow".
+#
+#   collect_instance_telemetry (beat) --> instance_metrics, resolution 0 (raw)
+#   downsample_instance_telemetry ----> resolution 300 (5 min) -> 3600 (hourly)
+#
+# What we can measure from outside the VM:
+#   net_in_bps / net_out_bps  Vultr's per-day bandwidth counters, turned into
+#                             a rate from the delta between sweeps. Contabo's
+#                             API exposes no usage data, so those instances
+#                             only get rdp_rtt_ms.
+#   rdp_rtt_ms                TCP connect time to 3389 from the worker, taken
+#                             during an RDP handshake (services/readiness.py)
+# Neither provider exposes guest CPU or RAM through its API.
+#
+# Sweeps take a round-robin batch of active instances and pace provider calls
+# to TELEMETRY_PROVIDER_RPS. Each tier is only built from completed buckets
+# and only moves forward, and every tier keeps its own retention. Charts read
+# the 5-minute or hourly tier, never raw samples.
+
+METRICS = ("net_in_bps", "net_out_bps", "rdp_rtt_ms")
+RAW = 0
+TIERS = ((300, RAW), (3600, 300))  # (resolution, built from)
+# Samples are stamped when taken; a sweep may still be writing a bucket's
+# last samples this long after it ends
+SETTLE = timedelta(seconds=120)
+
+# Chart range -> (span, tier to read)
+RANGES = {
+    "1h": (timedelta(hours=1), 300),
+    "6h": (timedelta(hours=6), 300),
+    "24h": (timedelta(hours=24), 300),
+    "7d": (timedelta(days=7), 3600),
+    "30d": (timedelta(days=30), 3600),
+    "90d": (timedelta(days=90), 3600),
+}
+
+CURSOR_KEY = "telemetry:cursor"
+BANDWIDTH_KEY = "telemetry:bandwidth"  # instance id -> last counters seen
+
+EPOCH = datetime(1970, 1, 1)
+
+def floor_to(dt: datetime, seconds: int) -> datetime:
+    return EPOCH + timedelta(seconds=int((dt - EPOCH).total_seconds()) // seconds * seconds)
+
+def retention(resolution: int) -> timedelta:
+    if resolution == RAW:
+        return timedelta(hours=settings.TELEMETRY_RAW_RETENTION_HOURS)
+    if resolution == 300:
+        return timedelta(days=settings.TELEMETRY_5M_RETENTION_DAYS)
+    return timedelta(days=settings.TELEMETRY_1H_RETENTION_DAYS)
+
+# --- Collection ---------------------------------------------------------------
+
+class Pacer:
+    """Spaces calls at least 1/rate apart on the running loop"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self):
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def next_batch(db: Session, redis_client, limit: int) -> List[RDPInstance]:
+    """The next `limit` active instances after the stored cursor, wrapping around"""
+    cursor = int(redis_client.get(CURSOR_KEY) or 0)
+    query = db.query(RDPInstance).filter(
+        RDPInstance.status == "active",
+        RDPInstance.ip_address.isnot(None),
+        ~RDPInstance.provider_id.startswith("mock-"),  # dev instances have nothing to measure
+    ).order_by(RDPInstance.id)
+    batch = query.filter(RDPInstance.id > cursor).limit(limit).all()
+    if len(batch) < limit and cursor:
+        seen = {i.id for i in batch}
+        batch += [i for i in query.filter(RDPInstance.id <= cursor).limit(limit - len(batch)) if i.id not in seen]
+    if batch:
+        redis_client.set(CURSOR_KEY, batch[-1].id)
+    return batch
+
+def bandwidth_rates(previous: Optional[Dict], bandwidth: Dict[str, Dict], now: datetime) -> Tuple[Dict, Dict[str, float]]:
+    """(new counter state, {metric: bytes/s}) from one bandwidth reading; no rates on the first reading"""
+    day = now.date().isoformat()
+    today = bandwidth.get(day, {})
+    state = {"day": day, "in": today.get("incoming_bytes", 0), "out": today.get("outgoing_bytes", 0),
+             "at": (now - EPOCH).total_seconds()}
+    if not previous:
+        return state, {}
+    if previous["day"] == day:
+        elapsed = state["at"] - previous["at"]
+        delta_in, delta_out = state["in"] - previous["in"], state["out"] - previous["out"]
+    else:
+        # Counters restart at midnight: count what's accrued since
+        elapsed = (now - datetime.combine(now.date(), datetime.min.time())).total_seconds()
+        delta_in, delta_out = state["in"], state["out"]
+    if elapsed <= 0 or delta_in < 0 or delta_out < 0:
+        return state, {}
+    return state, {"net_in_bps": delta_in / elapsed, "net_out_bps": delta_out / elapsed}
+
+async def fetch_bandwidth(provider, instances: List[RDPInstance]) -> Dict[int, object]:
+    """instance id -> bandwidth dict or the exception; calls paced to TELEMETRY_PROVIDER_RPS"""
+    pacer = Pacer(settings.TELEMETRY_PROVIDER_RPS)
+    semaphore = asyncio.Semaphore(settings.TELEMETRY_CONCURRENCY)
+
+    async def _one(instance: RDPInstance):
+        async with semaphore:
+            await pacer.wait()
+            return await provider.get_bandwidth(instance.provider_id)
+
+    results = await asyncio.gather(*(_one(i) for i in instances), return_exceptions=True)
+    return {instance.id: result for instance, result in zip(instances, results)}
+
+async def measure_rtt(instances: List[RDPInstance]) -> Dict[int, float]:
+    results = await probe_all([(i.id, i.ip_address) for i in instances])
+    return {key: result["connect_ms"] for key, result in results.items() if not isinstance(result, ProbeError)}
+
+def write_samples(db: Session, samples: Iterable[Tuple[int, str, datetime, float]]) -> int:
+    """Insert raw samples (caller commits)"""
+    rows = [{"instance_id": instance_id, "metric": metric, "resolution": RAW, "ts": ts,
+             "count": 1, "sum": value, "min": value, "max": value}
+            for instance_id, metric, ts, value in samples]
+    if rows:
+        db.execute(insert(InstanceMetric), rows)
+    return len(rows)
+
+# --- Downsampling and retention -------------------------------------------------
+
+def downsample(db: Session, now: datetime) -> Dict[int, int]:
+    """Build every completed, not yet built bucket of each tier; returns rows written per tier"""
+    written = {}
+    for resolution, source in TIERS:
+        last = db.query(func.max(InstanceMetric.ts)).filter(InstanceMetric.resolution == resolution).scalar()
+        start = last + timedelta(seconds=resolution) if last else floor_to(now - retention(source), resolution)
+        end = floor_to(now - SETTLE, resolution)
+        if start >= end:
+            written[resolution] = 0
+            continue
+        buckets = defaultdict(lambda: [0, 0.0, None, None])
+        rows = db.query(
+            InstanceMetric.instance_id, InstanceMetric.metric, InstanceMetric.ts,
+            InstanceMetric.count, InstanceMetric.sum, InstanceMetric.min, InstanceMetric.max,
+        ).filter(
+            InstanceMetric.resolution == source, InstanceMetric.ts >= start, InstanceMetric.ts < end
+        ).yield_per(5000)
+        for instance_id, metric, ts, count, total, low, high in rows:
+            bucket = buckets[(instance_id, metric, floor_to(ts, resolution))]
+            bucket[0] += count
+            bucket[1] += total
+            bucket[2] = low if bucket[2] is None else min(bucket[2], low)
+            bucket[3] = high if bucket[3] is None else max(bucket[3], high)
+        if buckets:
+            db.execute(insert(InstanceMetric), [{
+                "instance_id": instance_id, "metric": metric, "resolution": resolution, "ts": ts,
+                "count": count, "sum": total, "min": low, "max": high,
+            } for (instance_id, metric, ts), (count, total, low, high) in buckets.items()])
+        db.commit()
+        written[resolution] = len(buckets)
+    return written
+
+def purge(db: Session, now: datetime) -> int:
+    deleted = 0
+    for resolution in (RAW,) + tuple(r for r, _ in TIERS):
+        deleted += db.query(InstanceMetric).filter(
+            InstanceMetric.resolution == resolution, InstanceMetric.ts < now - retention(resolution)
+        ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+# --- Charts ---------------------------------------------------------------------
+
+def series(db: Session, instance_id: int, span: timedelta, resolution: int, now: datetime,
+           metrics: Iterable[str] = METRICS) -> Dict[str, List[Dict]]:
+    """metric -> [{t, avg, min, max}] from one pre-aggregated tier"""
+    rows = db.query(
+        InstanceMetric.metric, InstanceMetric.ts, InstanceMetric.count,
+        InstanceMetric.sum, InstanceMetric.min, InstanceMetric.max,
+    ).filter(
+        InstanceMetric.instance_id == instance_id,
+        InstanceMetric.metric.in_(list(metrics)),
+        InstanceMetric.resolution == resolution,
+        InstanceMetric.ts >= now - span,
+    ).order_by(InstanceMetric.metric, InstanceMetric.ts).all()
+    result = {metric: [] for metric in metrics}
+    for metric, ts, count, total, low, high in rows:
+        result[metric].append({"t": ts.isoformat(), "avg": round(total / count, 2), "min": round(low, 2),
+                               "max": round(high, 2)})
+    return result
+
+def load_state(redis_client, instance_ids: List[int]) -> Dict[int, Optional[Dict]]:
+    if not instance_ids:
+        return {}
+    values = redis_client.hmget(BANDWIDTH_KEY, instance_ids)
+    return {i: json.loads(v) if v else None for i, v in zip(instance_ids, values)}
+
+def save_state(redis_client, states: Dict[int, Dict]):
+    if states:
+        redis_client.hset(BANDWIDTH_KEY, mapping={i: json.dumps(s) for i, s in states.items()})
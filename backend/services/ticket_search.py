@@ -0,0 +1,136 @@
+import re
+from typing import Optional, Sequence
+from sqlalchemy import Float, cast, column, func, literal_column, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from backend.core.pagination import DEFAULT_PAGE_SIZE, paginate
+from backend.models.ticket import Ticket
+
+# Full-text search over ticket subject + message.
+#
+# Postgres: a stored generated tsvector column (subject weighted above
+# message) with a GIN index; queries use websearch_to_tsquery, ranked by
+# ts_rank_cd.
+# SQLite (dev): an external-content FTS5 table kept in sync by triggers;
+# ranked by bm25.
+#
+# Neither is mapped on the Ticket model, so setup_ticket_search() creates
+# them (and the keyset indexes, for tables that predate them) at startup.
+# Every statement is idempotent.
+#
+# Results carry the same columns as the caller's plain list endpoint; the
+# rank is only used for ordering and the cursor.
+
+_fts = table("tickets_fts", column("rowid"))
+
+SEARCH_COLUMNS = (Ticket.id, Ticket.user_id, Ticket.subject, Ticket.status, Ticket.created_at)
+
+_POSTGRES_DDL = (
+    """
+    ALTER TABLE tickets ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(subject, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(message, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_tickets_search ON tickets USING GIN (search_vector)",
+)
+
+_SQLITE_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts
+    USING fts5(subject, message, content='tickets', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_insert AFTER INSERT ON tickets BEGIN
+        INSERT INTO tickets_fts(rowid, subject, message) VALUES (new.id, new.subject, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_delete AFTER DELETE ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, subject, message) VALUES ('delete', old.id, old.subject, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_update AFTER UPDATE OF subject, message ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, subject, message) VALUES ('delete', old.id, old.subject, old.message);
+        INSERT INTO tickets_fts(rowid, subject, message) VALUES (new.id, new.subject, new.message);
+    END
+    """,
+)
+
+def setup_ticket_search(engine: Engine):
+    for index in Ticket.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            for statement in _POSTGRES_DDL:
+                conn.execute(text(statement))
+        elif engine.dialect.name == "sqlite":
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tickets_fts'"
+            )).first()
+            for statement in _SQLITE_DDL:
+                conn.execute(text(statement))
+            if not existed:
+                # Index tickets written before the mirror existed
+                conn.execute(text("INSERT INTO tickets_fts(tickets_fts) VALUES ('rebuild')"))
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def _fts5_query(q: str) -> str:
+    """User input -> FTS5 query: every word must match (last one as a prefix)"""
+    words = _WORD.findall(q)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def search_tickets(
+    db: Session,
+    q: str,
+    statuses: Optional[Sequence[str]] = None,
+    user_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    columns: Sequence = SEARCH_COLUMNS,
+):
+    """Best matches first: (rows of `columns`, next cursor or None)"""
+    filters = []
+    if statuses:
+        filters.append(Ticket.status.in_(statuses))
+    if user_id is not None:
+        filters.append(Ticket.user_id == user_id)
+
+    if db.get_bind().dialect.name == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return [], None
+        rank = (-func.bm25(literal_column("tickets_fts"), 2.0, 1.0)).label("rank")
+        query = (
+            db.query(*columns, rank)
+            .join(_fts, _fts.c.rowid == Ticket.id)
+            .filter(text("tickets_fts MATCH :match").bindparams(match=match), *filters)
+        )
+    else:
+        tsquery = func.websearch_to_tsquery("english", q)
+        vector = literal_column("tickets.search_vector")
+        # ts_rank_cd is float4 but the cursor carries it back as a float8
+        # bind: compared as float4 widened, ties at the page boundary would
+        # be skipped. Rank as float8 so the stored and bound values agree.
+        rank = cast(func.ts_rank_cd(vector, tsquery), Float(53)).label("rank")
+        query = db.query(*columns, rank).filter(vector.op("@@")(tsquery), *filters)
+
+    # Rank is computed per match, so page over it from a subquery
+    ranked = query.subquery()
+    rows, next_cursor = paginate(
+        db.query(ranked),
+        (ranked.c.rank, ranked.c.id),
+        cursor=cursor,
+        limit=limit,
+    )
+    for row in rows:
+        del row["rank"]
+    return rows, next_cursor
@@ -0,0 +1,28 @@
+from celery import shared_task
+from backend.core import metrics
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.services.archive import archive
+
+LOCK_KEY = "archive:lock"
+
+@shared_task(bind=True)
+def archive_cold_rows(self):
+    """Move old terminated instances and closed tickets to the archive tables"""
+    lock = get_redis().lock(LOCK_KEY, timeout=3600, blocking=False)
+    if not lock.acquire():
+        return None
+    db = SessionLocal()
+    try:
+        moved = archive(db)
+        for table, count in moved.items():
+            if count:
+                metrics.inc("nemordp_archived_rows_total", count, table=table)
+        print(f"Archived {moved}")
+        return moved
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
@@ -0,0 +1,24 @@
+from celery import shared_task
+from backend.core.event_loop import run_async
+from backend.database.connection import SessionLocal
+from backend.services.catalog import fetch_contabo, fetch_vultr, store_provider_catalog
+
+@shared_task(bind=True)
+def sync_catalog(self):
+    """Refresh plans, regions, images and stock from each provider"""
+    db = SessionLocal()
+    synced = {}
+    try:
+        for provider, fetch in (("vultr", fetch_vultr), ("contabo", fetch_contabo)):
+            try:
+                rows = run_async(fetch)
+            except Exception as e:
+                # Keep the last good catalog for this provider
+                print(f"Catalog sync failed for {provider}: {e}")
+                continue
+            if rows:
+                synced[provider] = store_provider_catalog(db, provider, rows)
+        print(f"Catalog synced: {synced}")
+        return synced
+    finally:
+        db.close()
@@ -0,0 +1,58 @@
+from celery import shared_task
+from backend.core.event_loop import run_async
+from backend.database.connection import SessionLocal
+from backend.models.order import Order
+from backend.models.rdp_instance import RDPInstance
+from backend.services.email import EmailService
+from backend.services.orders import credentials_csv, order_credentials
+from backend.services.outbox import already_delivered, record_delivered
+
+@shared_task(bind=True, max_retries=5)
+def send_instance_credentials_task(self, instance_id: int, dedup_key: str = None):
+    """Email an active instance's credentials (delivered from the outbox, so at-least-once)"""
+    if dedup_key and already_delivered(dedup_key):
+        return "duplicate"
+    db = SessionLocal()
+    try:
+        instance = db.query(RDPInstance).filter(RDPInstance.id == instance_id).first()
+        if instance is None or instance.status != "active":
+            return "skipped"
+        credentials = {
+            "provider_id": instance.provider_id,
+            "ip_address": instance.ip_address,
+            "username": instance.username,
+            "password": instance.password,
+            "status": instance.status,
+        }
+        to_email, os_type = instance.user.email, instance.os_type
+    finally:
+        db.close()
+    try:
+        run_async(EmailService().send_rdp_credentials, to_email, credentials, os_type)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=30 * (2 ** self.request.retries))
+    if dedup_key:
+        record_delivered(dedup_key)
+    return "sent"
+
+@shared_task(bind=True, max_retries=5)
+def send_order_credentials_task(self, order_id: int, dedup_key: str = None):
+    """Email every seat of a completed bulk order in one message, with a CSV attached"""
+    if dedup_key and already_delivered(dedup_key):
+        return "duplicate"
+    db = SessionLocal()
+    try:
+        order = db.query(Order).filter(Order.id == order_id).first()
+        if order is None or order.status != "completed":
+            return "skipped"
+        seats = order_credentials(db, order)
+        args = (order.user_email, order.reference, order.plan, order.os_type, seats, credentials_csv(seats))
+    finally:
+        db.close()
+    try:
+        run_async(EmailService().send_order_credentials, *args)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=30 * (2 ** self.request.retries))
+    if dedup_key:
+        record_delivered(dedup_key)
+    return "sent"
@@ -1,9 +1,10 @@
 from celery import shared_task
 from datetime import datetime
+from backend.core.event_loop import run_async
 from backend.database.connection import SessionLocal
 from backend.models.rdp_instance import RDPInstance
+from backend.services.metering import record_event
 from backend.services.provisioning import ProvisioningService
-from asgiref.sync import async_to_sync
 
 @shared_task(bind=True)
 def check_expired_instances(self):
@@ -20,22 +21,18 @@ def check_expired_instances(self):
         
         print(f"Found {len(expired_instances)} expired instances.")
         
-        for instance in expired_instances:
-            try:
-                # Terminate via Provider
-                success = async_to_sync(provisioning_service.terminate_rdp)(
-                    instance.provider, 
-                    instance.provider_id
-                )
-                
-                if success:
-                    instance.status = "terminated"
-                    print(f"Terminated expired instance {instance.id}")
-                else:
-                    print(f"Failed to terminate expired instance {instance.id}")
-                    
-            except Exception as e:
-                print(f"Error terminating instance {instance.id}: {e}")
+        # Terminate via Provider, all at once on the shared loop
+        results = run_async(provisioning_service.terminate_many, expired_instances)
+        
+        for instance, success in zip(expired_instances, results):
+            if isinstance(success, Exception):
+                print(f"Error terminating instance {instance.id}: {success}")
+            elif success:
+                instance.status = "terminated"
+                record_event(db, instance, "expired", instance.expires_at)
+                print(f"Terminated expired instance {instance.id}")
+            else:
+                print(f"Failed to terminate expired instance {instance.id}")
                 
         db.commit()
     finally:
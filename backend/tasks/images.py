@@ -0,0 +1,59 @@
+from celery import shared_task
+from backend.core.event_loop import run_async
+from backend.database.connection import SessionLocal
+from backend.models.golden_image import GoldenImage
+from backend.providers.contabo import ContaboProvider
+from backend.services.images import mark_failed, mark_ready, pending_builds, timed_out
+
+@shared_task(bind=True)
+def refresh_golden_images(self):
+    """Register new golden image versions and promote the ones the provider has finished"""
+    db = SessionLocal()
+    contabo = ContaboProvider()
+    try:
+        if not contabo.client_id or not contabo.client_secret:
+            return {"skipped": "no provider credentials"}
+
+        for image in pending_builds(db):
+            try:
+                image.image_ref = run_async(
+                    contabo.create_custom_image,
+                    f"nemordp-{image.os_type}-desktop-v{image.version}",
+                    image.source_url,
+                    f"v{image.version}",
+                    f"NemoRDP {image.os_type} desktop, recipe {image.recipe}",
+                )
+                db.commit()
+                print(f"Registered golden image {image.provider}/{image.os_type} v{image.version}: {image.image_ref}")
+            except Exception as e:
+                mark_failed(db, image, str(e))
+                print(f"Golden image v{image.version} registration failed: {e}")
+
+        promoted = 0
+        building = db.query(GoldenImage).filter(
+            GoldenImage.status == "building", GoldenImage.image_ref.isnot(None)
+        ).all()
+        for image in building:
+            try:
+                details = run_async(contabo.get_image, image.image_ref)
+            except Exception as e:
+                print(f"Could not poll golden image {image.image_ref}: {e}")
+                continue
+            status = details.get("status")
+            if status == "downloaded":
+                for old in mark_ready(db, image):
+                    try:
+                        if run_async(contabo.delete_image, old.image_ref):
+                            old.status = "deleted"
+                            db.commit()
+                    except Exception as e:
+                        print(f"Could not delete golden image {old.image_ref}: {e}")
+                promoted += 1
+                print(f"Golden image {image.provider}/{image.os_type} v{image.version} is ready")
+            elif status == "error":
+                mark_failed(db, image, details.get("errorMessage") or "provider reported error")
+            elif timed_out(image):
+                mark_failed(db, image, f"still {status} after build timeout")
+        return {"promoted": promoted}
+    finally:
+        db.close()
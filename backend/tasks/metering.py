@@ -0,0 +1,24 @@
+from celery import shared_task
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.services.metering import run_rollup
+
+LOCK_KEY = "usage:rollup:lock"
+
+@shared_task(bind=True)
+def rollup_usage(self):
+    """Recompute hourly and daily usage rollups"""
+    lock = get_redis().lock(LOCK_KEY, timeout=600, blocking=False)
+    if not lock.acquire():
+        return None  # previous run still going; delete+insert per hour must not interleave
+    db = SessionLocal()
+    try:
+        result = run_rollup(db)
+        print(f"Usage rollup: {result}")
+        return result
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
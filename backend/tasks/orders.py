@@ -0,0 +1,18 @@
+from celery import shared_task
+from backend.database.connection import SessionLocal
+from backend.services.orders import release_bulk_seats, release_waitlist
+
+@shared_task(bind=True)
+def release_waitlisted_orders(self):
+    """Queue waitlisted orders once the provisioning backlog has drained"""
+    db = SessionLocal()
+    try:
+        released = release_waitlist(db)
+        if released:
+            print(f"Released {released} waitlisted orders")
+        seats = release_bulk_seats(db)
+        if seats:
+            print(f"Released {seats} bulk order seats")
+        return released
+    finally:
+        db.close()
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from collections import Counter
+from datetime import datetime
+from typing import List
+from celery import shared_task
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.event_loop import run_async
+from backend.core.http import get_http_client
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.models.outbox import OutboxMessage
+from backend.services.outbox import PUBSUB_CHANNEL, claim_batch, envelope, mark_failed, mark_sent, purge_sent
+from backend.tasks.email import send_instance_credentials_task, send_order_credentials_task
+
+MAX_BATCHES_PER_RUN = 10
+
+def _deliver_email(messages: List[OutboxMessage]) -> list:
+    # Hand off to the email queue; that task retries SMTP and checks the dedup key
+    results = []
+    for message in messages:
+        try:
+            if message.event == "order.completed":
+                send_order_credentials_task.apply_async(
+                    args=[message.payload["order_id"]], kwargs={"dedup_key": message.dedup_key}
+                )
+            else:
+                send_instance_credentials_task.apply_async(
+                    args=[message.payload["instance_id"]], kwargs={"dedup_key": message.dedup_key}
+                )
+            results.append(None)
+        except Exception as e:
+            results.append(e)
+    return results
+
+async def _post_webhooks(messages: List[OutboxMessage]) -> list:
+    client = get_http_client()
+    secret = settings.OUTBOX_WEBHOOK_SECRET.encode()
+
+    async def _one(message: OutboxMessage):
+        body = json.dumps(envelope(message)).encode()
+        response = await client.post(
+            settings.OUTBOX_WEBHOOK_URL,
+            content=body,
+            headers={
+                "Content-Type": "application/json",
+                "Idempotency-Key": message.dedup_key,
+                "X-NemoRDP-Signature": hmac.new(secret, body, hashlib.sha512).hexdigest(),
+            },
+            timeout=10.0,
+        )
+        if response.status_code >= 300:
+            raise Exception(f"webhook returned {response.status_code}")
+
+    return await asyncio.gather(*(_one(m) for m in messages), return_exceptions=True)
+
+def _deliver_webhook(messages: List[OutboxMessage]) -> list:
+    if not settings.OUTBOX_WEBHOOK_URL:
+        return [None] * len(messages)  # unconfigured since the rows were written
+    return run_async(_post_webhooks, messages)
+
+def _deliver_pubsub(messages: List[OutboxMessage]) -> list:
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for message in messages:
+            pipe.publish(PUBSUB_CHANNEL, json.dumps(envelope(message)))
+        pipe.execute()
+        return [None] * len(messages)
+    except Exception as e:
+        return [e] * len(messages)
+
+DELIVERERS = {"email": _deliver_email, "webhook": _deliver_webhook, "pubsub": _deliver_pubsub}
+
+@shared_task(bind=True)
+def relay_outbox(self):
+    """Deliver pending outbox messages in batches (at-least-once)"""
+    db = SessionLocal()
+    delivered = 0
+    try:
+        for _ in range(MAX_BATCHES_PER_RUN):
+            now = datetime.utcnow()
+            batch = claim_batch(db, now, settings.OUTBOX_BATCH_SIZE)
+            if not batch:
+                break
+            by_destination = {}
+            for message in batch:
+                by_destination.setdefault(message.destination, []).append(message)
+
+            outcomes = Counter()
+            for destination, messages in by_destination.items():
+                deliver = DELIVERERS.get(destination)
+                results = deliver(messages) if deliver else [Exception(f"unknown destination {destination}")] * len(messages)
+                for message, error in zip(messages, results):
+                    if error is None:
+                        mark_sent(message, now)
+                        outcomes[(destination, "sent")] += 1
+                    else:
+                        mark_failed(message, now, str(error))
+                        outcomes[(destination, "dead" if message.status == "dead" else "retry")] += 1
+                        print(f"Outbox {message.dedup_key} attempt {message.attempts} failed: {error}")
+            db.commit()  # releases the row locks
+
+            for (destination, result), count in outcomes.items():
+                metrics.inc("nemordp_outbox_messages_total", count, destination=destination, result=result)
+            delivered += sum(count for (_, result), count in outcomes.items() if result == "sent")
+            if len(batch) < settings.OUTBOX_BATCH_SIZE:
+                break
+        purge_sent(db, datetime.utcnow())
+        return delivered
+    finally:
+        db.close()
+
+def kick_relay():
+    """Ask for a relay run now instead of at the next beat tick"""
+    try:
+        relay_outbox.delay()
+    except Exception:
+        pass  # beat runs the relay every few seconds anyway
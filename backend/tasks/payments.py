@@ -0,0 +1,80 @@
+from collections import Counter
+from datetime import datetime
+from celery import shared_task
+from backend.core import metrics
+from backend.core.event_loop import run_async
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.services.chains import backend_for
+from backend.services.crypto_payments import (
+    CURRENCIES, WATCH_TIP_KEY, apply_balances, confirmations, enabled_currencies, expire_deposits, pool_sizes,
+    refill_pool, watched_by_currency,
+)
+
+REFILL_LOCK = "crypto:refill:lock"
+WATCH_LOCK = "crypto:watch:lock"
+
+@shared_task(bind=True)
+def refill_deposit_addresses(self):
+    """Top up the pre-derived deposit address pool of every enabled currency"""
+    lock = get_redis().lock(REFILL_LOCK, timeout=300, blocking=False)
+    if not lock.acquire():
+        return None  # two refills would derive the same indexes
+    db = SessionLocal()
+    try:
+        added = refill_pool(db)
+        for currency, available in pool_sizes(db).items():
+            metrics.set_gauge("nemordp_crypto_pool_available", available, currency=currency)
+        if added:
+            print(f"Deposit address pool refilled: {added}")
+        return added
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+def _scan(db, redis_client, chain: str) -> Counter:
+    backend = backend_for(chain)
+    tip = run_async(backend.tip)
+    tip_key = WATCH_TIP_KEY.format(chain=chain)
+    if str(tip) == redis_client.get(tip_key):
+        return Counter()  # no new block: confirmed balances can't have changed
+    outcomes = Counter()
+    for currency, deposits in watched_by_currency(db, chain).items():
+        # One batched lookup for all of a currency's outstanding addresses
+        received = run_async(backend.received, [d.address for d in deposits], currency, confirmations(currency), tip)
+        outcomes += apply_balances(db, deposits, received)
+    redis_client.set(tip_key, tip)
+    return outcomes
+
+@shared_task(bind=True)
+def watch_crypto_deposits(self):
+    """Check outstanding deposit addresses on every chain with a new block"""
+    redis_client = get_redis()
+    lock = redis_client.lock(WATCH_LOCK, timeout=600, blocking=False)
+    if not lock.acquire():
+        return None
+    db = SessionLocal()
+    try:
+        results = {}
+        for chain in sorted({CURRENCIES[c]["chain"] for c in enabled_currencies()}):
+            try:
+                outcomes = _scan(db, redis_client, chain)
+            except Exception as e:
+                db.rollback()
+                metrics.inc("nemordp_crypto_watch_errors_total", chain=chain)
+                print(f"Crypto watcher: {chain} check failed: {e}")
+                continue
+            results[chain] = dict(outcomes)
+        expired = expire_deposits(db, datetime.utcnow())
+        if expired:
+            print(f"Crypto watcher: {expired} unpaid deposit addresses expired")
+        return results
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
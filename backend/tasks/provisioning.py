@@ -1,65 +1,142 @@
 from celery import shared_task
-import asyncio
-from asgiref.sync import async_to_sync
-from backend.services.provisioning import ProvisioningService, OSType
+from celery.exceptions import MaxRetriesExceededError
+import time
+from datetime import datetime
+from backend.core.event_loop import run_async
+from backend.core.celery_app import celery_app
+from backend.core import metrics
+from backend.services.catalog import OutOfStockError, get_catalog
+from backend.services.images import find_golden_image, generate_password
+from backend.services.metering import record_event
+from backend.services.orders import seat_finished
+from backend.services.outbox import enqueue_event
+from backend.services.placement import reroute
+from backend.services.readiness import event_payload
+from backend.services.renewals import initial_expiry
+from backend.services.admission import record_provisioning_outcome, provisioning_started, provisioning_finished
+from backend.services.provisioning import ProvisioningService, OSType, provider_for
 from backend.models.rdp_instance import RDPInstance
 from backend.database.connection import SessionLocal
-from backend.services.email import EmailService # We'll create this next
+from backend.tasks.outbox import kick_relay
+from backend.tasks.readiness import probe_pending_instances
 
 @shared_task(bind=True, max_retries=3)
-def provision_rdp_task(self, user_id: int, order_id: str, os_type_str: str, plan: str, user_email: str):
+def provision_rdp_task(self, user_id: int, order_id: str, os_type_str: str, plan: str, user_email: str, region: str = None):
     """Background task to provision RDP instance"""
     db = SessionLocal()
     provisioning_service = ProvisioningService()
-    email_service = EmailService()
+    started = time.monotonic()
+    provisioning_started(self.request.id)
     
     try:
         # Convert string back to Enum
         os_type = OSType(os_type_str)
+        # Resolve region/image now: stock may have moved since checkout placed the order
+        catalog = get_catalog(db)
+        try:
+            offer = catalog.resolve(plan, region)
+        except OutOfStockError:
+            if region is None:
+                raise
+            offer = reroute(db, catalog, plan, order_id)
+            print(f"Region {region} out of stock for {order_id}; using {offer.region}")
+        golden = find_golden_image(db, offer.provider, os_type_str, offer.region, plan)
+        metrics.inc("nemordp_provisioning_image_total", provider=offer.provider,
+                    source="golden" if golden else "cloud_init")
         
-        # 1. Create Initial DB Record
-        rdp_instance = RDPInstance(
-            user_id=user_id,
-            provider="vultr" if os_type == OSType.WINDOWS else "contabo",
-            provider_id="pending",
-            os_type=os_type_str,
-            plan=plan,
-            status="provisioning"
-        )
-        db.add(rdp_instance)
+        # 1. One instance row per order. Retries (and redelivered messages)
+        # reuse it, and the providers look the VM up by its order label
+        # before creating one, so a retry never buys a second server.
+        rdp_instance = db.query(RDPInstance).filter(RDPInstance.order_reference == order_id).first()
+        if rdp_instance is not None and rdp_instance.provider_id != "pending":
+            # A failed one had its VM deleted; retry_failed_seats resets it to pending first
+            if rdp_instance.status in ("retrying", "scheduled"):
+                rdp_instance.status = "provisioning"  # let the prober have another go
+                rdp_instance.next_probe_at = None
+                db.commit()
+            print(f"Order {order_id} already has instance {rdp_instance.id}; not provisioning again")
+            return {"status": "success", "instance_id": rdp_instance.id}
+        if rdp_instance is None:
+            rdp_instance = RDPInstance(
+                user_id=user_id,
+                provider=provider_for(os_type),
+                provider_id="pending",
+                os_type=os_type_str,
+                plan=plan,
+                status="provisioning",
+                order_reference=order_id,
+                attempt_started_at=datetime.utcnow(),
+                # Our cloud-init sets it, so it must survive retries
+                password=generate_password() if os_type == OSType.LINUX else None
+            )
+            db.add(rdp_instance)
+            db.flush()
+            record_event(db, rdp_instance, "provisioning")
+        else:
+            # A retry, or a bulk order seat inserted when the order was dispatched
+            rdp_instance.status = "provisioning"
+            rdp_instance.attempt_started_at = datetime.utcnow()
+            if os_type == OSType.LINUX and not rdp_instance.password:
+                rdp_instance.password = generate_password()
         db.commit()
         db.refresh(rdp_instance)
+        # End the read transaction so the pooled connection isn't held
+        # for the minutes we spend waiting on the provider
+        db.commit()
         
-        # 2. Call Provisioning Service (Async in sync context)
-        # We use async_to_sync because Celery tasks are typically sync wrappers
-        result = async_to_sync(provisioning_service.provision_rdp)(
-            order_id, 
-            os_type, 
-            plan
-        )
+        # 2. Call Provisioning Service on the worker's shared event loop.
+        # This thread just waits; the loop keeps serving other tasks' I/O.
+        try:
+            result = run_async(
+                provisioning_service.provision_rdp,
+                order_id, 
+                os_type, 
+                plan,
+                offer,
+                golden.image_ref if golden else None,
+                rdp_instance.password
+            )
+        except Exception:
+            record_provisioning_outcome(provider_for(os_type), False, time.monotonic() - started)
+            raise
+        record_provisioning_outcome(provider_for(os_type), True, time.monotonic() - started)
         
-        # 3. Update DB with Credentials
+        # 3. Update DB with Credentials. Side effects go through the outbox in
+        # the same transaction; this worker never waits on SMTP or webhooks.
         rdp_instance.provider_id = result["provider_id"]
         rdp_instance.ip_address = result["ip_address"]
         rdp_instance.username = result["username"]
         rdp_instance.password = result["password"]
         rdp_instance.status = result["status"]
+        if result["status"] == "active":
+            # Mock instances: nothing to probe
+            rdp_instance.ready_at = datetime.utcnow()
+            rdp_instance.expires_at = initial_expiry(rdp_instance.ready_at)
+            record_event(db, rdp_instance, "active", rdp_instance.ready_at)
+            enqueue_event(db, "instance.ready", rdp_instance.id, event_payload(rdp_instance, "active"),
+                          skip=("email",) if rdp_instance.order_id else ())
         db.commit()
+        if result["status"] == "active" and rdp_instance.order_id:
+            seat_finished(db, rdp_instance.order_id)
         
-        # 4. Send Email
-        async_to_sync(email_service.send_rdp_credentials)(
-            user_email,
-            result,
-            os_type_str
-        )
-        print(f"Provisioning successful for {order_id}. Credentials: {result}")
+        # 4. Real instances are still booting: the readiness prober activates
+        # them (and queues the credentials email) once RDP answers
+        if result["status"] == "active":
+            kick_relay()
+        else:
+            try:
+                probe_pending_instances.delay()
+            except Exception:
+                pass  # beat sweeps every few seconds anyway
+        print(f"Provisioning successful for {order_id}. Instance: {rdp_instance.id}")
         
         return {"status": "success", "instance_id": rdp_instance.id}
         
     except Exception as e:
-        # Update status to failed
+        # Failed until the retry runs; "failed" is kept for the last attempt
         if 'rdp_instance' in locals():
-            rdp_instance.status = "failed"
+            db.rollback()
+            rdp_instance.status = "retrying"
             db.commit()
         
         # Retry logic
@@ -67,7 +144,22 @@ def provision_rdp_task(self, user_id: int, order_id: str, os_type_str: str, plan
             self.retry(countdown=60 * (2 ** self.request.retries))
         except MaxRetriesExceededError:
             print(f"Max retries exceeded for {order_id}")
+            if 'rdp_instance' in locals():
+                rdp_instance.status = "failed"
+                record_event(db, rdp_instance, "failed")
+                enqueue_event(db, "instance.failed", rdp_instance.id,
+                              event_payload(rdp_instance, "failed", "provisioning_failed"))
+                db.commit()
+                if rdp_instance.order_id:
+                    seat_finished(db, rdp_instance.order_id)
+                kick_relay()
             raise e
         raise e
     finally:
         db.close()
+        provisioning_finished(self.request.id)
+        # A slot just freed up; let the scheduler hand out the next job
+        try:
+            celery_app.send_task("backend.tasks.scheduler.dispatch_provisioning_jobs")
+        except Exception:
+            pass  # beat runs the dispatcher every few seconds anyway
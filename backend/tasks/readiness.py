@@ -0,0 +1,89 @@
+import math
+from collections import Counter
+from datetime import datetime
+from celery import shared_task
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.event_loop import run_async
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.services.readiness import (
+    ProbeError, due_instances, gave_up, mark_ready, mark_unreachable, probe_all, record_failure,
+)
+from backend.services.orders import seat_finished
+from backend.services.provisioning import ProvisioningService
+from backend.tasks.outbox import kick_relay
+
+LOCK_KEY = "probe:lock"
+
+def lock_timeout() -> int:
+    """Worst-case sweep: every wave of RDP_PROBE_CONCURRENCY probes times out, doubled for the DB work and deletes"""
+    waves = math.ceil(settings.RDP_PROBE_BATCH_SIZE / settings.RDP_PROBE_CONCURRENCY)
+    return max(120, int(settings.RDP_PROBE_TIMEOUT_SECONDS * waves * 2) + 60)
+
+@shared_task(bind=True)
+def probe_pending_instances(self):
+    """Probe booting instances over RDP; activate the ones that answer (emails go via the outbox)"""
+    lock = get_redis().lock(LOCK_KEY, timeout=lock_timeout(), blocking=False)
+    if not lock.acquire():
+        return 0  # another sweep is still running
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        instances = due_instances(db, now, settings.RDP_PROBE_BATCH_SIZE)
+        if not instances:
+            return 0
+        results = run_async(probe_all, [(i.id, i.ip_address) for i in instances])
+        lock.reacquire()  # full TTL again for the updates and deletes
+
+        outcomes = Counter()
+        ready, unreachable = [], []
+        for instance in instances:
+            result = results[instance.id]
+            if isinstance(result, ProbeError):
+                outcomes[(instance.provider, result.stage)] += 1
+                if gave_up(instance, now):
+                    unreachable.append(instance)
+                else:
+                    record_failure(instance, now)
+            else:
+                outcomes[(instance.provider, "ok")] += 1
+                ready.append((instance, result))
+        db.commit()
+
+        activated, orders = 0, set()
+        for instance, latency in ready:
+            if mark_ready(db, instance, latency):
+                activated += 1
+                print(f"Instance {instance.id} accepting RDP after {instance.probe_attempts} failed probes")
+                if instance.order_id:
+                    orders.add(instance.order_id)
+
+        failed = []
+        for instance in unreachable:
+            if mark_unreachable(db, instance):
+                print(f"Instance {instance.id} never answered on RDP ({instance.ip_address}); marked failed")
+                failed.append(instance)
+                if instance.order_id:
+                    orders.add(instance.order_id)
+        if failed:
+            # A failed delete leaves a leaked VM, which the fleet reconciler reports
+            deleted = run_async(ProvisioningService().terminate_many, failed)
+            for instance, success in zip(failed, deleted):
+                if isinstance(success, Exception) or not success:
+                    print(f"Failed to delete unreachable instance {instance.id}: {success}")
+
+        for order_id in orders:
+            seat_finished(db, order_id)  # next seats, or the order's completion email
+        if activated or unreachable:
+            kick_relay()
+
+        for (provider, result), count in outcomes.items():
+            metrics.inc("nemordp_rdp_probes_total", count, provider=provider, result=result)
+        return activated
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass  # expired while we were probing
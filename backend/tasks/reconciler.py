@@ -0,0 +1,67 @@
+import time
+from datetime import datetime
+from celery import shared_task
+from backend.core.config import settings
+from backend.core.event_loop import run_async
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.providers.contabo import ContaboProvider
+from backend.providers.vultr import VultrProvider
+from backend.services.reconciler import (
+    LABEL_PREFIX, LIVE_STATUSES, delete_all, diff, load_local, record_run, repair,
+)
+
+LOCK_KEY = "reconcile:lock"
+
+def _reconcile(db, name: str, provider) -> dict:
+    started_at, started = datetime.utcnow(), time.monotonic()
+    try:
+        remote = run_async(provider.list_instances, LABEL_PREFIX)
+    except Exception as e:
+        record_run(db, name, started_at, time.monotonic() - started, 0, 0, {}, {}, error=str(e)[:500])
+        print(f"Reconcile {name}: could not list instances: {e}")
+        return {"error": str(e)}
+
+    local = load_local(db, name, (vm["provider_id"] for vm in remote))
+    live = sum(1 for row in local if row.status in LIVE_STATUSES)
+    drift = diff(remote, local, datetime.utcnow())
+    repaired = repair(db, drift, live, datetime.utcnow())
+    db.commit()
+
+    doomed = [vm for _, vm in drift.get("orphaned", []) + drift.get("leaked", [])]
+    if doomed and settings.RECONCILE_DELETE_ORPHANS:
+        results = run_async(delete_all, provider, doomed)
+        repaired["deleted"] = sum(1 for r in results if r is True)
+        failures = [r for r in results if r is not True]
+        if failures:
+            repaired["delete_failed"] = len(failures)
+            print(f"Reconcile {name}: {len(failures)} deletes failed, e.g. {failures[0]}")
+    elif doomed:
+        repaired["delete_held"] = len(doomed)
+
+    run = record_run(db, name, started_at, time.monotonic() - started, len(remote), live, drift, repaired)
+    print(f"Reconcile {name}: {len(remote)} VMs, {live} live rows, drift {run.drift}, repaired {run.repaired} "
+          f"in {run.duration_ms:.0f}ms")
+    return {"drift": run.drift, "repaired": run.repaired}
+
+@shared_task(bind=True)
+def reconcile_fleet(self):
+    """Diff every provider's nemordp-* instances against rdp_instances and repair drift"""
+    lock = get_redis().lock(LOCK_KEY, timeout=1800, blocking=False)
+    if not lock.acquire():
+        return None
+    db = SessionLocal()
+    try:
+        results = {}
+        for name, provider in (("vultr", VultrProvider()), ("contabo", ContaboProvider())):
+            configured = provider.api_key if name == "vultr" else provider.client_id and provider.client_secret
+            if not configured:
+                continue  # nothing real to compare against (dev/mock)
+            results[name] = _reconcile(db, name, provider)
+        return results
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
@@ -0,0 +1,51 @@
+from datetime import datetime
+from celery import shared_task
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.event_loop import run_async
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.services.email import EmailService
+from backend.services.renewals import claim_due_reminders, mark_failed, mark_sent, pending_digests
+
+LOCK_KEY = "renewals:reminders:lock"
+
+@shared_task(bind=True)
+def send_renewal_reminders(self):
+    """Queue reminders for instances entering an expiry window, then send them as per-user digests"""
+    lock = get_redis().lock(LOCK_KEY, timeout=900, blocking=False)
+    if not lock.acquire():
+        return None
+    db = SessionLocal()
+    email_service = EmailService()
+    try:
+        now = datetime.utcnow()
+        claimed = claim_due_reminders(db, now)
+        sent = failed = 0
+        for _ in range(settings.RENEWAL_MAX_BATCHES):
+            digests = pending_digests(db, now, settings.RENEWAL_EMAIL_BATCH_SIZE)
+            if not digests:
+                break
+            try:
+                results = run_async(email_service.send_renewal_digests, digests)
+            except Exception as e:
+                # Connection or login failed: the whole batch waits for the next run
+                print(f"Renewal reminders: batch of {len(digests)} failed: {e}")
+                results = [e] * len(digests)
+            ok = [d for d, error in zip(digests, results) if error is None]
+            mark_sent(db, [i for d in ok for i in d["reminder_ids"]], now)
+            mark_failed(db, [i for d, error in zip(digests, results) if error is not None for i in d["reminder_ids"]])
+            sent, failed = sent + len(ok), failed + len(digests) - len(ok)
+            if len(ok) < len(digests):
+                break  # retried next run rather than spinning on the same users
+        metrics.inc("nemordp_renewal_reminders_total", sent, result="sent")
+        metrics.inc("nemordp_renewal_reminders_total", failed, result="failed")
+        if claimed or sent or failed:
+            print(f"Renewal reminders: {claimed} due, {sent} digests sent, {failed} failed")
+        return {"claimed": claimed, "sent": sent, "failed": failed}
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
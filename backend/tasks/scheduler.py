@@ -0,0 +1,15 @@
+from celery import shared_task
+from backend.core.config import settings
+from backend.services.admission import provisioning_in_flight, provisioning_queue_depth
+from backend.services.scheduler import ProvisioningScheduler
+from backend.tasks.provisioning import provision_rdp_task
+
+@shared_task(bind=True)
+def dispatch_provisioning_jobs(self):
+    """Move scheduled provisioning jobs onto the Celery queue as slots free up"""
+    free_slots = settings.PROVISIONING_CAPACITY - provisioning_in_flight() - provisioning_queue_depth()
+    sent = ProvisioningScheduler().dispatch(
+        free_slots,
+        send=lambda job: provision_rdp_task.apply_async(kwargs=job["kwargs"]),
+    )
+    return sent
@@ -0,0 +1,97 @@
+from collections import Counter
+from datetime import datetime
+from celery import shared_task
+from backend.core import metrics
+from backend.core.config import settings
+from backend.core.event_loop import run_async
+from backend.core.redis_client import get_redis
+from backend.database.connection import SessionLocal
+from backend.models.rdp_instance import RDPInstance
+from backend.providers.vultr import VultrProvider
+from backend.services.telemetry import (
+    BANDWIDTH_KEY, bandwidth_rates, downsample, fetch_bandwidth, load_state, measure_rtt, next_batch, purge,
+    save_state, write_samples,
+)
+
+COLLECT_LOCK = "telemetry:collect:lock"
+DOWNSAMPLE_LOCK = "telemetry:downsample:lock"
+
+@shared_task(bind=True)
+def collect_instance_telemetry(self):
+    """Sample bandwidth and RDP round-trip for the next batch of active instances"""
+    redis_client = get_redis()
+    lock = redis_client.lock(COLLECT_LOCK, timeout=600, blocking=False)
+    if not lock.acquire():
+        return 0  # previous sweep still pacing through its batch
+    db = SessionLocal()
+    try:
+        instances = next_batch(db, redis_client, settings.TELEMETRY_BATCH_SIZE)
+        db.commit()  # don't hold the read transaction across the network calls
+        if not instances:
+            return 0
+        outcomes = Counter()
+        samples = []
+
+        rtt = run_async(measure_rtt, instances)
+        now = datetime.utcnow()
+        samples += [(instance_id, "rdp_rtt_ms", now, value) for instance_id, value in rtt.items()]
+        outcomes["rdp_ok"] += len(rtt)
+        outcomes["rdp_error"] += len(instances) - len(rtt)
+
+        vultr = VultrProvider()
+        metered = [i for i in instances if i.provider == "vultr"]
+        if metered and vultr.api_key:
+            readings = run_async(fetch_bandwidth, vultr, metered)
+            now = datetime.utcnow()
+            previous = load_state(redis_client, [i.id for i in metered])
+            states = {}
+            for instance_id, reading in readings.items():
+                if isinstance(reading, Exception):
+                    outcomes["bandwidth_error"] += 1
+                    continue
+                states[instance_id], rates = bandwidth_rates(previous[instance_id], reading, now)
+                samples += [(instance_id, metric, now, value) for metric, value in rates.items()]
+                outcomes["bandwidth_ok"] += 1
+            save_state(redis_client, states)
+
+        written = write_samples(db, samples)
+        db.commit()
+        for result, count in outcomes.items():
+            metrics.inc("nemordp_telemetry_sweeps_total", count, result=result)
+        return written
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+@shared_task(bind=True)
+def downsample_instance_telemetry(self):
+    """Roll raw samples into the 5-minute and hourly tiers, then apply retention"""
+    redis_client = get_redis()
+    lock = redis_client.lock(DOWNSAMPLE_LOCK, timeout=600, blocking=False)
+    if not lock.acquire():
+        return None  # two runs would build the same buckets twice
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        written = downsample(db, now)
+        deleted = purge(db, now)
+        # Forget bandwidth counters of instances that are gone
+        tracked = [int(i) for i in redis_client.hkeys(BANDWIDTH_KEY)]
+        if tracked:
+            active = {i for (i,) in db.query(RDPInstance.id).filter(
+                RDPInstance.id.in_(tracked), RDPInstance.status == "active"
+            )}
+            stale = [i for i in tracked if i not in active]
+            if stale:
+                redis_client.hdel(BANDWIDTH_KEY, *stale)
+        print(f"Telemetry: downsampled {written}, purged {deleted} rows")
+        return {"written": written, "deleted": deleted}
+    finally:
+        db.close()
+        try:
+            lock.release()
+        except Exception:
+            pass
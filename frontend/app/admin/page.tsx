@@ -4,6 +4,7 @@ import { useEffect, useState } from 'react'
 import { useRouter } from 'next/navigation'
 import { Header } from '@/components/Header'
 import { Footer } from '@/components/Footer'
+import { apiFetch } from '@/lib/api'
 
 interface AdminStats {
     total_users: number
@@ -35,12 +36,8 @@ export default function AdminPage() {
 
         const fetchData = async () => {
             try {
-                const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-
                 // Fetch Stats
-                const statsRes = await fetch(`${apiUrl}/admin/stats`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                })
+                const statsRes = await apiFetch('/admin/stats')
                 if (statsRes.ok) {
                     setStats(await statsRes.json())
                 } else if (statsRes.status === 403 || statsRes.status === 401) {
@@ -50,9 +47,7 @@ export default function AdminPage() {
                 }
 
                 // Fetch Users
-                const usersRes = await fetch(`${apiUrl}/admin/users`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                })
+                const usersRes = await apiFetch('/admin/users')
                 if (usersRes.ok) {
                     setUsers(await usersRes.json())
                 }
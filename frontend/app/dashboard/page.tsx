@@ -5,6 +5,7 @@ import { useRouter } from 'next/navigation'
 import { Header } from '@/components/Header'
 import { Footer } from '@/components/Footer'
 import { Button } from '@/components/ui/button'
+import { apiFetch, apiFetchAll } from '@/lib/api'
 
 interface RDPInstance {
     id: number
@@ -15,6 +16,7 @@ interface RDPInstance {
     plan: string
     status: string
     created_at: string
+    expires_at: string | null
 }
 
 export default function DashboardPage() {
@@ -33,15 +35,10 @@ export default function DashboardPage() {
 
         const fetchInstances = async () => {
             try {
-                const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-                const response = await fetch(`${apiUrl}/instances/`, {
-                    headers: {
-                        'Authorization': `Bearer ${token}`
-                    }
-                })
+                // The list is paginated; follow the cursor so no instance is left out
+                const { response, items } = await apiFetchAll<RDPInstance>('/instances/')
                 if (response.ok) {
-                    const data = await response.json()
-                    setInstances(data)
+                    setInstances(items)
                 } else if (response.status === 401) {
                     router.push('/auth/login')
                 }
@@ -62,17 +59,22 @@ export default function DashboardPage() {
 
     }, [router])
 
+    // Renewal reminder emails link to /dashboard?renew=<id>: start that checkout
+    useEffect(() => {
+        const renewId = Number(new URLSearchParams(window.location.search).get('renew'))
+        if (!renewId || !localStorage.getItem('token')) return
+        router.replace('/dashboard')
+        handleRenew(renewId)
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [router])
+
     const handleDeploy = async () => {
         setProvisioning(true)
         try {
-            const token = localStorage.getItem('token')
-            const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-
-            const response = await fetch(`${apiUrl}/billing/initiate`, {
+            const response = await apiFetch('/billing/initiate', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${token}`
+                    'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({
                     plan: 'basic_windows',
@@ -93,25 +95,43 @@ export default function DashboardPage() {
         }
     }
 
+    const handleRenew = async (instanceId: number) => {
+        if (!confirm(`Renew instance #${instanceId} for another billing period?`)) return
+
+        setActionLoading(instanceId)
+        try {
+            const response = await apiFetch(`/instances/${instanceId}/renew`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ payment_method: 'paystack' })
+            })
+            const data = await response.json()
+
+            if (response.ok) {
+                // The expiry moves once the payment is confirmed, not here
+                window.location.href = data.payment_url
+            } else {
+                alert(data.detail || "Failed to start renewal")
+            }
+        } catch (error) {
+            console.error("Renewal error", error)
+        } finally {
+            setActionLoading(null)
+        }
+    }
+
     const handleAction = async (instanceId: number, action: 'reboot' | 'terminate') => {
         if (!confirm(`Are you sure you want to ${action} this server?`)) return
 
         setActionLoading(instanceId)
         try {
-            const token = localStorage.getItem('token')
-            const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-
             let response
             if (action === 'reboot') {
-                response = await fetch(`${apiUrl}/instances/${instanceId}/reboot`, {
-                    method: 'POST',
-                    headers: { 'Authorization': `Bearer ${token}` }
-                })
+                response = await apiFetch(`/instances/${instanceId}/reboot`, { method: 'POST' })
             } else {
-                response = await fetch(`${apiUrl}/instances/${instanceId}`, {
-                    method: 'DELETE',
-                    headers: { 'Authorization': `Bearer ${token}` }
-                })
+                response = await apiFetch(`/instances/${instanceId}`, { method: 'DELETE' })
             }
 
             if (response.ok) {
@@ -156,6 +176,7 @@ export default function DashboardPage() {
                                             <th className="h-12 px-4 text-left align-middle font-medium text-muted-foreground">OS</th>
                                             <th className="h-12 px-4 text-left align-middle font-medium text-muted-foreground">IP Address</th>
                                             <th className="h-12 px-4 text-left align-middle font-medium text-muted-foreground">Status</th>
+                                            <th className="h-12 px-4 text-left align-middle font-medium text-muted-foreground">Expires</th>
                                             <th className="h-12 px-4 text-left align-middle font-medium text-muted-foreground">Creds</th>
                                             <th className="h-12 px-4 text-left align-middle font-medium text-muted-foreground">Actions</th>
                                         </tr>
@@ -168,13 +189,16 @@ export default function DashboardPage() {
                                                 <td className="p-4 align-middle">{instance.ip_address || 'Pending'}</td>
                                                 <td className="p-4 align-middle capitalize">
                                                     <span className={`inline-flex items-center rounded-full px-2.5 py-0.5 text-xs font-semibold transition-colors focus:outline-none focus:ring-2 focus:ring-ring focus:ring-offset-2 ${instance.status === 'active' ? 'bg-green-100 text-green-800' :
-                                                            instance.status === 'provisioning' ? 'bg-yellow-100 text-yellow-800' :
+                                                            ['queued', 'scheduled', 'provisioning', 'retrying'].includes(instance.status) ? 'bg-yellow-100 text-yellow-800' :
                                                                 instance.status === 'terminated' ? 'bg-red-100 text-red-800' :
                                                                     'bg-gray-100 text-gray-800'
                                                         }`}>
-                                                        {instance.status}
+                                                        {instance.status === 'retrying' ? 'provisioning (retrying)' : instance.status}
                                                     </span>
                                                 </td>
+                                                <td className="p-4 align-middle">
+                                                    {instance.expires_at ? new Date(instance.expires_at + 'Z').toLocaleString() : '-'}
+                                                </td>
                                                 <td className="p-4 align-middle">
                                                     {instance.status === 'active' ? (
                                                         <div className="flex flex-col text-xs">
@@ -193,6 +217,14 @@ export default function DashboardPage() {
                                                         >
                                                             Reboot
                                                         </Button>
+                                                        <Button
+                                                            variant="outline"
+                                                            size="sm"
+                                                            disabled={instance.status !== 'active' || actionLoading === instance.id}
+                                                            onClick={() => handleRenew(instance.id)}
+                                                        >
+                                                            Renew
+                                                        </Button>
                                                         <Button
                                                             variant="destructive"
                                                             size="sm"
@@ -5,6 +5,7 @@ import { useRouter } from 'next/navigation'
 import { Header } from '@/components/Header'
 import { Footer } from '@/components/Footer'
 import { Button } from '@/components/ui/button'
+import { apiFetch, apiFetchAll } from '@/lib/api'
 
 interface Ticket {
     id: number
@@ -25,16 +26,9 @@ export default function SupportPage() {
 
     const fetchTickets = async () => {
         try {
-            const token = localStorage.getItem('token')
-            const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-            const response = await fetch(`${apiUrl}/support/tickets`, {
-                headers: {
-                    'Authorization': `Bearer ${token}`
-                }
-            })
+            const { response, items } = await apiFetchAll<Ticket>('/support/tickets')
             if (response.ok) {
-                const data = await response.json()
-                setTickets(data)
+                setTickets(items)
             } else if (response.status === 401) {
                 router.push('/auth/login')
             }
@@ -58,14 +52,10 @@ export default function SupportPage() {
         e.preventDefault()
         setSubmitting(true)
         try {
-            const token = localStorage.getItem('token')
-            const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
-
-            const response = await fetch(`${apiUrl}/support/tickets`, {
+            const response = await apiFetch('/support/tickets', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json',
-                    'Authorization': `Bearer ${token}`
+                    'Content-Type': 'application/json'
                 },
                 body: JSON.stringify({ subject, message })
             })
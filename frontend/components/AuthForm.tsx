@@ -3,6 +3,7 @@
 import { useState } from 'react'
 import Link from 'next/link'
 import { useRouter } from 'next/navigation'
+import { saveTokens } from '@/lib/api'
 
 interface AuthFormProps {
     type: 'login' | 'register'
@@ -52,8 +53,8 @@ export function AuthForm({ type }: AuthFormProps) {
                 throw new Error(data.detail || 'Authentication failed')
             }
 
-            // Store token
-            localStorage.setItem('token', data.access_token)
+            // Store tokens; the refresh token renews the short-lived access token
+            saveTokens(data)
 
             // Redirect
             router.push('/dashboard')
@@ -0,0 +1,78 @@
+export const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+
+interface TokenPair {
+    access_token: string
+    refresh_token?: string
+}
+
+export function saveTokens(data: TokenPair) {
+    localStorage.setItem('token', data.access_token)
+    if (data.refresh_token) {
+        localStorage.setItem('refresh_token', data.refresh_token)
+    }
+}
+
+export function clearTokens() {
+    localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
+}
+
+// Refresh tokens rotate on every use, so concurrent 401s share one refresh
+// call instead of each spending the same token (a reuse revokes the session).
+let refreshing: Promise<boolean> | null = null
+
+async function refreshTokens(): Promise<boolean> {
+    const refreshToken = localStorage.getItem('refresh_token')
+    if (!refreshToken) return false
+    try {
+        const res = await fetch(`${apiUrl}/auth/refresh`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+        })
+        if (!res.ok) {
+            clearTokens()
+            return false
+        }
+        saveTokens(await res.json())
+        return true
+    } catch {
+        return false
+    }
+}
+
+/** fetch() against the API with the stored access token, refreshed once on a 401 */
+export async function apiFetch(path: string, init: RequestInit = {}): Promise<Response> {
+    const send = () => {
+        const headers = new Headers(init.headers)
+        const token = localStorage.getItem('token')
+        if (token) headers.set('Authorization', `Bearer ${token}`)
+        return fetch(path.startsWith('http') ? path : `${apiUrl}${path}`, { ...init, headers })
+    }
+
+    const res = await send()
+    if (res.status !== 401) return res
+    if (!refreshing) {
+        refreshing = refreshTokens().finally(() => { refreshing = null })
+    }
+    return (await refreshing) ? send() : res
+}
+
+/**
+ * GET every page of a cursor-paginated list, following X-Next-Cursor.
+ * Returns the first non-OK response as-is so callers can handle 401s.
+ */
+export async function apiFetchAll<T>(path: string): Promise<{ response: Response, items: T[] }> {
+    const items: T[] = []
+    let cursor: string | null = null
+    while (true) {
+        const url: string = cursor
+            ? `${path}${path.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}`
+            : path
+        const response = await apiFetch(url)
+        if (!response.ok) return { response, items }
+        items.push(...(await response.json()))
+        cursor = response.headers.get('X-Next-Cursor')
+        if (!cursor) return { response, items }
+    }
+}